@@ -1,11 +1,9 @@
 from django.contrib import admin
-from .models import Subject, Topic, Chapter, Resource, ResourceVersion, Quiz, Question, Choice, QuizAttempt, AttemptAnswer, Homework, HomeworkSubmission, Bookmark, Notification, TopicProgress
+from .models import Subject, Topic, Chapter, Resource, ResourceVersion, Quiz, Question, Choice, QuizAttempt, AttemptAnswer, Homework, HomeworkSubmission, Bookmark, Notification, TopicProgress, Job, StoredBlob, Tag
 
 
 admin.site.register([
 	Subject,
-	Topic,
-	Chapter,
 	Resource,
 	ResourceVersion,
 	Quiz,
@@ -18,4 +16,29 @@ admin.site.register([
 	Bookmark,
 	Notification,
 	TopicProgress,
+	Job,
+	StoredBlob,
+	Tag,
 ])
+
+
+@admin.register(Topic)
+class TopicAdmin(admin.ModelAdmin):
+	list_display = ('name', 'subject')
+	list_filter = ('subject',)
+	list_select_related = ('subject',)
+	search_fields = ('name', 'subject__name')
+
+
+@admin.register(Chapter)
+class ChapterAdmin(admin.ModelAdmin):
+	list_display = ('title', 'topic')
+	list_filter = ('topic__subject',)
+	list_select_related = ('topic__subject',)
+	search_fields = ('title', 'topic__name')
+
+	def formfield_for_foreignkey(self, db_field, request, **kwargs):
+		if db_field.name == 'topic':
+			# Topic.__str__ includes the subject name.
+			kwargs['queryset'] = Topic.objects.select_related('subject')
+		return super().formfield_for_foreignkey(db_field, request, **kwargs)
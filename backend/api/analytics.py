@@ -0,0 +1,152 @@
+"""Materialized per-user quiz statistics behind the ``dashboard`` endpoint.
+
+``record_attempts`` folds newly graded attempts into the running totals in
+``SubjectScoreStats`` and ``WeeklyScoreStats``; ``rebuild`` recomputes them
+from ``QuizAttempt`` with grouped queries. ``schedule_rebuild`` batches the
+users touched by a transaction into a single ``rebuild`` after it commits.
+"""
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum, Value
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import QuizAttempt, SubjectScoreStats, WeeklyScoreStats
+
+
+def week_start(moment):
+    day = timezone.localtime(moment).date() if timezone.is_aware(moment) else moment.date()
+    return day - timedelta(days=day.weekday())
+
+
+def _subject_filter(subject_id):
+    return {'subject__isnull': True} if subject_id is None else {'subject_id': subject_id}
+
+
+def _increment(model, lookup, create, updates):
+    """UPDATE the row matching ``lookup`` with ``updates``, creating it if it doesn't exist yet."""
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**create)
+    except IntegrityError:
+        # Another request created the row first; fold our totals into it.
+        model.objects.filter(**lookup).update(**updates)
+
+
+def record_attempts(attempts, subject_id):
+    """Add freshly graded ``attempts`` (all for quizzes in ``subject_id``) to the totals."""
+    totals = defaultdict(lambda: [0, 0.0, 0.0, None])
+    weekly = defaultdict(lambda: [0, 0.0])
+    for attempt in attempts:
+        created = attempt.created_at or timezone.now()
+        t = totals[attempt.student_id]
+        t[0] += 1
+        t[1] += attempt.score
+        t[2] = max(t[2], attempt.score)
+        t[3] = created if t[3] is None else max(t[3], created)
+        w = weekly[(attempt.student_id, week_start(created))]
+        w[0] += 1
+        w[1] += attempt.score
+
+    for user_id, (count, score_sum, best, last) in totals.items():
+        _increment(
+            SubjectScoreStats,
+            {'user_id': user_id, **_subject_filter(subject_id)},
+            dict(user_id=user_id, subject_id=subject_id, attempts_count=count, score_sum=score_sum, best_score=best, last_attempt_at=last),
+            dict(
+                attempts_count=F('attempts_count') + count,
+                score_sum=F('score_sum') + score_sum,
+                best_score=Greatest(F('best_score'), Value(best)),
+                last_attempt_at=last,
+            ),
+        )
+    for (user_id, week), (count, score_sum) in weekly.items():
+        _increment(
+            WeeklyScoreStats,
+            {'user_id': user_id, 'week_start': week, **_subject_filter(subject_id)},
+            dict(user_id=user_id, subject_id=subject_id, week_start=week, attempts_count=count, score_sum=score_sum),
+            dict(attempts_count=F('attempts_count') + count, score_sum=F('score_sum') + score_sum),
+        )
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    """Recompute the statistics tables from scratch (optionally only for ``user_ids``)."""
+    attempts = QuizAttempt.objects.all()
+    subject_stats = SubjectScoreStats.objects.all()
+    weekly_stats = WeeklyScoreStats.objects.all()
+    if user_ids is not None:
+        attempts = attempts.filter(student_id__in=user_ids)
+        subject_stats = subject_stats.filter(user_id__in=user_ids)
+        weekly_stats = weekly_stats.filter(user_id__in=user_ids)
+    subject_stats.delete()
+    weekly_stats.delete()
+
+    grouped = (
+        attempts.order_by()
+        .values('student_id', 'quiz__subject_id')
+        .annotate(n=Count('id'), total=Sum('score'), best=Max('score'), last=Max('created_at'))
+    )
+    SubjectScoreStats.objects.bulk_create(
+        (
+            SubjectScoreStats(
+                user_id=row['student_id'],
+                subject_id=row['quiz__subject_id'],
+                attempts_count=row['n'],
+                score_sum=row['total'] or 0,
+                best_score=row['best'] or 0,
+                last_attempt_at=row['last'],
+            )
+            for row in grouped.iterator()
+        ),
+        batch_size=1000,
+    )
+
+    weekly = defaultdict(lambda: [0, 0.0])
+    by_day = (
+        attempts.order_by()
+        .annotate(day=TruncDate('created_at'))
+        .values('student_id', 'quiz__subject_id', 'day')
+        .annotate(n=Count('id'), total=Sum('score'))
+    )
+    for row in by_day.iterator():
+        bucket = weekly[(row['student_id'], row['quiz__subject_id'], row['day'] - timedelta(days=row['day'].weekday()))]
+        bucket[0] += row['n']
+        bucket[1] += row['total'] or 0
+    WeeklyScoreStats.objects.bulk_create(
+        (
+            WeeklyScoreStats(user_id=user_id, subject_id=subject_id, week_start=week, attempts_count=n, score_sum=total)
+            for (user_id, subject_id, week), (n, total) in weekly.items()
+        ),
+        batch_size=1000,
+    )
+
+
+_pending = threading.local()
+
+
+def schedule_rebuild(user_ids):
+    """Rebuild ``user_ids``' statistics once the current transaction commits.
+
+    Users scheduled from the same transaction (say, every attempt removed by
+    deleting a quiz) share one ``rebuild``.
+    """
+    users = getattr(_pending, 'users', None)
+    if users is None:
+        users = _pending.users = set()
+    users.update(user_ids)
+    # Registered every time: if an earlier transaction rolled back, its
+    # callback never ran and only this one will flush the set.
+    transaction.on_commit(_flush_rebuilds)
+
+
+def _flush_rebuilds():
+    users = getattr(_pending, 'users', None)
+    if users:
+        _pending.users = set()
+        rebuild(user_ids=sorted(users))
@@ -0,0 +1,231 @@
+"""Async versions of the read-heavy endpoints, for running under ASGI.
+
+Under ``server_config.asgi`` the DRF views in ``api.views`` each occupy a
+thread for the whole request; these views await the database and cache
+instead, so one worker process can keep thousands of exam-start requests
+in flight. They are plain Django views (DRF has no async views) returning
+the same JSON shapes as their sync counterparts:
+
+    /api/async/quizzes/<id>/take/   same as /api/quizzes/<id>/take/
+    /api/async/search/?q=           same as /api/search/, including ``semantic=1``
+    /api/async/notifications/       the user's notifications, newest first, ``?before=<id>``
+
+``/api/async/notifications/stream/`` pushes new notifications as
+server-sent events (see ``notification_stream``).
+"""
+import functools
+import json
+import random
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from rest_framework.authtoken.models import Token
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import quiz_cache, search_index, vector_store
+from .notifications import aunread_count, get_broker, serialize
+from .models import Choice, Notification, Question, Quiz, Resource, ResourceTag, ResourceVersion
+from .serializers import ChoiceSerializer, QuestionSerializer, QuizSerializer, ResourceSerializer, ResourceVersionSerializer
+from .storage import blob_storage
+
+
+PAGE_SIZE = 50
+
+
+def _json(data, status=200):
+    # DRF's encoder, so dates and decimals render exactly as in the sync API.
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+def _flat_fields(serializer_class, nested=()):
+    """The serializer's readable, non-nested field names, usable with ``values()``."""
+    meta = serializer_class.Meta
+    extra = getattr(meta, 'extra_kwargs', {})
+    skip = set(nested) | set(getattr(meta, 'expandable_fields', ()))
+    return [f for f in meta.fields if f not in skip and not extra.get(f, {}).get('write_only')]
+
+
+def require_GET(view):
+    # django.views.decorators.http.require_GET only wraps async views from Django 5.0.
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def get_user(request):
+    """Authenticate like the DRF defaults (token, then session) without blocking the loop."""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Token '):
+        token = await Token.objects.select_related('user').filter(key=header[6:].strip()).afirst()
+        return token.user if token and token.user.is_active else None
+
+    def session_user():
+        user = request.user
+        return user if user.is_authenticated else None
+
+    return await sync_to_async(session_user)()
+
+
+@require_GET
+async def take(request, pk):
+    compiled = await quiz_cache.aget_compiled_quiz(pk)
+    if compiled is None:
+        return _json({"detail": "Not found."}, status=404)
+    questions = quiz_cache.render_questions(compiled)
+    if compiled['randomize_order']:
+        random.shuffle(questions)
+    return _json(questions)
+
+
+async def _in_rank_order(queryset, fields, ids):
+    rows = {row['id']: row async for row in queryset.filter(id__in=ids).values(*fields)}
+    return [rows[i] for i in ids if i in rows]
+
+
+async def _nest(parents, name, queryset, fk, fields):
+    """Attach ``queryset`` rows to ``parents[*][name]`` with one query, like a prefetch."""
+    by_parent = {parent['id']: parent for parent in parents}
+    for parent in parents:
+        parent[name] = []
+    async for row in queryset.filter(**{f'{fk}__in': list(by_parent)}).values(fk, *fields):
+        by_parent[row.pop(fk)][name].append(row)
+    return parents
+
+
+async def _with_tags_and_versions(resources):
+    by_id = {resource['id']: resource for resource in resources}
+    for resource in resources:
+        resource['tags'] = []
+    tagged = ResourceTag.objects.filter(resource_id__in=list(by_id)).order_by('tag__name')
+    async for resource_id, name in tagged.values_list('resource_id', 'tag__name'):
+        by_id[resource_id]['tags'].append(name)
+    for resource in resources:
+        resource['tags'] = ", ".join(resource['tags'])
+    await _nest(resources, 'versions', ResourceVersion.objects.all(), 'resource_id', _flat_fields(ResourceVersionSerializer))
+    storage = blob_storage()
+    for resource in resources:
+        for version in resource['versions']:
+            version['file'] = storage.url(version['file']) if version['file'] else None
+    return resources
+
+
+async def _with_questions(quizzes):
+    question_fields = _flat_fields(QuestionSerializer, nested=['choices'])
+    await _nest(quizzes, 'questions', Question.objects.order_by('id'), 'quiz_id', question_fields)
+    questions = [question for quiz in quizzes for question in quiz['questions']]
+    await _nest(questions, 'choices', Choice.objects.order_by('id'), 'question_id', _flat_fields(ChoiceSerializer))
+    return quizzes
+
+
+@require_GET
+async def search(request):
+    q = request.GET.get('q', '').strip()
+    resource_fields = _flat_fields(ResourceSerializer, nested=['tags'])
+    quiz_fields = _flat_fields(QuizSerializer)
+    if not q:
+        resources = [row async for row in Resource.objects.values(*resource_fields)[:PAGE_SIZE]]
+        quizzes = [row async for row in Quiz.objects.values(*quiz_fields)[:PAGE_SIZE]]
+    else:
+        # FTS5 ranking is raw SQL, which has no async cursor; run it off the loop.
+        resource_ids, quiz_ids = await sync_to_async(search_index.search)(q, limit=PAGE_SIZE)
+        if request.GET.get('semantic') in ('1', 'true'):
+            hits = await sync_to_async(vector_store.search)(q, k=200) or []
+            resource_ids = list(dict.fromkeys(hit.resource_id for hit in hits))[:PAGE_SIZE] or resource_ids
+        resources = await _in_rank_order(Resource.objects.all(), resource_fields, resource_ids)
+        quizzes = await _in_rank_order(Quiz.objects.all(), quiz_fields, quiz_ids)
+    return _json({"resources": await _with_tags_and_versions(resources), "quizzes": await _with_questions(quizzes)})
+
+
+@require_GET
+async def notifications(request):
+    user = await get_user(request)
+    if user is None:
+        return _json({"detail": "Authentication credentials were not provided."}, status=401)
+    fields = [f.attname for f in Notification._meta.concrete_fields]
+    queryset = Notification.objects.filter(user_id=user.pk).order_by('-id')
+    before = request.GET.get('before')
+    if before:
+        try:
+            queryset = queryset.filter(id__lt=int(before))
+        except ValueError:
+            return _json({"detail": "before must be a notification id"}, status=400)
+    rows = [row async for row in queryset.values(*fields)[:PAGE_SIZE + 1]]
+    has_more = len(rows) > PAGE_SIZE
+    rows = rows[:PAGE_SIZE]
+    for row in rows:
+        row['user'] = row.pop('user_id')
+    next_url = None
+    if has_more:
+        next_url = request.build_absolute_uri(f"{request.path}?before={rows[-1]['id']}")
+    return _json({"next": next_url, "results": rows})
+
+
+def _event(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {data}"]
+    return "\n".join(lines) + "\n\n"
+
+
+async def _notification_events(user_id, last_id):
+    subscription = await get_broker().subscribe(user_id)
+    try:
+        yield "retry: 3000\n\n"
+        yield _event("unread", json.dumps({"unread": await aunread_count(user_id)}))
+        if last_id is not None:
+            # Replay what was missed while the client was disconnected. The
+            # subscription is already open, so nothing falls in between.
+            while True:
+                missed = [
+                    notification async for notification in
+                    Notification.objects.filter(user_id=user_id, id__gt=last_id).order_by('id')[:PAGE_SIZE]
+                ]
+                for notification in missed:
+                    last_id = notification.pk
+                    yield _event("notification", serialize(notification), notification.pk)
+                if len(missed) < PAGE_SIZE:
+                    break
+        deadline = time.monotonic() + settings.NOTIFICATION_STREAM_MAX_SECONDS
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = await subscription.get(min(settings.NOTIFICATION_STREAM_HEARTBEAT, remaining))
+            if message is None:
+                yield ": ping\n\n"
+                continue
+            notification_id = json.loads(message)['id']
+            if last_id is not None and notification_id <= last_id:
+                continue
+            last_id = notification_id
+            yield _event("notification", message, notification_id)
+    finally:
+        await subscription.close()
+
+
+@require_GET
+async def notification_stream(request):
+    """Server-sent events for the user's new notifications.
+
+    Sends the unread count first, then one ``notification`` event per new
+    notification (``id`` is the notification id, so a reconnecting
+    ``EventSource`` resumes from ``Last-Event-ID``). Django 4.2 does not
+    notice a client hanging up mid-stream, so each stream ends after
+    ``NOTIFICATION_STREAM_MAX_SECONDS`` and the browser reconnects.
+    """
+    if not isinstance(request, ASGIRequest):
+        return _json({"detail": "Notification streams need the ASGI server."}, status=503)
+    user = await get_user(request)
+    if user is None:
+        return _json({"detail": "Authentication credentials were not provided."}, status=401)
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+    response = StreamingHttpResponse(_notification_events(user.pk, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
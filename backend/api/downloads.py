@@ -0,0 +1,163 @@
+"""File downloads with conditional GET, byte ranges and server offload.
+
+``serve_file`` answers ``If-None-Match`` / ``If-Modified-Since`` with 304,
+honours a single ``Range`` (with ``If-Range``), and otherwise returns a
+``FileResponse`` over a ``RangeFile``. ``RangeFile`` positions the real file
+at the start of the range and exposes its ``fileno()``, so under a WSGI
+server with ``wsgi.file_wrapper`` support (gunicorn) the body is sent with
+``os.sendfile`` from that offset for ``Content-Length`` bytes, never passing
+through Python.
+
+With ``settings.DOWNLOAD_ACCEL`` set, permissions are still checked by the
+calling view but the bytes are handed to the front-end server instead:
+
+    'nginx'     X-Accel-Redirect: DOWNLOAD_ACCEL_PREFIX + <file name>
+    'sendfile'  X-Sendfile: <absolute path>   (Apache mod_xsendfile, lighttpd)
+"""
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .storage import is_blob
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """Read at most ``length`` bytes of ``file`` starting at ``start``."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def etag_for(name, stat):
+    if is_blob(name):
+        # Content-addressed: the digest in the name is the content's identity.
+        return quote_etag(os.path.splitext(os.path.basename(name))[0])
+    return quote_etag(f"{int(stat.st_mtime):x}-{stat.st_size:x}")
+
+
+def _etag_matches(header, etag):
+    if header.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in header.split(',')]
+    # Weak comparison, as required for If-None-Match.
+    return any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(mtime) <= since
+
+
+def parse_range(header, size):
+    """Return ``(start, end)`` (inclusive) for a single satisfiable range, None to send the
+    whole file, or ``False`` if the range can't be satisfied."""
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or size == 0:
+        # Unsupported units and multiple ranges are answered with the full body.
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            return False
+        return max(0, size - suffix), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return False
+    return start, end
+
+
+def _range_applies(request, etag, mtime):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and int(mtime) <= date
+
+
+def serve_file(request, field_file, filename=None, content_type=None):
+    """Serve ``field_file`` (a stored ``FieldFile``) to ``request``."""
+    path = field_file.path
+    stat = os.stat(path)
+    etag = etag_for(field_file.name, stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'private, no-cache',
+    }
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    filename = filename or os.path.basename(field_file.name)
+    disposition = f"inline; filename*=UTF-8''{quote(filename)}"
+    content_type = content_type or 'application/octet-stream'
+
+    accel = getattr(settings, 'DOWNLOAD_ACCEL', '')
+    if accel:
+        response = HttpResponse(content_type=content_type)
+        if accel == 'nginx':
+            response['X-Accel-Redirect'] = settings.DOWNLOAD_ACCEL_PREFIX.rstrip('/') + '/' + quote(field_file.name)
+        else:
+            response['X-Sendfile'] = path
+        # The front-end server handles Range and computes the body length itself.
+        headers.pop('Accept-Ranges')
+        for key, value in headers.items():
+            response[key] = value
+        response['Content-Disposition'] = disposition
+        return response
+
+    size = stat.st_size
+    byte_range = None
+    if request.headers.get('Range') and _range_applies(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.headers['Range'], size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+    response = FileResponse(RangeFile(open(path, 'rb'), start, length), content_type=content_type)
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    response['Content-Disposition'] = disposition
+    for key, value in headers.items():
+        response[key] = value
+    return response
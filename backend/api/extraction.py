@@ -0,0 +1,113 @@
+"""PDF text extraction, run as background jobs so uploads return immediately."""
+from django.db import transaction
+
+from .jobs import enqueue, enqueue_once, job_handler
+from .models import ResourceVersion, ResourceVersionPage
+
+try:
+    from PyPDF2 import PdfReader
+except Exception:
+    PdfReader = None
+
+
+PAGE_CHUNK_SIZE = 16
+
+
+def is_pdf(mime):
+    return bool(mime) and 'pdf' in mime.lower()
+
+
+def _extract_page_range(path, start, end):
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or '' for i in range(start, end)]
+
+
+def extract_pdf_pages(path, executor=None, chunk_size=PAGE_CHUNK_SIZE):
+    """Return the text of every page, fanning chunks of pages out to ``executor``."""
+    reader = PdfReader(path)
+    num_pages = len(reader.pages)
+    if executor is None or num_pages <= chunk_size:
+        return [page.extract_text() or '' for page in reader.pages]
+    futures = [
+        executor.submit(_extract_page_range, path, start, min(start + chunk_size, num_pages))
+        for start in range(0, num_pages, chunk_size)
+    ]
+    pages = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+
+def read_pdf_text(file):
+    """Extract text from an uploaded file object in-process; '' if it can't be read."""
+    if PdfReader is None:
+        return ''
+    try:
+        return "\n".join(page.extract_text() or '' for page in PdfReader(file).pages)
+    except Exception:
+        return ''
+
+
+def reuse_extracted_pages(version):
+    """Copy the pages of an already extracted version with the same file; True if found.
+
+    Files are content-addressed (see ``storage``), so equal names mean equal bytes.
+    """
+    source = (
+        ResourceVersion.objects.filter(file=version.file.name, extraction_status=ResourceVersion.EXTRACTION_DONE)
+        .exclude(pk=version.pk)
+        .order_by('pk')
+        .first()
+    )
+    if source is None:
+        return False
+    with transaction.atomic():
+        save_pages(version, list(source.pages.order_by('page_number').values_list('text', flat=True)))
+    return True
+
+
+def queue_extraction(version):
+    """Mark ``version`` for extraction and enqueue the job, or skip non-PDF files."""
+    if not is_pdf(version.file_mime) or PdfReader is None:
+        status = ResourceVersion.EXTRACTION_SKIPPED
+    elif reuse_extracted_pages(version):
+        return
+    else:
+        status = ResourceVersion.EXTRACTION_PENDING
+        enqueue('extract_text', version_id=version.pk)
+    if version.extraction_status != status:
+        version.extraction_status = status
+        version.save(update_fields=['extraction_status', 'updated_at'])
+
+
+@job_handler('extract_text')
+def run_extraction(payload, executor=None):
+    version = ResourceVersion.objects.filter(id=payload['version_id']).first()
+    if version is None or reuse_extracted_pages(version):
+        return
+    ResourceVersion.objects.filter(id=version.id).update(extraction_status=ResourceVersion.EXTRACTION_PROCESSING)
+    try:
+        pages = extract_pdf_pages(version.file.path, executor=executor)
+    except Exception:
+        version.extraction_status = ResourceVersion.EXTRACTION_FAILED
+        version.save(update_fields=['extraction_status', 'updated_at'])
+        raise
+    with transaction.atomic():
+        save_pages(version, pages)
+
+
+def save_pages(version, pages):
+    """Replace the stored pages of ``version``, mark its extraction done and queue its embedding.
+
+    The job is queued in the caller's transaction, so vectors are only written
+    for pages that were committed, and never on the request path.
+    """
+    version.pages.all().delete()
+    ResourceVersionPage.objects.bulk_create(
+        [ResourceVersionPage(version=version, page_number=i, text=text) for i, text in enumerate(pages, start=1)],
+        batch_size=500,
+    )
+    version.page_count = len(pages)
+    version.extraction_status = ResourceVersion.EXTRACTION_DONE
+    version.save(update_fields=['page_count', 'extraction_status', 'updated_at'])
+    enqueue_once('embed_version', version_id=version.pk)
@@ -0,0 +1,124 @@
+"""Quiz grading against an in-memory answer key.
+
+A quiz's questions and choices are loaded once, every answer is validated
+against that key, and attempts plus answers are written with ``bulk_create``
+inside a single transaction, so the query count does not grow with the
+number of answers (or with the number of attempts in a batch).
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from . import analytics
+from .models import AttemptAnswer, Choice, Question, QuizAttempt
+
+
+CHOICE_QUESTION_TYPES = ('mcq', 'tf')
+
+
+class GradingError(Exception):
+    pass
+
+
+def _as_id(value, label):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise GradingError(f"invalid {label} id: {value!r}")
+
+
+class AnswerKey:
+    def __init__(self, question_types, choices):
+        self.question_types = question_types
+        self.choices = choices
+
+    @classmethod
+    def for_quiz(cls, quiz):
+        question_types = dict(Question.objects.filter(quiz=quiz).values_list('id', 'question_type'))
+        choices = {
+            choice_id: (question_id, is_correct)
+            for choice_id, question_id, is_correct in Choice.objects.filter(question__quiz=quiz).values_list('id', 'question_id', 'is_correct')
+        }
+        return cls(question_types, choices)
+
+    @property
+    def total_questions(self):
+        return len(self.question_types)
+
+    def grade_answer(self, answer):
+        """Return ``(question_id, selected_choice_id, text_answer, is_correct)`` for one answer."""
+        if not isinstance(answer, dict):
+            raise GradingError("each answer must be an object")
+        question_id = _as_id(answer.get('question'), 'question')
+        question_type = self.question_types.get(question_id)
+        if question_type is None:
+            raise GradingError(f"question {question_id} is not part of this quiz")
+        selected_choice_id = answer.get('selected_choice')
+        text_answer = answer.get('text_answer', '') or ''
+        is_correct = False
+        if question_type in CHOICE_QUESTION_TYPES:
+            if selected_choice_id:
+                selected_choice_id = _as_id(selected_choice_id, 'choice')
+                choice = self.choices.get(selected_choice_id)
+                if choice is None or choice[0] != question_id:
+                    raise GradingError(f"choice {selected_choice_id} does not belong to question {question_id}")
+                is_correct = choice[1]
+            else:
+                selected_choice_id = None
+        else:
+            selected_choice_id = None
+            is_correct = bool(text_answer.strip())
+        return question_id, selected_choice_id, text_answer, is_correct
+
+
+def grade_submissions(quiz, submissions, key=None):
+    """Grade ``[{student, answers, time_taken_seconds}, ...]`` and return the saved attempts."""
+    key = key or AnswerKey.for_quiz(quiz)
+    graded = []
+    for submission in submissions:
+        if not isinstance(submission, dict):
+            raise GradingError("each attempt must be an object")
+        answers = submission.get('answers', [])
+        if not submission.get('student') or not isinstance(answers, list):
+            raise GradingError("student and answers[] required")
+        student_id = _as_id(submission['student'], 'student')
+        rows = [key.grade_answer(answer) for answer in answers]
+        try:
+            time_taken = max(0, int(submission.get('time_taken_seconds') or 0))
+        except (TypeError, ValueError):
+            raise GradingError("time_taken_seconds must be an integer")
+        graded.append((student_id, time_taken, rows))
+
+    student_ids = {student_id for student_id, _, _ in graded}
+    known = set(User.objects.filter(id__in=student_ids).values_list('id', flat=True))
+    missing = student_ids - known
+    if missing:
+        raise GradingError(f"unknown student ids: {sorted(missing)}")
+
+    total = key.total_questions
+    with transaction.atomic():
+        attempts = QuizAttempt.objects.bulk_create([
+            QuizAttempt(
+                quiz=quiz,
+                student_id=student_id,
+                time_taken_seconds=time_taken,
+                # A question answered twice counts once, so the score stays within 0-100.
+                score=(len({row[0] for row in rows if row[3]}) / total) * 100 if total else 0,
+            )
+            for student_id, time_taken, rows in graded
+        ])
+        AttemptAnswer.objects.bulk_create(
+            [
+                AttemptAnswer(
+                    attempt=attempt,
+                    question_id=question_id,
+                    selected_choice_id=selected_choice_id,
+                    text_answer=text_answer,
+                    is_correct=is_correct,
+                )
+                for attempt, (_, _, rows) in zip(attempts, graded)
+                for question_id, selected_choice_id, text_answer, is_correct in rows
+            ],
+            batch_size=500,
+        )
+        analytics.record_attempts(attempts, quiz.subject_id)
+    return attempts
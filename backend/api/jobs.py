@@ -0,0 +1,110 @@
+"""Database-backed background jobs.
+
+Jobs are rows in ``api_job``; ``manage.py run_jobs`` claims them with a
+conditional UPDATE (so any number of workers can share the table without an
+external broker) and hands CPU-heavy work to a local process pool.
+"""
+import logging
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+STALE_AFTER = timedelta(minutes=30)
+# How often a running worker puts back jobs abandoned by crashed workers.
+REQUEUE_INTERVAL = 60.0
+
+_handlers = {}
+
+
+def job_handler(kind):
+    """Register ``func(payload, executor=None)`` as the handler for ``kind`` jobs."""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, delay=None, **payload):
+    """Queue a ``kind`` job; with a ``delay`` (timedelta) it isn't claimed before then."""
+    run_after = timezone.now() + delay if delay else None
+    return Job.objects.create(kind=kind, payload=payload, run_after=run_after)
+
+
+def enqueue_once(kind, delay=None, **payload):
+    """Enqueue ``kind`` unless an identical job is already waiting in the queue."""
+    if not Job.objects.filter(kind=kind, payload=payload, status=Job.STATUS_QUEUED).exists():
+        return enqueue(kind, delay=delay, **payload)
+
+
+def claim_next():
+    """Atomically move the oldest queued job to running and return it, or None."""
+    while True:
+        candidate = (
+            Job.objects.filter(status=Job.STATUS_QUEUED)
+            .filter(Q(run_after__isnull=True) | Q(run_after__lte=timezone.now()))
+            .order_by('created_at', 'id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if candidate is None:
+            return None
+        claimed = Job.objects.filter(id=candidate, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING,
+            started_at=timezone.now(),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(id=candidate)
+
+
+def requeue_stale(older_than=STALE_AFTER):
+    """Put jobs left running by a crashed worker back on the queue."""
+    cutoff = timezone.now() - older_than
+    return Job.objects.filter(status=Job.STATUS_RUNNING, started_at__lt=cutoff).update(status=Job.STATUS_QUEUED)
+
+
+def run_job(job, executor=None):
+    handler = _handlers.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"no handler registered for job kind {job.kind!r}")
+        handler(job.payload, executor=executor)
+    except Exception:
+        logger.exception("Job %s failed", job.pk)
+        job.error = traceback.format_exc()
+        job.status = Job.STATUS_QUEUED if handler and job.attempts < MAX_ATTEMPTS else Job.STATUS_FAILED
+    else:
+        job.error = ''
+        job.status = Job.STATUS_DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+    return job
+
+
+def run_worker(processes=None, poll_interval=2.0, once=False):
+    """Process jobs until interrupted (or until the queue is empty with ``once``)."""
+    next_requeue = 0.0
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        while True:
+            close_old_connections()
+            if time.monotonic() >= next_requeue:
+                requeue_stale()
+                next_requeue = time.monotonic() + REQUEUE_INTERVAL
+            job = claim_next()
+            if job is None:
+                if once:
+                    return
+                time.sleep(poll_interval)
+                continue
+            run_job(job, executor=executor)
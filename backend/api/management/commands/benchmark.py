@@ -0,0 +1,270 @@
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from urllib.parse import quote
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from api.models import Notification, Question, Quiz, QuizAttempt, Resource, Subject, Tag
+from api.seeding import SCALES, TERMS, scale_counts, seed
+from api.testing import percentile
+
+
+# (name, method, path, authenticated). Placeholders are filled by Command.targets().
+ENDPOINTS = [
+    ('resource_list', 'get', '/api/resources/', False),
+    ('resource_list_subject', 'get', '/api/resources/?subject={subject}&difficulty=hard', False),
+    ('resource_list_tags', 'get', '/api/resources/?tags={tags}&tag_match=any', False),
+    ('resource_list_text', 'get', '/api/resources/?q={term}', False),
+    ('resource_facets', 'get', '/api/resources/facets/?subject={subject}', False),
+    ('search', 'get', '/api/search/?q={term}', False),
+    ('search_multi_term', 'get', '/api/search/?q={terms}', False),
+    ('taxonomy', 'get', '/api/taxonomy/', False),
+    ('quiz_take', 'get', '/api/quizzes/{quiz}/take/', False),
+    ('grade', 'post', '/api/quizzes/{quiz}/grade/', True),
+    ('dashboard', 'get', '/api/dashboard/', True),
+    ('notifications', 'get', '/api/notifications/', True),
+    ('notifications_unread_count', 'get', '/api/notifications/unread_count/', True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database, then measure latency percentiles and query counts of the main "
+        "API endpoints through the DRF test client. Results are written as JSON and can be compared "
+        "with an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+        for name in SCALES['small']:
+            parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=int)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--repeat', type=int, default=30, help="Timed requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=3, help="Untimed requests per endpoint first.")
+        parser.add_argument('--only', default='', help="Comma-separated endpoint names to run.")
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--compare', help="Print the change against this earlier results file.")
+        parser.add_argument('--max-regression', type=float,
+                            help="Fail if any endpoint's p95 grows by more than this many percent, or its query count grows.")
+        parser.add_argument('--response-cache', action='store_true',
+                            help="Leave the response cache on (by default every request reaches the view).")
+        parser.add_argument('--use-current-db', action='store_true',
+                            help="Benchmark the configured database as it is instead of seeding a scratch one "
+                                 "(writes are rolled back).")
+
+    def handle(self, *args, **options):
+        options['only'] = {name.strip() for name in options['only'].split(',') if name.strip()}
+        unknown = options['only'] - {name for name, *_ in ENDPOINTS}
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+        baseline = self.load(options['compare']) if options['compare'] else None
+        counts = scale_counts(options['scale'], **{name: options[name] for name in SCALES[options['scale']]})
+        if options['use_current_db']:
+            results = self.run(options, counts=None)
+        else:
+            results = self.run_on_scratch_db(options, counts)
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"\nWrote {options['output']}")
+        if baseline is not None:
+            regressions = self.compare(baseline, results, options['max_regression'])
+            if regressions:
+                raise CommandError(f"Regressed: {', '.join(regressions)}")
+
+    def run_on_scratch_db(self, options, counts):
+        old_name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        scratch = None
+        if connection.vendor == 'sqlite':
+            # A file rather than the in-memory test database, so timings include real page reads.
+            scratch = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False).name
+            test_settings['NAME'] = scratch
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            self.stdout.write(f"Seeding {options['scale']} dataset (seed {options['seed']})...")
+            started = time.perf_counter()
+            seed(counts, seed=options['seed'], log=lambda message: self.stdout.write(f"  {message}"))
+            self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s.")
+            return self.run(options, counts)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=False)
+            if scratch and os.path.exists(scratch):
+                os.unlink(scratch)
+
+    def run(self, options, counts):
+        values, student, grade = self.targets()
+        overrides = {'DEBUG': False}
+        if not options['response_cache']:
+            overrides['RESPONSE_CACHE_TTL'] = 0
+        results = {'meta': self.meta(options, counts), 'endpoints': {}}
+        with override_settings(**overrides):
+            for name, method, path, authenticated in ENDPOINTS:
+                if options['only'] and name not in options['only']:
+                    continue
+                self.stdout.write(f"  {name}...")
+                results['endpoints'][name] = self.measure(
+                    method, path.format(**values), grade if method == 'post' else None,
+                    student if authenticated else None, options['warmup'], options['repeat'],
+                    rollback=counts is None,
+                )
+        return results
+
+    def targets(self):
+        """Fill in ``ENDPOINTS``' placeholders from the database's contents; returns ``(values, student, grade payload)``."""
+        student = User.objects.get(pk=(
+            QuizAttempt.objects.order_by().values('student_id').annotate(n=Count('id')).order_by('-n')
+            .values_list('student_id', flat=True).first()
+            or Notification.objects.values_list('user_id', flat=True).first()
+            or User.objects.values_list('pk', flat=True).first()
+        ))
+        subject_id = Subject.objects.order_by('pk').values_list('pk', flat=True).first()
+        tags = Tag.objects.annotate(n=Count('resources')).order_by('-n', 'name').values_list('name', flat=True)[:2]
+        quiz = Quiz.objects.annotate(n=Count('questions')).filter(n__gt=0).order_by('pk').first()
+        if subject_id is None or quiz is None:
+            raise CommandError("The database has no subjects or quizzes; run seed_data first.")
+        answers = [
+            {'question': question.pk, 'selected_choice': choices[0].pk if choices else None}
+            for question in Question.objects.filter(quiz=quiz).prefetch_related('choices')
+            for choices in [list(question.choices.all())]
+        ]
+        values = {
+            'subject': subject_id,
+            'quiz': quiz.pk,
+            'tags': quote(','.join(tags)),
+            'term': quote(TERMS[0]),
+            'terms': quote(' '.join(TERMS[2:4])),
+        }
+        return values, student, {'student': student.pk, 'answers': answers, 'time_taken_seconds': 300}
+
+    def measure(self, method, path, data, user, warmup, repeat, rollback=False):
+        """Time ``repeat`` requests; with ``rollback``, each write runs in a transaction that is rolled back."""
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+
+        def send():
+            if method == 'get':
+                return client.get(path)
+            if not rollback:
+                return client.post(path, data, format='json')
+            # Keep the real database as it was: no attempts or score stats from the benchmark.
+            with transaction.atomic():
+                response = client.post(path, data, format='json')
+                transaction.set_rollback(True)
+            return response
+
+        response = send()
+        if response.status_code >= 400:
+            raise CommandError(f"{method.upper()} {path} returned {response.status_code}: {response.content[:200]!r}")
+        for _ in range(warmup):
+            send()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            send()
+            timings.append((time.perf_counter() - started) * 1000)
+        # Counted on a separate request so query logging doesn't slow the timed ones.
+        with CaptureQueriesContext(connection) as queries:
+            send()
+        timings.sort()
+        return {
+            'method': method.upper(),
+            'path': path,
+            'status': response.status_code,
+            'bytes': len(response.content),
+            'queries': len(queries),
+            'runs': repeat,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3) if timings else 0.0,
+            'min_ms': round(timings[0], 3) if timings else 0.0,
+            'max_ms': round(timings[-1], 3) if timings else 0.0,
+        }
+
+    def meta(self, options, counts):
+        return {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'scale': options['scale'] if counts is not None else None,
+            'seed': options['seed'] if counts is not None else None,
+            'counts': counts if counts is not None else {
+                'resources': Resource.objects.count(),
+                'quizzes': Quiz.objects.count(),
+                'attempts': QuizAttempt.objects.count(),
+            },
+            'repeat': options['repeat'],
+            'warmup': options['warmup'],
+            'response_cache': options['response_cache'],
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+        }
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Can't read {path}: {exc}")
+
+    def report(self, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n{'endpoint':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'bytes':>10}"
+        ))
+        for name, r in results['endpoints'].items():
+            self.stdout.write(f"{name:<28}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['queries']:>9}{r['bytes']:>10}")
+
+    def compare(self, baseline, results, max_regression):
+        old_meta = baseline.get('meta', {})
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\nAgainst {old_meta.get('git_commit') or 'baseline'} ({old_meta.get('timestamp', '?')}, scale {old_meta.get('scale')})"
+        ))
+        if (old_meta.get('scale'), old_meta.get('counts')) != (results['meta']['scale'], results['meta']['counts']):
+            self.stdout.write(self.style.WARNING("  datasets differ; timings are not directly comparable"))
+        self.stdout.write(f"{'endpoint':<28}{'p50 ms':>22}{'p95 ms':>22}{'queries':>12}")
+        regressions = []
+        for name, new in results['endpoints'].items():
+            old = baseline.get('endpoints', {}).get(name)
+            if old is None:
+                self.stdout.write(f"{name:<28}{'(new)':>22}")
+                continue
+            self.stdout.write(
+                f"{name:<28}{_delta(old['p50_ms'], new['p50_ms']):>22}{_delta(old['p95_ms'], new['p95_ms']):>22}"
+                f"{old['queries']:>6} → {new['queries']:<3}"
+            )
+            if max_regression is not None and (
+                new['queries'] > old['queries'] or new['p95_ms'] > old['p95_ms'] * (1 + max_regression / 100)
+            ):
+                regressions.append(name)
+        return regressions
+
+
+def _delta(old, new):
+    change = f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+    return f"{old:.2f} → {new:.2f} ({change})"
+
+
+def git_commit():
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
@@ -0,0 +1,150 @@
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Avg, Exists, OuterRef
+from django.utils import timezone
+
+from api.models import (
+    Subject, Topic, Chapter, Resource, ResourceVersion, Quiz, QuizAttempt, Notification, normalize_file_type,
+)
+from api.seeding import spread_created_at
+
+
+MIMES = ['application/pdf', 'video/mp4', 'image/png', 'application/msword', 'text/plain']
+INDEXED_MODELS = [Resource, ResourceVersion, QuizAttempt, Notification]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database and compare query plans and timings of the hot "
+        "filter paths with and without the api indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000,
+                            help="Rows per seeded table (resources, versions, attempts, notifications).")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per query.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        old_name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        scratch = None
+        if connection.vendor == 'sqlite':
+            # The default SQLite test database lives in memory; use a file so
+            # the plans and timings reflect real page reads.
+            scratch = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False).name
+            test_settings['NAME'] = scratch
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            self.seed(options['rows'])
+            queries = self.queries()
+            with_indexes = self.measure(queries, options['repeat'])
+            self.drop_indexes()
+            without_indexes = self.measure(queries, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=False)
+            if scratch and os.path.exists(scratch):
+                os.unlink(scratch)
+        self.report(queries, with_indexes, without_indexes)
+
+    def seed(self, rows):
+        self.stdout.write(f"Seeding {rows} rows per table...")
+        rng = self.rng
+        users = User.objects.bulk_create([User(username=f'bench{i}') for i in range(1000)])
+        subjects = Subject.objects.bulk_create([Subject(name=f'Subject {i}') for i in range(20)])
+        topics = Topic.objects.bulk_create([Topic(subject=subjects[i % 20], name=f'Topic {i}') for i in range(200)])
+        chapters = Chapter.objects.bulk_create([Chapter(topic=topics[i % 200], title=f'Chapter {i}') for i in range(1000)])
+        quizzes = Quiz.objects.bulk_create([Quiz(creator=users[0], title=f'Quiz {i}', subject=subjects[i % 20]) for i in range(100)])
+        start = timezone.now() - timedelta(days=365)
+        difficulties = [key for key, _ in Resource.DIFFICULTY_CHOICES]
+        batch = 10_000
+        for offset in range(0, rows, batch):
+            n = min(batch, rows - offset)
+            resources = Resource.objects.bulk_create([
+                Resource(
+                    uploader=users[rng.randrange(1000)],
+                    chapter=chapter,
+                    topic=chapter.topic,
+                    subject=chapter.topic.subject,
+                    title=f'Resource {offset + i}',
+                    difficulty=rng.choice(difficulties),
+                )
+                for i, chapter in enumerate(rng.choice(chapters) for _ in range(n))
+            ])
+            versions = []
+            for resource in resources:
+                mime = rng.choice(MIMES)
+                versions.append(ResourceVersion(
+                    resource=resource,
+                    file=f'resources/{resource.pk}.bin',
+                    file_mime=mime,
+                    file_type=normalize_file_type(mime),
+                ))
+            ResourceVersion.objects.bulk_create(versions)
+            QuizAttempt.objects.bulk_create([
+                QuizAttempt(quiz=rng.choice(quizzes), student=users[rng.randrange(1000)], score=rng.random() * 100)
+                for _ in range(n)
+            ])
+            Notification.objects.bulk_create([
+                Notification(user=users[rng.randrange(1000)], title='Reminder', body='...')
+                for _ in range(n)
+            ])
+        spread_created_at((Resource, QuizAttempt, Notification), start)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.subject = subjects[3]
+        self.user = users[7]
+
+    def queries(self):
+        page = ('-created_at', '-id')
+        return [
+            ("resources by subject", lambda: Resource.objects.filter(subject=self.subject).order_by(*page)[:50]),
+            ("resources by difficulty", lambda: Resource.objects.filter(difficulty='hard').order_by(*page)[:50]),
+            ("resources by file type", lambda: Resource.objects.filter(
+                Exists(ResourceVersion.objects.filter(resource=OuterRef('pk'), file_type='video'))
+            ).order_by(*page)[:50]),
+            ("resources by mime icontains (old)", lambda: Resource.objects.filter(
+                versions__file_mime__icontains='video'
+            ).distinct().order_by(*page)[:50]),
+            ("notifications for user", lambda: Notification.objects.filter(user=self.user).order_by(*page)[:50]),
+            ("attempt average for student", lambda: QuizAttempt.objects.filter(student=self.user).values('student').annotate(avg=Avg('score'))),
+        ]
+
+    def measure(self, queries, repeat):
+        results = {}
+        for name, build in queries:
+            plan = build().explain()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(build())
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results[name] = (plan, timings[len(timings) // 2])
+        return results
+
+    def drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def report(self, queries, with_indexes, without_indexes):
+        for name, _ in queries:
+            plan_on, ms_on = with_indexes[name]
+            plan_off, ms_off = without_indexes[name]
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{name}"))
+            self.stdout.write(f"  with indexes    {ms_on:10.2f} ms (median)")
+            self.stdout.write("    " + plan_on.replace("\n", "\n    "))
+            self.stdout.write(f"  without indexes {ms_off:10.2f} ms (median)")
+            self.stdout.write("    " + plan_off.replace("\n", "\n    "))
@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import retrieval
+
+
+class Command(BaseCommand):
+    help = "Rebuild the on-disk BM25 passage index used by ai_chat."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', help="Run a sample query against the new index and report its latency.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        passages = retrieval.build_index()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {passages} passages into {settings.RETRIEVAL_INDEX_DIR} in {elapsed:.1f}s."
+        ))
+        if options['query']:
+            index = retrieval.get_index()
+            started = time.perf_counter()
+            hits = index.search(options['query'])
+            self.stdout.write(f"{len(hits)} hits in {(time.perf_counter() - started) * 1000:.1f} ms")
+            for hit in hits:
+                self.stdout.write(f"  {hit.score:7.3f}  resource {hit.resource_id}  {hit.text[:100]}")
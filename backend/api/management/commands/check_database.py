@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = "Show the effective database configuration and run a round-trip health check."
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        self.stdout.write(f"engine:             {settings_dict['ENGINE']}")
+        self.stdout.write(f"name:               {settings_dict['NAME']}")
+        self.stdout.write(f"conn_max_age:       {settings_dict['CONN_MAX_AGE']}")
+        self.stdout.write(f"conn_health_checks: {settings_dict['CONN_HEALTH_CHECKS']}")
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            if connection.vendor == 'sqlite':
+                for pragma in ('journal_mode', 'synchronous', 'busy_timeout'):
+                    cursor.execute(f"PRAGMA {pragma}")
+                    self.stdout.write(f"{pragma + ':':<20}{cursor.fetchone()[0]}")
+            elif connection.vendor == 'postgresql':
+                cursor.execute("SHOW server_version")
+                self.stdout.write(f"server_version:     {cursor.fetchone()[0]}")
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stdout.write(self.style.SUCCESS(f"Database reachable ({elapsed_ms:.1f} ms)."))
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import vector_store
+
+
+class Command(BaseCommand):
+    help = "Drop tombstoned rows from the passage vector store, or rebuild it from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Re-embed every extracted version from scratch.")
+
+    def handle(self, *args, **options):
+        store = vector_store.get_store()
+        if store is None:
+            raise CommandError("numpy is required for the vector store")
+        if options['rebuild']:
+            rows = store.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Embedded {rows} passages into {settings.VECTOR_STORE_DIR}."))
+        else:
+            rows = store.compact()
+            self.stdout.write(self.style.SUCCESS(f"Compacted vector store to {rows} passages."))
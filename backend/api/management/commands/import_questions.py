@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api import question_bank
+from api.models import Quiz
+
+
+class Command(BaseCommand):
+    help = "Import a CSV or JSON Lines question bank into a quiz (see api/question_bank.py for the format)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--quiz', type=int, help="Append to this quiz id.")
+        target.add_argument('--title', help="Create a new quiz with this title.")
+        parser.add_argument('--creator', help="Username owning a new quiz (default: first superuser).")
+        parser.add_argument('--subject', type=int, help="Subject id for a new quiz.")
+        parser.add_argument('--file-format', choices=question_bank.FORMATS, help="Default: from the file extension.")
+        parser.add_argument('--batch-size', type=int, default=question_bank.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            file_format = question_bank.format_for(options['path'], options['file_format'])
+        except question_bank.QuestionBankError as exc:
+            raise CommandError(str(exc))
+        if options['quiz']:
+            quiz = Quiz.objects.filter(pk=options['quiz']).first()
+            if quiz is None:
+                raise CommandError(f"Quiz {options['quiz']} does not exist.")
+        else:
+            creators = User.objects.filter(username=options['creator']) if options['creator'] else User.objects.filter(is_superuser=True)
+            creator = creators.order_by('id').first()
+            if creator is None:
+                raise CommandError("No creator found; pass --creator.")
+            quiz = Quiz.objects.create(creator=creator, title=options['title'], subject_id=options['subject'])
+
+        with open(options['path'], 'rb') as f:
+            try:
+                imported, error_count, errors = question_bank.import_questions(
+                    quiz, question_bank.iter_rows(f, file_format), batch_size=options['batch_size'],
+                )
+            except question_bank.QuestionBankError as exc:
+                raise CommandError(str(exc))
+        for error in errors:
+            self.stderr.write(f"line {error['line']}: {error['detail']}")
+        if error_count > len(errors):
+            self.stderr.write(f"... and {error_count - len(errors)} more errors")
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} questions into quiz {quiz.pk} ({error_count} rows skipped)."))
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.testing import percentile
+
+
+# (name, sync path, async path); "{quiz}" is filled in from --quiz.
+ENDPOINTS = [
+    ('take', '/api/quizzes/{quiz}/take/', '/api/async/quizzes/{quiz}/take/'),
+    ('search', '/api/search/', '/api/async/search/'),
+    ('notifications', '/api/notifications/', '/api/async/notifications/'),
+]
+
+
+class Connection:
+    """A minimal HTTP/1.1 keep-alive client, so the harness itself adds no thread pool."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, path, headers):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"GET {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        lines += [f"{key}: {value}" for key, value in headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("server closed the connection")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            response_headers[key.strip().lower()] = value.strip()
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif 'content-length' in response_headers:
+            await self.reader.readexactly(int(response_headers['content-length']))
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+        self.reader = self.writer = None
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent GETs at a running server and compare the sync DRF views with "
+        "their /api/async/ counterparts (throughput, p50/p95/p99 latency, errors). "
+        "Run the server under ASGI, e.g. `uvicorn server_config.asgi:application`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Base URL of the running server.")
+        parser.add_argument('--concurrency', type=int, default=50, help="Connections kept busy in parallel.")
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per endpoint and mode.")
+        parser.add_argument('--token', default='', help="API token; required for the notification endpoints.")
+        parser.add_argument('--quiz', type=int, help="Quiz id for the take endpoints.")
+        parser.add_argument('--query', default='algebra', help="Search query.")
+        parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError("--url must be a plain http:// URL")
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError("--concurrency and --requests must be positive")
+        headers = {'Accept': 'application/json'}
+        if options['token']:
+            headers['Authorization'] = f"Token {options['token']}"
+
+        modes = ['sync', 'async'] if options['mode'] == 'both' else [options['mode']]
+        targets = []
+        for name, sync_path, async_path in ENDPOINTS:
+            if name == 'take' and options['quiz'] is None:
+                continue
+            if name == 'notifications' and not options['token']:
+                continue
+            for mode, path in zip(['sync', 'async'], [sync_path, async_path]):
+                if mode not in modes:
+                    continue
+                path = path.format(quiz=options['quiz'])
+                if name == 'search':
+                    path += '?' + urlencode({'q': options['query']})
+                targets.append((name, mode, path))
+        if not targets:
+            raise CommandError("Nothing to run; pass --quiz and/or --token.")
+
+        results = []
+        for name, mode, path in targets:
+            result = asyncio.run(self.run(url.hostname, url.port or 80, url.path.rstrip('/') + path,
+                                          headers, options['concurrency'], options['requests']))
+            result.update(endpoint=name, mode=mode, path=path)
+            results.append(result)
+            if not options['json']:
+                self.stdout.write(
+                    f"{name:<14} {mode:<6} {result['throughput']:>9.1f} req/s  "
+                    f"p50 {result['p50_ms']:>7.1f} ms  p95 {result['p95_ms']:>7.1f} ms  "
+                    f"p99 {result['p99_ms']:>7.1f} ms  errors {result['errors']}"
+                )
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+
+    async def run(self, host, port, path, headers, concurrency, total):
+        latencies = []
+        errors = 0
+        remaining = total
+
+        async def worker():
+            nonlocal errors, remaining
+            conn = Connection(host, port)
+            try:
+                while remaining > 0:
+                    remaining -= 1
+                    started = time.perf_counter()
+                    try:
+                        status = await conn.request(path, headers)
+                    except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                        errors += 1
+                        await conn.close()
+                        continue
+                    latencies.append(time.perf_counter() - started)
+                    if status >= 400:
+                        errors += 1
+            finally:
+                await conn.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'requests': total,
+            'errors': errors,
+            'seconds': round(elapsed, 3),
+            'throughput': len(latencies) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+        }
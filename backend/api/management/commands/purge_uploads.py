@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import uploads
+from api.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = "Delete abandoned upload sessions and their partial files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=settings.UPLOAD_SESSION_TTL_HOURS,
+                            help="Drop unfinished sessions not touched for this long.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        # A finalizing session this old belongs to a finalize() that crashed.
+        stale = UploadSession.objects.exclude(status=UploadSession.STATUS_COMPLETE).filter(updated_at__lt=cutoff)
+        count = 0
+        for session in stale.iterator():
+            uploads.discard(session)
+            session.delete()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Purged {count} abandoned uploads."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api import analytics
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-user dashboard statistics from quiz attempts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help="Only rebuild this user id (repeatable).")
+
+    def handle(self, *args, **options):
+        analytics.rebuild(user_ids=options['users'])
+        self.stdout.write(self.style.SUCCESS("Dashboard statistics rebuilt."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from the current database contents."
+
+    def handle(self, *args, **options):
+        backend = search_index.get_backend()
+        with transaction.atomic():
+            search_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt ({type(backend).__name__})."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = "Run background jobs (PDF text extraction, ...) from the job table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None,
+                            help="Size of the process pool used for page extraction (default: CPU count).")
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help="Seconds to wait between polls when the queue is empty.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once the queue is drained instead of polling forever.")
+
+    def handle(self, *args, **options):
+        jobs.run_worker(
+            processes=options['processes'],
+            poll_interval=options['poll_interval'],
+            once=options['once'],
+        )
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Resource, Subject
+from api.seeding import SCALES, scale_counts, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a reproducible synthetic dataset: users, taxonomy, tagged resources "
+        "with multi-page extracted text, quizzes, attempts and notifications."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                            help="Preset row counts; the options below override single values.")
+        for name in SCALES['small']:
+            parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=int)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--append', action='store_true',
+                            help="Seed even if the database already has subjects or resources.")
+
+    def handle(self, *args, **options):
+        if not options['append'] and (Subject.objects.exists() or Resource.objects.exists()):
+            raise CommandError("The database is not empty; pass --append to seed anyway.")
+        counts = scale_counts(options['scale'], **{name: options[name] for name in SCALES[options['scale']]})
+        self.stdout.write(f"Seeding {options['scale']} dataset (seed {options['seed']}): {counts}")
+        started = time.perf_counter()
+        seed(counts, seed=options['seed'], log=lambda message: self.stdout.write(f"  {message}"))
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - started:.1f}s."))
+
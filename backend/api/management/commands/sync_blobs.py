@@ -0,0 +1,91 @@
+import os
+import time
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import storage
+from api.models import HomeworkSubmission, ResourceVersion, StoredBlob
+
+
+# Files this recent may belong to an upload whose transaction hasn't committed yet.
+ORPHAN_GRACE_SECONDS = 60 * 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount blob references from resource versions and submissions, delete "
+        "unreferenced blob files and optionally move pre-existing uploads into blob storage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--adopt', action='store_true',
+                            help="Move files stored before content addressing into blobs/ (deduplicating them).")
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--grace', type=int, default=ORPHAN_GRACE_SECONDS,
+                            help="Keep unreferenced files modified less than this many seconds ago.")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if options['adopt']:
+            self.adopt_legacy_files(dry_run)
+
+        counts = storage.referenced_names()
+        blobs = {blob.name: blob for blob in StoredBlob.objects.all()}
+        fixed = 0
+        with transaction.atomic():
+            for name, refcount in counts.items():
+                blob = blobs.pop(name, None)
+                if blob is None:
+                    fixed += 1
+                    if not dry_run:
+                        size = os.path.getsize(storage.blob_storage().path(name)) if storage.blob_storage().exists(name) else 0
+                        StoredBlob.objects.create(name=name, size=size, refcount=refcount)
+                elif blob.refcount != refcount:
+                    fixed += 1
+                    if not dry_run:
+                        StoredBlob.objects.filter(pk=blob.pk).update(refcount=refcount)
+            if not dry_run:
+                StoredBlob.objects.filter(name__in=list(blobs)).delete()
+
+        removed = 0
+        root = storage.blob_root()
+        cutoff = time.time() - options['grace']
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d != 'tmp']
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = storage.BLOB_PREFIX + os.path.relpath(path, root).replace(os.sep, '/')
+                if name in counts:
+                    continue
+                try:
+                    if os.path.getmtime(path) > cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                if not dry_run:
+                    os.unlink(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(counts)} referenced blobs, {fixed} refcounts fixed, {removed} orphaned files removed"
+            + (" (dry run)" if dry_run else "") + "."
+        ))
+
+    def adopt_legacy_files(self, dry_run):
+        adopted = 0
+        for model in (ResourceVersion, HomeworkSubmission):
+            rows = model.objects.exclude(file='').exclude(file__isnull=True).exclude(file__startswith=storage.BLOB_PREFIX)
+            for pk, name in rows.values_list('pk', 'file').iterator():
+                if not default_storage.exists(name):
+                    self.stderr.write(f"{model.__name__} {pk}: missing file {name}")
+                    continue
+                adopted += 1
+                if dry_run:
+                    continue
+                with default_storage.open(name, 'rb') as f:
+                    new_name = storage.blob_storage().save(name, File(f))
+                model.objects.filter(pk=pk).update(file=new_name)
+                default_storage.delete(name)
+        self.stdout.write(f"Adopted {adopted} files into blob storage" + (" (dry run)" if dry_run else "") + ".")
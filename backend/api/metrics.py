@@ -0,0 +1,333 @@
+"""Per-route request metrics in the Prometheus text format.
+
+``MetricsMiddleware`` times every request and counts its queries and their
+time through an execute wrapper installed on every database connection; the
+wrapper finds the current request's ``RequestMetrics`` in a context
+variable, so it works for sync views and, under ASGI, for async views whose
+queries run in ``sync_to_async`` threads. Views
+whose serializers use ``TimedSerializerMixin`` also report time spent
+building ``serializer.data``. Each request's numbers are folded into
+in-process aggregates under one lock when it finishes, so the per-query cost
+is two clock reads and an addition; ``metrics_view`` renders the aggregates
+at ``/metrics``.
+
+Queries slower than ``settings.SLOW_QUERY_MS`` are logged to
+``api.slow_queries`` with their SQL, the number and types of their
+parameters (never the values, which can be passwords or tokens) and the
+innermost frames that issued them.
+
+``/metrics`` takes ``Authorization: Bearer <settings.METRICS_TOKEN>``; with
+no token configured only staff users (session or API token) may read it.
+
+Aggregates are per process: with several workers, scrape each one (or sum
+in Prometheus) as usual.
+"""
+import contextvars
+import hmac
+import logging
+import os
+import threading
+import time
+import traceback
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework import exceptions, serializers
+from rest_framework.authentication import TokenAuthentication
+
+from . import response_cache
+
+
+slow_query_logger = logging.getLogger('api.slow_queries')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+SLOW_QUERY_FRAMES = 20
+
+_current = contextvars.ContextVar('api_request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'query_time', 'serializer_time', 'in_serializer')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.serializer_time = 0.0
+        self.in_serializer = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.query_time += elapsed
+            if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+                _log_slow_query(sql, params, many, elapsed)
+
+
+def _dispatch(execute, sql, params, many, context):
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    return request_metrics(execute, sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    """Add the query hook to ``connection`` (once); runs for every new connection."""
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+
+connection_created.connect(install)
+
+
+def _describe_params(params, many):
+    if params is None:
+        return 'none'
+    if many:
+        params = list(params)
+        return f"{len(params)} rows of " + (_describe_params(params[0], False) if params else 'none')
+    values = params.values() if isinstance(params, dict) else params
+    return f"{len(values)} ({', '.join(type(value).__name__ for value in values)})"
+
+
+def _log_slow_query(sql, params, many, elapsed):
+    # The innermost frames above the ORM: the code (ours or a library's) that ran the query.
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename != __file__ and f'django{os.sep}db{os.sep}' not in frame.filename
+    ][-SLOW_QUERY_FRAMES:]
+    slow_query_logger.warning(
+        "slow query (%.1f ms): %s\nparams: %s\n%s",
+        elapsed * 1000, sql, _describe_params(params, many), ''.join(traceback.format_list(frames)),
+    )
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.routes = {}
+
+    def record(self, route, method, status, duration, request_metrics, size):
+        with self.lock:
+            key = (route, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            stats = self.routes.get((route, method))
+            if stats is None:
+                stats = self.routes[(route, method)] = {
+                    'latency': Histogram(LATENCY_BUCKETS),
+                    'queries': Histogram(QUERY_COUNT_BUCKETS),
+                    'size': Histogram(SIZE_BUCKETS),
+                    'query_time': 0.0,
+                    'serializer_time': 0.0,
+                }
+            stats['latency'].observe(duration)
+            stats['queries'].observe(request_metrics.queries)
+            stats['query_time'] += request_metrics.query_time
+            stats['serializer_time'] += request_metrics.serializer_time
+            if size is not None:
+                stats['size'].observe(size)
+
+    def render(self):
+        with self.lock:
+            requests = dict(self.requests)
+            routes = {
+                key: {
+                    name: _copy(value) for name, value in stats.items()
+                }
+                for key, stats in self.routes.items()
+            }
+        lines = []
+        _family(lines, 'edusuite_http_requests_total', 'counter', "Requests by route, method and status.")
+        for (route, method, status), count in sorted(requests.items()):
+            lines.append(f"edusuite_http_requests_total{_labels(route=route, method=method, status=status)} {count}")
+        for name, key, kind, help_text in (
+            ('edusuite_http_request_duration_seconds', 'latency', 'histogram', "Request latency."),
+            ('edusuite_db_queries_per_request', 'queries', 'histogram', "Database queries per request."),
+            ('edusuite_http_response_size_bytes', 'size', 'histogram', "Response body size."),
+            ('edusuite_db_query_seconds_total', 'query_time', 'counter', "Time spent in database queries."),
+            ('edusuite_serializer_seconds_total', 'serializer_time', 'counter', "Time spent building serializer data."),
+        ):
+            _family(lines, name, kind, help_text)
+            for (route, method), stats in sorted(routes.items()):
+                labels = {'route': route, 'method': method}
+                if kind == 'counter':
+                    lines.append(f"{name}{_labels(**labels)} {stats[key]:.6f}")
+                else:
+                    _histogram_lines(lines, name, labels, stats[key])
+        _family(lines, 'edusuite_response_cache_events_total', 'counter', "Response cache lookups and stores in this process.")
+        for event, count in sorted(response_cache.stats().items()):
+            if event != 'hit_ratio':
+                lines.append(f"edusuite_response_cache_events_total{_labels(event=event)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _copy(value):
+    if isinstance(value, Histogram):
+        copy = Histogram(value.bounds)
+        copy.counts, copy.sum, copy.count = list(value.counts), value.sum, value.count
+        return copy
+    return value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _family(lines, name, kind, help_text):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _histogram_lines(lines, name, labels, histogram):
+    cumulative = 0
+    for bound, count in zip(histogram.bounds, histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum:.6f}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+
+registry = Registry()
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    # URL names (or the route pattern) keep label cardinality bounded.
+    return match.view_name or match.route
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        # Connections opened before this module was imported missed connection_created.
+        install(connection)
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        _record(request, response, started, request_metrics)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        _record(request, response, started, request_metrics)
+        return response
+
+
+def _record(request, response, started, request_metrics):
+    duration = time.perf_counter() - started
+    if response.streaming:
+        size = int(response['Content-Length']) if response.has_header('Content-Length') else None
+    else:
+        size = len(response.content)
+    registry.record(_route(request), request.method, response.status_code, duration, request_metrics, size)
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        return _timed(lambda: super(TimedListSerializer, self).data)
+
+
+class TimedSerializerMixin:
+    """Report the time spent producing ``serializer.data`` to the request's metrics."""
+
+    @property
+    def data(self):
+        return _timed(lambda: super(TimedSerializerMixin, self).data)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        serializer = super().many_init(*args, **kwargs)
+        if type(serializer) is serializers.ListSerializer:
+            serializer.__class__ = TimedListSerializer
+        return serializer
+
+
+def _timed(build):
+    request_metrics = _current.get()
+    if request_metrics is None or request_metrics.in_serializer:
+        # Outside a request, or a serializer used inside another one's data.
+        return build()
+    request_metrics.in_serializer = True
+    started = time.perf_counter()
+    try:
+        return build()
+    finally:
+        request_metrics.serializer_time += time.perf_counter() - started
+        request_metrics.in_serializer = False
+
+
+def _is_staff(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            authenticated = TokenAuthentication().authenticate(request)
+        except exceptions.AuthenticationFailed:
+            authenticated = None
+        user = authenticated[0] if authenticated else None
+    return bool(user and user.is_staff)
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    allowed = hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()) if token else _is_staff(request)
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,54 @@
+from django.db import migrations
+
+
+CREATE_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS api_search_index USING fts5(
+    parent_id UNINDEXED,
+    title,
+    body,
+    tags,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+POPULATE_FTS = [
+    "INSERT INTO api_search_index (rowid, parent_id, title, body, tags) "
+    "SELECT id * 4 + 0, id, title, description, tags FROM api_resource",
+    "INSERT INTO api_search_index (rowid, parent_id, title, body, tags) "
+    "SELECT id * 4 + 1, resource_id, '', extracted_text, '' FROM api_resourceversion",
+    "INSERT INTO api_search_index (rowid, parent_id, title, body, tags) "
+    "SELECT id * 4 + 2, id, title, '', '' FROM api_quiz",
+    "INSERT INTO api_search_index (rowid, parent_id, title, body, tags) "
+    "SELECT id * 4 + 3, quiz_id, '', text, '' FROM api_question",
+]
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not cursor.fetchone()[0]:
+            return
+        cursor.execute(CREATE_FTS)
+        for sql in POPULATE_FTS:
+            cursor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS api_search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_resourceversion_extracted_text_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-17 05:53
+
+from django.db import migrations, models
+
+
+def mark_existing_versions(apps, schema_editor):
+    ResourceVersion = apps.get_model('api', 'ResourceVersion')
+    ResourceVersion.objects.exclude(extracted_text='').update(extraction_status='done')
+    ResourceVersion.objects.filter(extracted_text='').update(extraction_status='skipped')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resourceversion',
+            name='extraction_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='pending', max_length=16),
+        ),
+        migrations.RunPython(mark_existing_versions, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(max_length=64)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='api_job_status_a9a0fa_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-17 05:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def split_extracted_text(apps, schema_editor):
+    # Page boundaries were lost when the text was joined, so existing
+    # documents are carried over as a single page.
+    ResourceVersion = apps.get_model('api', 'ResourceVersion')
+    ResourceVersionPage = apps.get_model('api', 'ResourceVersionPage')
+    batch = []
+    for version_id, text in ResourceVersion.objects.exclude(extracted_text='').values_list('id', 'extracted_text').iterator():
+        batch.append(ResourceVersionPage(version_id=version_id, page_number=1, text=text))
+        if len(batch) >= 500:
+            ResourceVersionPage.objects.bulk_create(batch)
+            batch = []
+    ResourceVersionPage.objects.bulk_create(batch)
+    ResourceVersion.objects.exclude(extracted_text='').update(page_count=1)
+
+
+def join_pages(apps, schema_editor):
+    ResourceVersion = apps.get_model('api', 'ResourceVersion')
+    for version in ResourceVersion.objects.filter(page_count__gt=0).prefetch_related('pages'):
+        version.extracted_text = "\n".join(page.text for page in version.pages.all())
+        version.save(update_fields=['extracted_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_background_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resourceversion',
+            name='page_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ResourceVersionPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.PositiveIntegerField()),
+                ('text', models.TextField(blank=True)),
+                ('version', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='api.resourceversion')),
+            ],
+            options={
+                'ordering': ['page_number'],
+                'unique_together': {('version', 'page_number')},
+            },
+        ),
+        migrations.RunPython(split_extracted_text, join_pages),
+        migrations.RemoveField(
+            model_name='resourceversion',
+            name='extracted_text',
+        ),
+    ]
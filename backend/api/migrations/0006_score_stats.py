@@ -0,0 +1,88 @@
+# Generated by Django 4.2.30 on 2026-10-17 05:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+from datetime import timedelta
+
+
+def populate_stats(apps, schema_editor):
+    QuizAttempt = apps.get_model('api', 'QuizAttempt')
+    SubjectScoreStats = apps.get_model('api', 'SubjectScoreStats')
+    WeeklyScoreStats = apps.get_model('api', 'WeeklyScoreStats')
+    totals = defaultdict(lambda: [0, 0.0, 0.0, None])
+    weekly = defaultdict(lambda: [0, 0.0])
+    rows = QuizAttempt.objects.values_list('student_id', 'quiz__subject_id', 'score', 'created_at')
+    for student_id, subject_id, score, created_at in rows.iterator():
+        t = totals[(student_id, subject_id)]
+        t[0] += 1
+        t[1] += score
+        t[2] = max(t[2], score)
+        t[3] = created_at if t[3] is None else max(t[3], created_at)
+        day = created_at.date()
+        w = weekly[(student_id, subject_id, day - timedelta(days=day.weekday()))]
+        w[0] += 1
+        w[1] += score
+    SubjectScoreStats.objects.bulk_create([
+        SubjectScoreStats(user_id=u, subject_id=s, attempts_count=n, score_sum=total, best_score=best, last_attempt_at=last)
+        for (u, s), (n, total, best, last) in totals.items()
+    ], batch_size=1000)
+    WeeklyScoreStats.objects.bulk_create([
+        WeeklyScoreStats(user_id=u, subject_id=s, week_start=week, attempts_count=n, score_sum=total)
+        for (u, s, week), (n, total) in weekly.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0005_resourceversion_pages'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubjectScoreStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('best_score', models.FloatField(default=0)),
+                ('last_attempt_at', models.DateTimeField(blank=True, null=True)),
+                ('subject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.subject')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subject_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WeeklyScoreStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField()),
+                ('attempts_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('subject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.subject')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'week_start'], name='api_weeklys_user_id_fd2383_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='weeklyscorestats',
+            constraint=models.UniqueConstraint(fields=('user', 'subject', 'week_start'), name='uniq_weekly_stats_user_subject_week'),
+        ),
+        migrations.AddConstraint(
+            model_name='weeklyscorestats',
+            constraint=models.UniqueConstraint(condition=models.Q(('subject__isnull', True)), fields=('user', 'week_start'), name='uniq_weekly_stats_user_no_subject_week'),
+        ),
+        migrations.AddConstraint(
+            model_name='subjectscorestats',
+            constraint=models.UniqueConstraint(fields=('user', 'subject'), name='uniq_subject_stats_user_subject'),
+        ),
+        migrations.AddConstraint(
+            model_name='subjectscorestats',
+            constraint=models.UniqueConstraint(condition=models.Q(('subject__isnull', True)), fields=('user',), name='uniq_subject_stats_user_no_subject'),
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 4.2.30 on 2026-10-17 05:59
+
+from django.db import migrations, models
+
+
+# A frozen copy of api.models.normalize_file_type as of this migration.
+_FILE_TYPE_ALIASES = {
+    'doc': 'document',
+    'docx': 'document',
+    'word': 'document',
+    'ppt': 'presentation',
+    'pptx': 'presentation',
+    'slides': 'presentation',
+    'xls': 'spreadsheet',
+    'xlsx': 'spreadsheet',
+    'excel': 'spreadsheet',
+    'csv': 'spreadsheet',
+    'zip': 'archive',
+    'mp4': 'video',
+    'mp3': 'audio',
+    'png': 'image',
+    'jpg': 'image',
+    'jpeg': 'image',
+}
+
+
+def _normalize_file_type(value):
+    value = (value or '').split(';')[0].strip().lower()
+    if '/' not in value:
+        return _FILE_TYPE_ALIASES.get(value, value)
+    major, minor = value.split('/', 1)
+    if minor == 'pdf':
+        return 'pdf'
+    if major in ('video', 'audio', 'image'):
+        return major
+    if 'presentation' in minor or 'powerpoint' in minor:
+        return 'presentation'
+    if 'spreadsheet' in minor or 'excel' in minor or minor == 'csv':
+        return 'spreadsheet'
+    if 'word' in minor or minor in ('rtf', 'vnd.oasis.opendocument.text'):
+        return 'document'
+    if minor in ('zip', 'x-zip-compressed', 'x-tar', 'gzip', 'x-7z-compressed', 'vnd.rar'):
+        return 'archive'
+    if major == 'text':
+        return 'text'
+    return 'other'
+
+
+def populate_file_type(apps, schema_editor):
+    ResourceVersion = apps.get_model('api', 'ResourceVersion')
+    for mime in ResourceVersion.objects.values_list('file_mime', flat=True).distinct():
+        ResourceVersion.objects.filter(file_mime=mime).update(file_type=_normalize_file_type(mime))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_score_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resourceversion',
+            name='file_type',
+            field=models.CharField(blank=True, help_text='Normalized from file_mime, e.g. pdf, video', max_length=32),
+        ),
+        migrations.RunPython(populate_file_type, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='notification_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['student', '-created_at'], name='attempt_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['-created_at', '-id'], name='resource_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['subject', '-created_at', '-id'], name='resource_subject_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['topic', '-created_at', '-id'], name='resource_topic_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['chapter', '-created_at', '-id'], name='resource_chapter_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['difficulty', '-created_at', '-id'], name='resource_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resourceversion',
+            index=models.Index(fields=['file_type', 'resource'], name='version_file_type_idx'),
+        ),
+    ]
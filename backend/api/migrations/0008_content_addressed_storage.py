@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:09
+
+import api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='homeworksubmission',
+            name='file',
+            field=models.FileField(blank=True, null=True, storage=api.storage.blob_storage, upload_to='homework_submissions/'),
+        ),
+        migrations.AlterField(
+            model_name='resourceversion',
+            name='file',
+            field=models.FileField(storage=api.storage.blob_storage, upload_to='resources/'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def _split(value):
+    names = (' '.join(part.split()).lower()[:64] for part in (value or '').split(','))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def split_tag_strings(apps, schema_editor):
+    Resource = apps.get_model('api', 'Resource')
+    Tag = apps.get_model('api', 'Tag')
+    ResourceTag = apps.get_model('api', 'ResourceTag')
+    pairs = []
+    for resource_id, text in Resource.objects.exclude(tags_text='').values_list('id', 'tags_text').iterator():
+        pairs.extend((resource_id, name) for name in _split(text))
+    Tag.objects.bulk_create([Tag(name=name) for name in {name for _, name in pairs}], batch_size=500)
+    tag_ids = dict(Tag.objects.values_list('name', 'id'))
+    ResourceTag.objects.bulk_create(
+        [ResourceTag(resource_id=resource_id, tag_id=tag_ids[name]) for resource_id, name in pairs],
+        batch_size=500,
+    )
+
+
+def join_tags(apps, schema_editor):
+    Resource = apps.get_model('api', 'Resource')
+    ResourceTag = apps.get_model('api', 'ResourceTag')
+    names = {}
+    for resource_id, name in ResourceTag.objects.order_by('id').values_list('resource_id', 'tag__name').iterator():
+        names.setdefault(resource_id, []).append(name)
+    for resource_id, tags in names.items():
+        Resource.objects.filter(pk=resource_id).update(tags_text=', '.join(tags))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RenameField(
+            model_name='resource',
+            old_name='tags',
+            new_name='tags_text',
+        ),
+        migrations.CreateModel(
+            name='ResourceTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.resource')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='resources', through='api.ResourceTag', to='api.tag'),
+        ),
+        migrations.AddIndex(
+            model_name='resourcetag',
+            index=models.Index(fields=['tag', 'resource'], name='resource_tag_lookup_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='resourcetag',
+            constraint=models.UniqueConstraint(fields=('resource', 'tag'), name='resource_tag_unique'),
+        ),
+        migrations.RunPython(split_tag_strings, join_tags),
+        migrations.RemoveField(
+            model_name='resource',
+            name='tags_text',
+        ),
+    ]
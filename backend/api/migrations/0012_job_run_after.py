@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_upload_finalizing_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='run_after',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
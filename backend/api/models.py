@@ -1,6 +1,64 @@
-from django.db import models
+import uuid
+
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 
+from .storage import blob_storage
+
+
+FILE_TYPE_ALIASES = {
+    'doc': 'document',
+    'docx': 'document',
+    'word': 'document',
+    'ppt': 'presentation',
+    'pptx': 'presentation',
+    'slides': 'presentation',
+    'xls': 'spreadsheet',
+    'xlsx': 'spreadsheet',
+    'excel': 'spreadsheet',
+    'csv': 'spreadsheet',
+    'zip': 'archive',
+    'mp4': 'video',
+    'mp3': 'audio',
+    'png': 'image',
+    'jpg': 'image',
+    'jpeg': 'image',
+}
+
+
+def normalize_tag(value: str) -> str:
+    """Tags match exactly but case- and whitespace-insensitively."""
+    return ' '.join((value or '').split()).lower()[:64]
+
+
+def split_tags(value) -> list:
+    """Parse a comma-separated string (or a list) into unique normalized tag names, in order."""
+    parts = value.split(',') if isinstance(value, str) else (value or [])
+    return list(dict.fromkeys(tag for tag in map(normalize_tag, parts) if tag))
+
+
+def normalize_file_type(value: str) -> str:
+    """Map a MIME type (or a short name such as ``pdf``/``video``) to an indexed file type."""
+    value = (value or '').split(';')[0].strip().lower()
+    if '/' not in value:
+        return FILE_TYPE_ALIASES.get(value, value)
+    major, minor = value.split('/', 1)
+    if minor == 'pdf':
+        return 'pdf'
+    if major in ('video', 'audio', 'image'):
+        return major
+    if 'presentation' in minor or 'powerpoint' in minor:
+        return 'presentation'
+    if 'spreadsheet' in minor or 'excel' in minor or minor == 'csv':
+        return 'spreadsheet'
+    if 'word' in minor or minor in ('rtf', 'vnd.oasis.opendocument.text'):
+        return 'document'
+    if minor in ('zip', 'x-zip-compressed', 'x-tar', 'gzip', 'x-7z-compressed', 'vnd.rar'):
+        return 'archive'
+    if major == 'text':
+        return 'text'
+    return 'other'
+
 
 class TimestampedModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -10,6 +68,21 @@ class TimestampedModel(models.Model):
         abstract = True
 
 
+class BlobFileModel(TimestampedModel):
+    """A model whose file lives in blob storage.
+
+    Saving is atomic, so the blob reference taken while the file is stored
+    rolls back if the row can't be written.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+
+
 class Subject(TimestampedModel):
     name = models.CharField(max_length=128, unique=True)
 
@@ -39,6 +112,16 @@ class Chapter(TimestampedModel):
         return f"{self.topic.subject.name} - {self.topic.name} - {self.title}"
 
 
+class Tag(models.Model):
+    name = models.CharField(max_length=64, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self) -> str:
+        return self.name
+
+
 class Resource(TimestampedModel):
     DIFFICULTY_CHOICES = (
         ('easy', 'Easy'),
@@ -51,23 +134,86 @@ class Resource(TimestampedModel):
     chapter = models.ForeignKey(Chapter, on_delete=models.SET_NULL, null=True, blank=True, related_name='resources')
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
-    tags = models.TextField(blank=True, help_text='Comma-separated tags')
+    tags = models.ManyToManyField(Tag, through='ResourceTag', blank=True, related_name='resources')
     difficulty = models.CharField(max_length=16, choices=DIFFICULTY_CHOICES, default='medium')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='resource_created_idx'),
+            models.Index(fields=['subject', '-created_at', '-id'], name='resource_subject_idx'),
+            models.Index(fields=['topic', '-created_at', '-id'], name='resource_topic_idx'),
+            models.Index(fields=['chapter', '-created_at', '-id'], name='resource_chapter_idx'),
+            models.Index(fields=['difficulty', '-created_at', '-id'], name='resource_difficulty_idx'),
+        ]
+
     def __str__(self) -> str:
         return self.title
 
+    def set_tags(self, names):
+        """Replace the resource's tags with ``names`` (already normalized), creating missing tags."""
+        Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+        self.tags.set(Tag.objects.filter(name__in=names))
+
+    def tag_names(self):
+        return [tag.name for tag in self.tags.all()]
+
+
+class ResourceTag(models.Model):
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
 
-class ResourceVersion(TimestampedModel):
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['resource', 'tag'], name='resource_tag_unique')]
+        # Tag filters and facet counts go from tag to resource.
+        indexes = [models.Index(fields=['tag', 'resource'], name='resource_tag_lookup_idx')]
+
+
+class ResourceVersion(BlobFileModel):
+    EXTRACTION_PENDING = 'pending'
+    EXTRACTION_PROCESSING = 'processing'
+    EXTRACTION_DONE = 'done'
+    EXTRACTION_FAILED = 'failed'
+    EXTRACTION_SKIPPED = 'skipped'
+    EXTRACTION_STATUS_CHOICES = (
+        (EXTRACTION_PENDING, 'Pending'),
+        (EXTRACTION_PROCESSING, 'Processing'),
+        (EXTRACTION_DONE, 'Done'),
+        (EXTRACTION_FAILED, 'Failed'),
+        (EXTRACTION_SKIPPED, 'Skipped'),
+    )
     resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='versions')
-    file = models.FileField(upload_to='resources/')
+    file = models.FileField(upload_to='resources/', storage=blob_storage)
     version_number = models.PositiveIntegerField(default=1)
     notes = models.TextField(blank=True)
-    extracted_text = models.TextField(blank=True)
     file_mime = models.CharField(max_length=128, blank=True)
+    file_type = models.CharField(max_length=32, blank=True, help_text='Normalized from file_mime, e.g. pdf, video')
+    extraction_status = models.CharField(max_length=16, choices=EXTRACTION_STATUS_CHOICES, default=EXTRACTION_PENDING)
+    page_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['-version_number']
+        indexes = [models.Index(fields=['file_type', 'resource'], name='version_file_type_idx')]
+
+    def save(self, *args, **kwargs):
+        self.file_type = normalize_file_type(self.file_mime)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'file_mime' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'file_type'}
+        super().save(*args, **kwargs)
+
+    @property
+    def extracted_text(self) -> str:
+        return "\n".join(page.text for page in self.pages.all())
+
+
+class ResourceVersionPage(models.Model):
+    version = models.ForeignKey(ResourceVersion, on_delete=models.CASCADE, related_name='pages')
+    page_number = models.PositiveIntegerField()
+    text = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['page_number']
+        unique_together = ('version', 'page_number')
 
 
 class Quiz(TimestampedModel):
@@ -109,6 +255,47 @@ class QuizAttempt(TimestampedModel):
     score = models.FloatField(default=0)
     time_taken_seconds = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [models.Index(fields=['student', '-created_at'], name='attempt_student_idx')]
+
+
+class SubjectScoreStats(models.Model):
+    """Running per-user, per-subject attempt totals maintained by ``api.analytics``."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='subject_stats')
+    # Not SET_NULL: the row would collide with the user's no-subject row. The
+    # affected users are rebuilt into that bucket instead (see api.signals).
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    attempts_count = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    best_score = models.FloatField(default=0)
+    last_attempt_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'subject'], name='uniq_subject_stats_user_subject'),
+            models.UniqueConstraint(fields=['user'], condition=models.Q(subject__isnull=True), name='uniq_subject_stats_user_no_subject'),
+        ]
+
+    @property
+    def avg_score(self) -> float:
+        return self.score_sum / self.attempts_count if self.attempts_count else 0
+
+
+class WeeklyScoreStats(models.Model):
+    """Per-user, per-subject attempt totals bucketed by ISO week (``week_start`` is a Monday)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='weekly_stats')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    week_start = models.DateField()
+    attempts_count = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'subject', 'week_start'], name='uniq_weekly_stats_user_subject_week'),
+            models.UniqueConstraint(fields=['user', 'week_start'], condition=models.Q(subject__isnull=True), name='uniq_weekly_stats_user_no_subject_week'),
+        ]
+        indexes = [models.Index(fields=['user', 'week_start'])]
+
 
 class AttemptAnswer(TimestampedModel):
     attempt = models.ForeignKey(QuizAttempt, on_delete=models.CASCADE, related_name='answers')
@@ -125,11 +312,11 @@ class Homework(TimestampedModel):
     due_date = models.DateTimeField()
 
 
-class HomeworkSubmission(TimestampedModel):
+class HomeworkSubmission(BlobFileModel):
     homework = models.ForeignKey(Homework, on_delete=models.CASCADE, related_name='submissions')
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='homework_submissions')
     text_response = models.TextField(blank=True)
-    file = models.FileField(upload_to='homework_submissions/', blank=True, null=True)
+    file = models.FileField(upload_to='homework_submissions/', storage=blob_storage, blank=True, null=True)
     grade = models.FloatField(null=True, blank=True)
     feedback = models.TextField(blank=True)
 
@@ -149,6 +336,9 @@ class Notification(TimestampedModel):
     body = models.TextField()
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [models.Index(fields=['user', '-created_at', '-id'], name='notification_user_idx')]
+
 
 class TopicProgress(TimestampedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='topic_progress')
@@ -157,3 +347,71 @@ class TopicProgress(TimestampedModel):
 
     class Meta:
         unique_together = ('user', 'topic')
+
+
+class Job(TimestampedModel):
+    """A unit of background work picked up by ``manage.py run_jobs``."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    # Not claimed before this time; lets changes arriving in a burst share one job.
+    run_after = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self) -> str:
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class StoredBlob(models.Model):
+    """A content-addressed file under ``MEDIA_ROOT/blobs/`` and how many rows reference it."""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.refcount} refs)"
+
+
+class UploadSession(TimestampedModel):
+    """A resumable upload of one file, finalized into a new ``ResourceVersion``."""
+    STATUS_UPLOADING = 'uploading'
+    STATUS_FINALIZING = 'finalizing'
+    STATUS_COMPLETE = 'complete'
+    STATUS_CHOICES = (
+        (STATUS_UPLOADING, 'Uploading'),
+        (STATUS_FINALIZING, 'Finalizing'),
+        (STATUS_COMPLETE, 'Complete'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=128, blank=True)
+    notes = models.TextField(blank=True)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_UPLOADING)
+    version = models.ForeignKey(ResourceVersion, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    @property
+    def part_name(self):
+        return f"upload-{self.pk}.part"
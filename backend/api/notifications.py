@@ -0,0 +1,223 @@
+"""Notification fan-out and unread counters.
+
+When a ``Notification`` is created (see ``signals``) it is published, after
+the transaction commits, to the owner's channel on the configured broker;
+``async_views.notification_stream`` relays the channel to the browser as
+server-sent events.
+
+``settings.NOTIFICATION_BROKER`` selects the broker:
+
+    'local'           in-process pub/sub; only streams served by the same
+                      process see the message (fine for a single ASGI worker)
+    'redis://...'     Redis PUBLISH/SUBSCRIBE, for several workers or hosts
+
+Unread counts are kept in the cache: creating a notification increments the
+user's counter if it is cached, marking notifications read decrements or
+resets it, and anything else drops it so the next read counts again.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except Exception:
+    redis = aioredis = None
+
+from .models import Notification
+from .serializers import NotificationSerializer
+
+
+logger = logging.getLogger(__name__)
+
+UNREAD_TIMEOUT = 60 * 60
+QUEUE_SIZE = 100
+
+
+def channel_name(user_id):
+    return f"notifications:{user_id}"
+
+
+def _unread_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+class LocalSubscription:
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def deliver(self, message):
+        # Runs on the subscriber's loop. A client this far behind resyncs
+        # from the database via Last-Event-ID when it reconnects.
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout):
+        """The next message, or None if nothing arrived within ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker._remove(self)
+
+
+class LocalBroker:
+    """In-process pub/sub; publishers may run on any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, user_id, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.deliver, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down.
+                self._remove(sub)
+
+    async def subscribe(self, user_id):
+        sub = LocalSubscription(self, user_id)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(sub)
+        return sub
+
+    def _remove(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+
+class RedisSubscription:
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        data = message['data']
+        return data.decode() if isinstance(data, bytes) else data
+
+    async def close(self):
+        await self.pubsub.close()
+        await self.client.close()
+
+
+class RedisBroker:
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("NOTIFICATION_BROKER points at Redis but the redis package is not installed")
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, user_id, message):
+        self._client.publish(channel_name(user_id), message)
+
+    async def subscribe(self, user_id):
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(channel_name(user_id))
+        return RedisSubscription(client, pubsub)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            url = getattr(settings, 'NOTIFICATION_BROKER', 'local') or 'local'
+            _broker = LocalBroker() if url == 'local' else RedisBroker(url)
+        return _broker
+
+
+def serialize(notification):
+    return json.dumps(NotificationSerializer(notification).data, cls=JSONEncoder)
+
+
+def announce(notification):
+    """Count a new notification and send it to its owner's stream once the transaction commits."""
+    message = serialize(notification)
+    user_id = notification.user_id
+    unread = not notification.is_read
+
+    def send():
+        if unread:
+            _adjust_unread(user_id, 1)
+        try:
+            get_broker().publish(user_id, message)
+        except Exception:
+            # The notification is saved; open streams miss it and clients
+            # pick it up from the list (or Last-Event-ID) instead.
+            logger.exception("Could not publish notification %s", notification.pk)
+
+    transaction.on_commit(send)
+
+
+def unread_count(user_id):
+    key = _unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.set(key, count, UNREAD_TIMEOUT)
+    return count
+
+
+async def aunread_count(user_id):
+    key = _unread_key(user_id)
+    count = await cache.aget(key)
+    if count is None:
+        count = await Notification.objects.filter(user_id=user_id, is_read=False).acount()
+        await cache.aset(key, count, UNREAD_TIMEOUT)
+    return count
+
+
+def _adjust_unread(user_id, delta):
+    try:
+        cache.incr(_unread_key(user_id), delta)
+    except ValueError:
+        # Not cached; the next read counts from the database.
+        pass
+
+
+def forget_unread(user_id):
+    cache.delete(_unread_key(user_id))
+
+
+def mark_read(notification):
+    """Mark one notification read with a single UPDATE; returns True if it was unread."""
+    updated = Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True)
+    notification.is_read = True
+    if updated:
+        _adjust_unread(notification.user_id, -1)
+    return bool(updated)
+
+
+def mark_all_read(user_id):
+    """Mark all of a user's notifications read with a single UPDATE; returns how many changed."""
+    updated = Notification.objects.filter(user_id=user_id, is_read=False).update(is_read=True)
+    cache.set(_unread_key(user_id), 0, UNREAD_TIMEOUT)
+    return updated
@@ -0,0 +1,19 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Keyset pagination on ``(created_at, id)``, newest first.
+
+    Unlike offset pagination the cost of a page does not grow with its
+    position, and rows inserted while a client pages through do not shift
+    the results.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class NameCursorPagination(CreatedAtCursorPagination):
+    """Alphabetical keyset pagination for small lookup tables such as subjects."""
+    ordering = ('name', 'id')
@@ -0,0 +1,81 @@
+"""Derive ``select_related``/``prefetch_related`` plans from a serializer tree.
+
+Walking the fields a serializer will actually render (after ``?fields=`` /
+``?expand=`` pruning) tells us which relations it is going to touch, so the
+viewset can load them up front instead of issuing one query per row.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField, RelatedField
+
+
+class QueryPlan:
+    def __init__(self):
+        self.select_related = []
+        self.prefetch_related = []
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset
+
+    def __repr__(self):
+        return f"QueryPlan(select_related={self.select_related!r}, prefetch_related={self.prefetch_related!r})"
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _walk(serializer, plan, prefix, in_prefetch):
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None:
+        return
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*' or '.' in field.source:
+            continue
+        model_field = _model_field(model, field.source)
+        if model_field is None or not model_field.is_relation:
+            continue
+        path = f'{prefix}{field.source}'
+        many = model_field.many_to_many or model_field.one_to_many
+        if isinstance(field, serializers.ListSerializer):
+            plan.prefetch_related.append(path)
+            _walk(field.child, plan, f'{path}__', True)
+        elif isinstance(field, serializers.BaseSerializer):
+            (plan.prefetch_related if in_prefetch or many else plan.select_related).append(path)
+            _walk(field, plan, f'{path}__', in_prefetch or many)
+        elif isinstance(field, ManyRelatedField) or many:
+            plan.prefetch_related.append(path)
+        elif isinstance(field, RelatedField) and not isinstance(field, PrimaryKeyRelatedField):
+            # Primary-key fields read the local ``<name>_id`` column; anything
+            # else (slug, string, hyperlinked) needs the related row.
+            (plan.prefetch_related if in_prefetch else plan.select_related).append(path)
+
+
+def plan_for_serializer(serializer):
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    plan = QueryPlan()
+    _walk(serializer, plan, '', False)
+    return plan
+
+
+class PrefetchPlanMixin:
+    """Viewset mixin applying the plan of the request's serializer in ``get_queryset``.
+
+    Only actions in ``prefetch_plan_actions`` render the serializer tree; writes
+    and custom actions that merely look an object up get the plain queryset.
+    """
+    prefetch_plan_actions = ('list', 'retrieve')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if getattr(self, 'action', None) not in self.prefetch_plan_actions:
+            return queryset
+        return plan_for_serializer(self.get_serializer()).apply(queryset)
@@ -0,0 +1,219 @@
+"""Streaming import and export of question banks (CSV and JSON Lines).
+
+CSV columns (extra columns are ignored)::
+
+    text,question_type,difficulty,explanation,choices
+    "Capital of France?",mcq,easy,,*Paris|London|Rome
+
+``choices`` is ``|``-separated and correct choices are prefixed with ``*``.
+A backslash escapes the next character, so a choice containing ``|`` or
+``\\``, or one that starts with ``*``, is written as ``a\\|b``, ``C:\\\\`` or
+``\\*args``; exports escape them that way and read back unchanged.
+A JSON Lines row is one question in the ``QuestionSerializer`` shape::
+
+    {"text": "...", "question_type": "mcq", "choices": [{"text": "Paris", "is_correct": true}, ...]}
+
+Rows are parsed lazily from the file, validated one batch at a time and
+inserted with ``quiz_bulk.bulk_insert_questions`` (one transaction per
+batch), so memory use does not depend on the size of the bank.
+"""
+import csv
+import io
+import json
+
+from .models import Choice, Question
+from .quiz_bulk import bulk_insert_questions
+
+
+FORMATS = ('csv', 'jsonl')
+CSV_COLUMNS = ['quiz', 'quiz_title', 'text', 'question_type', 'difficulty', 'explanation', 'choices']
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+QUESTION_TYPES = {key for key, _ in Question.QUESTION_TYPES}
+CHOICE_MAX_LENGTH = Choice._meta.get_field('text').max_length
+
+
+class QuestionBankError(ValueError):
+    pass
+
+
+def format_for(filename, requested=None):
+    file_format = (requested or '').lower() or (filename or '').rsplit('.', 1)[-1].lower()
+    if file_format == 'ndjson':
+        file_format = 'jsonl'
+    if file_format not in FORMATS:
+        raise QuestionBankError(f"file_format must be one of {', '.join(FORMATS)}")
+    return file_format
+
+
+def _text_stream(binary):
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+
+def iter_rows(binary, file_format):
+    """Yield ``(line_number, raw_row)`` from a binary file object without reading it all.
+
+    Raises ``QuestionBankError`` if the file isn't UTF-8 or isn't valid CSV,
+    since nothing after that point can be read.
+    """
+    stream = _text_stream(binary)
+    line_number = 0
+    try:
+        if file_format == 'csv':
+            reader = csv.DictReader(stream)
+            for row in reader:
+                line_number = reader.line_num
+                yield line_number, row
+        else:
+            for line_number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as exc:
+                    yield line_number, QuestionBankError(f"invalid JSON: {exc}")
+    except UnicodeDecodeError:
+        raise QuestionBankError(f"the file is not UTF-8 encoded (after line {line_number})")
+    except csv.Error as exc:
+        raise QuestionBankError(f"invalid CSV after line {line_number}: {exc}")
+    finally:
+        # Don't let the wrapper close the caller's file.
+        stream.detach()
+
+
+def _split_choices(value):
+    """Split on unescaped ``|``; each part is a list of ``(char, escaped)`` pairs."""
+    parts, part = [], []
+    chars = iter(value)
+    for char in chars:
+        if char == '\\':
+            part.append((next(chars, '\\'), True))
+        elif char == '|':
+            parts.append(part)
+            part = []
+        else:
+            part.append((char, False))
+    parts.append(part)
+    return parts
+
+
+def _csv_choices(value):
+    choices = []
+    for part in _split_choices(value or ''):
+        while part and not part[0][1] and part[0][0].isspace():
+            part.pop(0)
+        if not part:
+            continue
+        is_correct = part[0] == ('*', False)
+        text = ''.join(char for char, _ in part[is_correct:])
+        choices.append({'text': text.strip(), 'is_correct': is_correct})
+    return choices
+
+
+def _csv_choice(choice):
+    text = choice.text.replace('\\', '\\\\').replace('|', '\\|')
+    if text.startswith('*'):
+        text = '\\' + text
+    return ('*' if choice.is_correct else '') + text
+
+
+def parse_question(raw):
+    """Validate one raw row and return it in the ``bulk_insert_questions`` shape."""
+    if isinstance(raw, Exception):
+        raise raw
+    if not isinstance(raw, dict):
+        raise QuestionBankError("each row must be an object")
+    text = str(raw.get('text') or '').strip()
+    if not text:
+        raise QuestionBankError("text is required")
+    question_type = str(raw.get('question_type') or 'mcq').strip().lower()
+    if question_type not in QUESTION_TYPES:
+        raise QuestionBankError(f"unknown question_type {question_type!r}")
+    choices = raw.get('choices') or []
+    if isinstance(choices, str):
+        choices = _csv_choices(choices)
+    if not isinstance(choices, list) or not all(isinstance(c, dict) for c in choices):
+        raise QuestionBankError("choices must be a list of objects")
+    choices = [{'text': str(c.get('text') or '').strip(), 'is_correct': bool(c.get('is_correct'))} for c in choices]
+    if question_type == 'short':
+        choices = []
+    else:
+        if len(choices) < 2:
+            raise QuestionBankError(f"{question_type} questions need at least two choices")
+        if not any(c['is_correct'] for c in choices):
+            raise QuestionBankError("at least one choice must be correct")
+        if any(not c['text'] or len(c['text']) > CHOICE_MAX_LENGTH for c in choices):
+            raise QuestionBankError(f"choice text must be 1-{CHOICE_MAX_LENGTH} characters")
+    return {
+        'text': text,
+        'question_type': question_type,
+        'difficulty': str(raw.get('difficulty') or 'medium').strip()[:16],
+        'explanation': str(raw.get('explanation') or ''),
+        'choices': choices,
+    }
+
+
+def import_questions(quiz, rows, batch_size=BATCH_SIZE):
+    """Insert the valid rows of ``rows`` (from ``iter_rows``) into ``quiz``.
+
+    Invalid rows are skipped. Returns ``(imported, error_count, errors)``,
+    where ``errors`` lists the first ``MAX_REPORTED_ERRORS`` problems as
+    ``{"line", "detail"}``.
+    """
+    imported = error_count = 0
+    errors = []
+    batch = []
+    for line_number, raw in rows:
+        try:
+            batch.append(parse_question(raw))
+        except QuestionBankError as exc:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': line_number, 'detail': str(exc)})
+            continue
+        if len(batch) >= batch_size:
+            imported += len(bulk_insert_questions(quiz, batch))
+            batch = []
+    if batch:
+        imported += len(bulk_insert_questions(quiz, batch))
+    return imported, error_count, errors
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def export_questions(quizzes, file_format):
+    """Yield the questions of ``quizzes`` (a queryset) as CSV or JSON Lines chunks."""
+    questions = (
+        Question.objects.filter(quiz__in=quizzes)
+        .select_related('quiz')
+        .prefetch_related('choices')
+        .order_by('quiz_id', 'id')
+    )
+    writer = csv.writer(_Echo())
+    if file_format == 'csv':
+        yield writer.writerow(CSV_COLUMNS)
+    for question in questions.iterator(chunk_size=BATCH_SIZE):
+        choices = sorted(question.choices.all(), key=lambda c: c.id)
+        if file_format == 'csv':
+            yield writer.writerow([
+                question.quiz_id,
+                question.quiz.title,
+                question.text,
+                question.question_type,
+                question.difficulty,
+                question.explanation,
+                '|'.join(_csv_choice(c) for c in choices),
+            ])
+        else:
+            yield json.dumps({
+                'quiz': question.quiz_id,
+                'quiz_title': question.quiz.title,
+                'text': question.text,
+                'question_type': question.question_type,
+                'difficulty': question.difficulty,
+                'explanation': question.explanation,
+                'choices': [{'text': c.text, 'is_correct': c.is_correct} for c in choices],
+            }) + '\n'
@@ -0,0 +1,211 @@
+"""Multiple-choice question generation from extracted text.
+
+Sentences are ranked by TF-IDF informativeness (computed over the whole
+input with NumPy), picked greedily so that chosen sentences are not
+near-duplicates of each other, and each one gets the three most similar
+remaining sentences as distractors, using the hashing embeddings from
+``vector_store``.
+
+A chapter can hold far more text than fits in memory comfortably, so the
+chapter job reads it page by page twice: once for document frequencies, then
+to keep only the ``pool_size`` best-scoring sentences in a heap.
+"""
+import heapq
+import math
+import random
+import re
+from array import array
+from collections import Counter
+
+from django.db import transaction
+
+from .jobs import job_handler
+from .models import Job, Quiz, ResourceVersion, ResourceVersionPage
+from .quiz_bulk import bulk_insert_questions
+from .retrieval import STOPWORDS
+from .search_index import tokenize
+from .vector_store import embed
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+MIN_WORDS = 6
+MAX_WORDS = 40
+# Runs longer than MAX_WORDS (text without sentence breaks) are cut into windows of this many words.
+WINDOW_WORDS = 25
+DEFAULT_COUNT = 5
+MAX_COUNT = 200
+# Sentences this similar to the answer would also be correct, so they are
+# never used as its distractors (nor picked as separate questions).
+DUPLICATE_SIMILARITY = 0.85
+DIVERSITY = 0.5
+INSERT_BATCH = 100
+
+
+def split_sentences(text):
+    """Sentences of a usable length, whitespace-normalised and de-duplicated.
+
+    Over-long runs (OCR output, bullet lists without full stops) are cut into
+    ``WINDOW_WORDS`` windows; if nothing has a usable length, every sentence
+    is kept rather than none.
+    """
+    raw = [sentence.strip() for sentence in SENTENCE_RE.split(' '.join((text or '').split())) if sentence.strip()]
+    sentences = []
+    for sentence in raw:
+        words = sentence.split()
+        if len(words) > MAX_WORDS:
+            windows = (' '.join(words[i:i + WINDOW_WORDS]) for i in range(0, len(words), WINDOW_WORDS))
+            sentences.extend(window for window in windows if len(window.split()) >= MIN_WORDS)
+        elif len(words) >= MIN_WORDS:
+            sentences.append(sentence)
+    return list(dict.fromkeys(sentences or raw))
+
+
+def content_terms(sentence):
+    return [t for t in tokenize(sentence) if len(t) > 2 and t not in STOPWORDS and not t.isdigit()]
+
+
+def informativeness(sentences):
+    """Length-normalised sum of sublinear TF-IDF weights of each sentence's content terms."""
+    vocab = {}
+    rows, cols = array('q'), array('q')
+    lengths = np.zeros(len(sentences), dtype=np.float64)
+    for i, sentence in enumerate(sentences):
+        terms = content_terms(sentence)
+        lengths[i] = len(terms)
+        for term in terms:
+            rows.append(i)
+            cols.append(vocab.setdefault(term, len(vocab)))
+    if not vocab:
+        return np.zeros(len(sentences))
+    pairs, tf = np.unique(np.frombuffer(rows, dtype=np.int64) * len(vocab) + np.frombuffer(cols, dtype=np.int64), return_counts=True)
+    pair_rows, pair_cols = np.divmod(pairs, len(vocab))
+    df = np.bincount(pair_cols, minlength=len(vocab))
+    idf = np.log((len(sentences) + 1) / (df + 1)) + 1
+    weights = (1 + np.log(tf)) * idf[pair_cols]
+    return np.bincount(pair_rows, weights=weights, minlength=len(sentences)) / np.sqrt(np.maximum(lengths, 1))
+
+
+def _choose(scores, similarity, count):
+    """Greedy MMR: best score, penalised by similarity to sentences already chosen."""
+    chosen = []
+    penalty = np.zeros(len(scores))
+    available = np.ones(len(scores), dtype=bool)
+    relevance = scores / (scores.max() or 1)
+    for _ in range(min(count, len(scores))):
+        candidates = np.where(available, relevance - DIVERSITY * penalty, -np.inf)
+        best = int(np.argmax(candidates))
+        if not np.isfinite(candidates[best]):
+            break
+        chosen.append(best)
+        available &= similarity[best] < DUPLICATE_SIMILARITY
+        available[best] = False
+        penalty = np.maximum(penalty, similarity[best])
+    return chosen
+
+
+def pool_size(count):
+    # Only the most informative sentences take part as answers or distractors.
+    return max(8 * count, 64)
+
+
+def generate(sentences, count=DEFAULT_COUNT, seed=0, scores=None):
+    """Build up to ``count`` MCQs (in the ``QuestionSerializer`` shape) from ``sentences``.
+
+    ``scores`` are the sentences' informativeness when the caller already has them.
+    """
+    if np is None:
+        raise RuntimeError("numpy is required for question generation")
+    if not sentences:
+        return []
+    scores = informativeness(sentences) if scores is None else np.asarray(scores, dtype=np.float64)
+    pool = np.argsort(-scores, kind='stable')[:pool_size(count)]
+    pool_sentences = [sentences[i] for i in pool]
+    vectors = embed(pool_sentences)
+    similarity = vectors @ vectors.T
+    chosen = _choose(scores[pool], similarity, count)
+
+    distractor_sim = similarity[chosen].copy()
+    distractor_sim[distractor_sim >= DUPLICATE_SIMILARITY] = -np.inf
+    n_distractors = min(3, len(pool_sentences) - 1)
+    if n_distractors > 0:
+        distractors = np.argpartition(-distractor_sim, n_distractors - 1, axis=1)[:, :n_distractors]
+    else:
+        distractors = np.zeros((len(chosen), 0), dtype=np.int64)
+
+    rng = random.Random(seed)
+    questions = []
+    for row, (answer, options) in enumerate(zip(chosen, distractors)):
+        sentence = pool_sentences[answer]
+        texts = [pool_sentences[i][:100] for i in options if np.isfinite(distractor_sim[row, i])]
+        while len(texts) < 3:
+            texts.append(f"Option {len(texts) + 1}")
+        choices = [{"text": sentence[:100], "is_correct": True}] + [{"text": t, "is_correct": False} for t in texts]
+        rng.shuffle(choices)
+        questions.append({
+            "text": f"Which statement best matches: '{sentence[:80]}...' ?",
+            "question_type": "mcq",
+            "choices": choices,
+        })
+    return questions
+
+
+def chapter_sentences(chapter_id):
+    """Stream the sentences of every extracted version in a chapter, one page at a time."""
+    pages = (
+        ResourceVersionPage.objects.filter(
+            version__resource__chapter_id=chapter_id,
+            version__extraction_status=ResourceVersion.EXTRACTION_DONE,
+        )
+        .order_by('version_id', 'page_number')
+        .values_list('text', flat=True)
+    )
+    for text in pages.iterator(chunk_size=100):
+        yield from split_sentences(text)
+
+
+def best_chapter_sentences(chapter_id, limit):
+    """The ``limit`` most informative sentences of a chapter and their scores, best first."""
+    df = Counter()
+    total = 0
+    for sentence in chapter_sentences(chapter_id):
+        df.update(set(content_terms(sentence)))
+        total += 1
+    heap, kept = [], set()
+    for sentence in chapter_sentences(chapter_id):
+        if sentence in kept:
+            continue
+        terms = Counter(content_terms(sentence))
+        weight = sum((1 + math.log(tf)) * (math.log((total + 1) / (df[term] + 1)) + 1) for term, tf in terms.items())
+        item = (weight / math.sqrt(max(sum(terms.values()), 1)), sentence)
+        if len(heap) < limit:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            kept.discard(heapq.heapreplace(heap, item)[1])
+        else:
+            continue
+        kept.add(sentence)
+    best = sorted(heap, reverse=True)
+    return [sentence for _, sentence in best], [score for score, _ in best]
+
+
+@job_handler('generate_questions')
+def run_chapter_generation(payload, executor=None):
+    quiz = Quiz.objects.get(pk=payload['quiz_id'])
+    count = payload.get('count', DEFAULT_COUNT)
+    sentences, scores = best_chapter_sentences(payload['chapter_id'], pool_size(count))
+    questions = generate(sentences, count, seed=quiz.pk, scores=scores)
+    with transaction.atomic():
+        # Mark the job done together with its questions, so a retry or a
+        # requeued copy of a job that already committed adds nothing.
+        finished = Job.objects.filter(kind='generate_questions', payload=payload, status=Job.STATUS_RUNNING).update(
+            status=Job.STATUS_DONE,
+        )
+        if not finished:
+            return
+        for start in range(0, len(questions), INSERT_BATCH):
+            bulk_insert_questions(quiz, questions[start:start + INSERT_BATCH])
@@ -0,0 +1,118 @@
+"""Bulk creation and editing of questions and choices.
+
+``bulk_create`` skips model signals, so this module does the bookkeeping the
+signals would have done: index the new questions for search and drop the
+quiz's compiled cache entry and cached responses.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import quiz_cache, response_cache, search_index
+from .models import Choice, Question
+
+
+BATCH_SIZE = 500
+
+
+def bulk_insert_questions(quiz, questions):
+    """Insert ``[{text, question_type, ..., choices: [{text, is_correct}]}]`` into ``quiz``.
+
+    Returns the created ``Question`` objects (with primary keys).
+    """
+    questions = [dict(q) for q in questions]
+    choice_lists = [q.pop('choices', None) or [] for q in questions]
+    for q in questions:
+        q.pop('quiz', None)
+    with transaction.atomic():
+        created = Question.objects.bulk_create(
+            [Question(quiz=quiz, **q) for q in questions],
+            batch_size=BATCH_SIZE,
+        )
+        Choice.objects.bulk_create(
+            [
+                Choice(question=question, text=choice['text'], is_correct=choice.get('is_correct', False))
+                for question, choices in zip(created, choice_lists)
+                for choice in choices
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        search_index.index_objects(created)
+        quiz_cache.invalidate(quiz.pk)
+        response_cache.bump('quizzes')
+    return created
+
+
+class ChoiceSyncError(ValueError):
+    pass
+
+
+def sync_choices(choice_sets):
+    """Make each question's choices match ``{question: [{id?, text, is_correct}, ...]}``.
+
+    Incoming choices with an ``id`` update that row only if it changed, ones
+    without an ``id`` are created, and existing choices that are not listed
+    are deleted. Unchanged choices keep their ids, so attempt answers that
+    reference them are not nulled. Everything is validated before any write.
+    """
+    if not choice_sets:
+        return
+    existing = {}
+    for choice in Choice.objects.filter(question__in=list(choice_sets)):
+        existing.setdefault(choice.question_id, {})[choice.id] = choice
+    to_update, to_create, to_delete = [], [], []
+    for question, incoming in choice_sets.items():
+        current = existing.get(question.pk, {})
+        seen = set()
+        for data in incoming:
+            choice_id = data.get('id')
+            if choice_id is None:
+                to_create.append(Choice(question=question, text=data['text'], is_correct=data.get('is_correct', False)))
+                continue
+            choice = current.get(choice_id)
+            if choice is None:
+                raise ChoiceSyncError(f"choice {choice_id} does not belong to question {question.pk}")
+            if choice_id in seen:
+                raise ChoiceSyncError(f"choice {choice_id} is listed twice")
+            seen.add(choice_id)
+            text, is_correct = data.get('text', choice.text), data.get('is_correct', choice.is_correct)
+            if (text, is_correct) != (choice.text, choice.is_correct):
+                choice.text, choice.is_correct = text, is_correct
+                to_update.append(choice)
+        to_delete.extend(choice_id for choice_id in current if choice_id not in seen)
+
+    with transaction.atomic():
+        if to_delete:
+            # The collector applies on_delete (AttemptAnswer.selected_choice is SET_NULL).
+            Choice.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            Choice.objects.bulk_update(to_update, ['text', 'is_correct'], batch_size=BATCH_SIZE)
+        if to_create:
+            Choice.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        for quiz_id in {question.quiz_id for question in choice_sets}:
+            quiz_cache.invalidate(quiz_id)
+        response_cache.bump('quizzes')
+
+
+def bulk_update_questions(quiz, updates):
+    """Apply ``[(question, validated_data), ...]`` to questions of ``quiz`` in a few queries."""
+    fields = set()
+    choice_sets = {}
+    now = timezone.now()
+    for question, data in updates:
+        data = dict(data)
+        data.pop('quiz', None)
+        if 'choices' in data:
+            choice_sets[question] = data.pop('choices') or []
+        for attr, value in data.items():
+            setattr(question, attr, value)
+            fields.add(attr)
+        question.updated_at = now
+    questions = [question for question, _ in updates]
+    with transaction.atomic():
+        if questions:
+            Question.objects.bulk_update(questions, sorted(fields) + ['updated_at'], batch_size=BATCH_SIZE)
+        sync_choices(choice_sets)
+        search_index.index_objects(questions)
+        quiz_cache.invalidate(quiz.pk)
+        response_cache.bump('quizzes')
+    return questions
@@ -0,0 +1,126 @@
+"""Compiled, cached representation of a quiz for ``take`` and ``grade``.
+
+A compiled quiz is a plain dict holding the question order, question fields
+and ``(choice_id, text, is_correct)`` triples. It lives in Django's cache
+and is dropped by the signal handlers in ``api.signals`` whenever the quiz,
+one of its questions or one of their choices is written.
+
+Those deletes only reach other processes through a shared cache (Redis,
+Memcached, the database cache). Production deployments with more than one
+worker need one; on the process-local ``LocMemCache`` a worker that did not
+make the edit keeps serving (and grading against) its copy, so entries there
+expire after ``LOCAL_CACHE_TIMEOUT`` seconds instead of ``CACHE_TIMEOUT``.
+"""
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .grading import AnswerKey
+from .models import Choice, Question, Quiz
+
+
+CACHE_TIMEOUT = 60 * 60
+LOCAL_CACHE_TIMEOUT = 30
+
+
+def _timeout():
+    return LOCAL_CACHE_TIMEOUT if isinstance(caches['default'], LocMemCache) else CACHE_TIMEOUT
+
+
+def _cache_key(quiz_id):
+    return f'api:quiz:{quiz_id}:compiled'
+
+
+def _quiz_rows(quiz_id):
+    return (
+        Quiz.objects.filter(id=quiz_id).values('id', 'randomize_order'),
+        Question.objects.filter(quiz_id=quiz_id)
+        .order_by('id')
+        .values('id', 'quiz', 'text', 'question_type', 'difficulty', 'explanation'),
+        Choice.objects.filter(question__quiz_id=quiz_id)
+        .order_by('id')
+        .values_list('id', 'question_id', 'text', 'is_correct'),
+    )
+
+
+def _assemble(quiz, questions, choices):
+    by_question = {q['id']: q for q in questions}
+    for q in questions:
+        q['choices'] = []
+    for choice_id, question_id, text, is_correct in choices:
+        by_question[question_id]['choices'].append((choice_id, text, is_correct))
+    return {
+        'id': quiz['id'],
+        'randomize_order': quiz['randomize_order'],
+        'questions': questions,
+    }
+
+
+def compile_quiz(quiz_id):
+    quizzes, questions, choices = _quiz_rows(quiz_id)
+    quiz = quizzes.first()
+    if quiz is None:
+        return None
+    return _assemble(quiz, list(questions), choices)
+
+
+async def acompile_quiz(quiz_id):
+    quizzes, questions, choices = _quiz_rows(quiz_id)
+    quiz = await quizzes.afirst()
+    if quiz is None:
+        return None
+    return _assemble(quiz, [q async for q in questions], [c async for c in choices])
+
+
+def get_compiled_quiz(quiz_id):
+    """Return the compiled quiz, building and caching it on a miss; None if it doesn't exist."""
+    key = _cache_key(quiz_id)
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = compile_quiz(quiz_id)
+        if compiled is not None:
+            cache.set(key, compiled, _timeout())
+    return compiled
+
+
+async def aget_compiled_quiz(quiz_id):
+    """Async ``get_compiled_quiz`` for the ASGI read path."""
+    key = _cache_key(quiz_id)
+    compiled = await cache.aget(key)
+    if compiled is None:
+        compiled = await acompile_quiz(quiz_id)
+        if compiled is not None:
+            await cache.aset(key, compiled, _timeout())
+    return compiled
+
+
+def invalidate(quiz_id):
+    if quiz_id is None:
+        return
+    key = _cache_key(quiz_id)
+    cache.delete(key)
+    # A reader may re-populate the entry from the old rows before the
+    # writing transaction commits, so drop it again once it has.
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def render_questions(compiled):
+    """Questions in the shape produced by ``QuestionSerializer`` (correct flags hidden)."""
+    return [
+        {
+            **{field: q[field] for field in ('id', 'quiz', 'text', 'question_type', 'difficulty', 'explanation')},
+            'choices': [{'id': choice_id, 'text': text} for choice_id, text, _ in q['choices']],
+        }
+        for q in compiled['questions']
+    ]
+
+
+def answer_key(compiled):
+    return AnswerKey(
+        {q['id']: q['question_type'] for q in compiled['questions']},
+        {
+            choice_id: (q['id'], is_correct)
+            for q in compiled['questions']
+            for choice_id, _, is_correct in q['choices']
+        },
+    )
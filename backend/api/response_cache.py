@@ -0,0 +1,190 @@
+"""Whole-response caching for public read endpoints.
+
+``ResponseCacheMiddleware`` caches successful GET responses of the URL
+names in ``CACHED_ROUTES`` in the ``responses`` cache alias (local memory,
+file-based or Redis; see ``RESPONSE_CACHE_URL`` in settings). The key is
+built from the URL name, the normalized path and query string, the
+``Accept`` header, whether the caller is authenticated, and the current
+generation of every model group the route reads.
+
+Writes invalidate by bumping a group's generation (see ``signals`` and
+``quiz_bulk``), so entries from before the write are simply never looked up
+again and expire on their own.
+
+An entry is fresh for ``RESPONSE_CACHE_TTL`` seconds and may then be served
+stale for ``RESPONSE_CACHE_STALE_TTL`` more while one request, holding a
+short lock, re-renders it; every other request keeps getting the stale copy
+instead of piling onto the view.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qsl, urlencode
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+
+# URL name -> model groups whose writes change the response.
+CACHED_ROUTES = {
+    # quiz-take is not here: it is already served from quiz_cache's compiled
+    # entry, and a cached body would freeze the order of randomized quizzes.
+    'search': ('resources', 'quizzes'),
+    'subject-list': ('subjects',),
+    'subject-detail': ('subjects',),
+    'resource-list': ('resources',),
+}
+
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Allow', 'Vary')
+LOCK_TIMEOUT = 30
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def stats():
+    """Per-process counters: hit, stale, miss, store, bypass, revalidate."""
+    with _stats_lock:
+        counts = dict(_stats)
+    lookups = counts.get('hit', 0) + counts.get('stale', 0) + counts.get('miss', 0)
+    counts['hit_ratio'] = (counts.get('hit', 0) + counts.get('stale', 0)) / lookups if lookups else 0.0
+    return counts
+
+
+def _generation_key(group):
+    return f'resp:gen:{group}'
+
+
+def generations(groups):
+    cache = _cache()
+    keys = [_generation_key(group) for group in groups]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # Start from the clock so a cleared cache never revives old entries.
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*groups):
+    """Invalidate every cached response that reads any of ``groups``."""
+    def incr():
+        cache = _cache()
+        for group in groups:
+            try:
+                cache.incr(_generation_key(group))
+            except ValueError:
+                generations([group])
+
+    incr()
+    # A reader may cache the old rows under the new generation before the
+    # writing transaction commits; move past that entry once it has.
+    transaction.on_commit(incr)
+
+
+def _is_authenticated(request):
+    if 'HTTP_AUTHORIZATION' in request.META:
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated)
+
+
+def cache_key(request, url_name, groups):
+    query = sorted(parse_qsl(request.META.get('QUERY_STRING', ''), keep_blank_values=True))
+    auth = 'user' if _is_authenticated(request) else 'anon'
+    generation = '.'.join(str(g) for g in generations(groups))
+    raw = '\n'.join([request.path, urlencode(query), request.headers.get('Accept', ''), auth])
+    return f"resp:{url_name}:{generation}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def _restore(entry, state):
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers'].items():
+        response[header] = value
+    response['X-Cache'] = state
+    return response
+
+
+class ResponseCacheMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        key = getattr(request, '_response_cache_key', None)
+        if key is not None:
+            self._store(request, key, response)
+        return response
+
+    async def __acall__(self, request):
+        # process_view is sync; the async handler already runs it in a thread.
+        response = await self.get_response(request)
+        key = getattr(request, '_response_cache_key', None)
+        if key is not None:
+            await sync_to_async(self._store)(request, key, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ('GET', 'HEAD') or not settings.RESPONSE_CACHE_TTL:
+            return None
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        groups = CACHED_ROUTES.get(url_name)
+        if groups is None:
+            return None
+        key = cache_key(request, url_name, groups)
+        entry = _cache().get(key)
+        if entry is not None:
+            if time.time() < entry['fresh_until']:
+                _count('hit')
+                return _restore(entry, 'HIT')
+            if not _cache().add(f'{key}:lock', 1, LOCK_TIMEOUT):
+                _count('stale')
+                return _restore(entry, 'STALE')
+            _count('revalidate')
+        else:
+            _count('miss')
+        request._response_cache_key = key
+        return None
+
+    def _store(self, request, key, response):
+        cacheable = (
+            response.status_code == 200
+            and not response.streaming
+            and not response.has_header('Set-Cookie')
+            and 'no-store' not in response.get('Cache-Control', '')
+        )
+        if not cacheable:
+            _count('bypass')
+        else:
+            ttl = settings.RESPONSE_CACHE_TTL
+            entry = {
+                'content': response.content,
+                'status': response.status_code,
+                'headers': {h: response[h] for h in STORED_HEADERS if response.has_header(h)},
+                'fresh_until': time.time() + ttl,
+            }
+            _cache().set(key, entry, ttl + settings.RESPONSE_CACHE_STALE_TTL)
+            _count('store')
+            response['X-Cache'] = 'MISS'
+        _cache().delete(f'{key}:lock')
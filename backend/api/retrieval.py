@@ -0,0 +1,274 @@
+"""Passage retrieval for ``ai_chat``.
+
+Extracted text is cut into overlapping word windows ("passages") and
+indexed as a BM25 inverted index stored as NumPy arrays under
+``settings.RETRIEVAL_INDEX_DIR``:
+
+    manifest.json   build metadata and BM25 parameters
+    vocab.json      term -> term id
+    postings.npz    CSR postings (indptr, passage ids, precomputed BM25 weights)
+                    plus per-passage version/resource/subject/topic/chapter ids
+    texts.bin       UTF-8 passage texts, sliced with ``text_offsets``
+
+Each posting stores its final BM25 contribution, so scoring a query is a
+handful of vectorized gathers and adds over the postings of its terms.
+
+Saving or deleting a resource or version schedules a rebuild that waits
+``REBUILD_DELAY``, so a burst of changes shares one; until it runs, hits
+from deleted resources and versions are dropped at query time.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from array import array
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+
+from .jobs import enqueue_once, job_handler
+from .models import Resource, ResourceVersion
+from .search_index import tokenize
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+PASSAGE_WORDS = 120
+PASSAGE_OVERLAP = 40
+K1 = 1.2
+B = 0.75
+REBUILD_DELAY = timedelta(minutes=1)
+STOPWORDS = frozenset(
+    'a an and are as at be by can do does for from how i in is it of on or that the this to was what '
+    'when where which who why will with you your'.split()
+)
+
+
+def split_passages(text, size=PASSAGE_WORDS, overlap=PASSAGE_OVERLAP):
+    """Return overlapping windows of ``size`` words, stepping ``size - overlap`` words."""
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, size - overlap)
+    passages = []
+    for start in range(0, len(words), step):
+        passages.append(' '.join(words[start:start + size]))
+        if start + size >= len(words):
+            break
+    return passages
+
+
+def _iter_passages():
+    """Yield ``(text, version_id, resource_id, subject_id, topic_id, chapter_id)`` for the corpus."""
+    resources = Resource.objects.values_list('id', 'title', 'description', 'subject_id', 'topic_id', 'chapter_id')
+    for resource_id, title, description, subject_id, topic_id, chapter_id in resources.iterator(chunk_size=1000):
+        text = f"{title}. {description or ''}".strip()
+        for passage in split_passages(text):
+            yield passage, 0, resource_id, subject_id, topic_id, chapter_id
+    versions = (
+        ResourceVersion.objects.filter(extraction_status=ResourceVersion.EXTRACTION_DONE)
+        .select_related('resource')
+        .prefetch_related('pages')
+    )
+    for version in versions.iterator(chunk_size=100):
+        resource = version.resource
+        for passage in split_passages(version.extracted_text):
+            yield passage, version.id, resource.id, resource.subject_id, resource.topic_id, resource.chapter_id
+
+
+def build_index(directory=None):
+    """Build the passage index from the database and atomically replace the one on disk."""
+    if np is None:
+        raise RuntimeError("numpy is required to build the retrieval index")
+    directory = str(directory or settings.RETRIEVAL_INDEX_DIR)
+    vocab = {}
+    term_ids, passage_ids, tfs = array('q'), array('q'), array('f')
+    lengths = array('f')
+    meta = {key: array('q') for key in ('version', 'resource', 'subject', 'topic', 'chapter')}
+    text_offsets = array('q', [0])
+    tmp_dir = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    with open(os.path.join(tmp_dir, 'texts.bin'), 'wb') as texts:
+        for pid, (text, version_id, resource_id, subject_id, topic_id, chapter_id) in enumerate(_iter_passages()):
+            counts = Counter(t for t in tokenize(text) if t not in STOPWORDS)
+            for term, tf in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                passage_ids.append(pid)
+                tfs.append(tf)
+            lengths.append(sum(counts.values()))
+            for key, value in zip(meta, (version_id, resource_id, subject_id, topic_id, chapter_id)):
+                meta[key].append(value or 0)
+            encoded = text.encode('utf-8')
+            texts.write(encoded)
+            text_offsets.append(text_offsets[-1] + len(encoded))
+
+    n_passages = len(lengths)
+    term_ids = np.frombuffer(term_ids, dtype=np.int64)
+    passage_ids = np.frombuffer(passage_ids, dtype=np.int64)
+    tfs = np.frombuffer(tfs, dtype=np.float32)
+    lengths = np.frombuffer(lengths, dtype=np.float32)
+    avg_len = float(lengths.mean()) if n_passages else 0.0
+
+    order = np.argsort(term_ids, kind='stable')
+    term_ids, passage_ids, tfs = term_ids[order], passage_ids[order], tfs[order]
+    doc_freq = np.bincount(term_ids, minlength=len(vocab))
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(doc_freq, out=indptr[1:])
+    idf = np.log1p((n_passages - doc_freq + 0.5) / (doc_freq + 0.5))
+    norm = K1 * (1 - B + B * lengths[passage_ids] / (avg_len or 1.0))
+    weights = (idf[term_ids] * tfs * (K1 + 1) / (tfs + norm)).astype(np.float32)
+
+    np.savez(
+        os.path.join(tmp_dir, 'postings.npz'),
+        indptr=indptr,
+        passage_ids=passage_ids.astype(np.int32),
+        weights=weights,
+        text_offsets=np.frombuffer(text_offsets, dtype=np.int64),
+        **{f'{key}_ids': np.frombuffer(values, dtype=np.int64) for key, values in meta.items()},
+    )
+    with open(os.path.join(tmp_dir, 'vocab.json'), 'w') as f:
+        json.dump(vocab, f)
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+        json.dump({'built_at': time.time(), 'passages': n_passages, 'terms': len(vocab),
+                   'avg_len': avg_len, 'k1': K1, 'b': B}, f)
+
+    old_dir = f"{directory}.old-{os.getpid()}"
+    if os.path.isdir(directory):
+        os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return n_passages
+
+
+class Hit:
+    __slots__ = ('score', 'version_id', 'resource_id', 'text')
+
+    def __init__(self, score, version_id, resource_id, text):
+        self.score = score
+        self.version_id = version_id
+        self.resource_id = resource_id
+        self.text = text
+
+
+class PassageIndex:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        with open(os.path.join(directory, 'vocab.json')) as f:
+            self.vocab = json.load(f)
+        with np.load(os.path.join(directory, 'postings.npz')) as data:
+            self.arrays = {name: data[name] for name in data.files}
+        self.texts = np.memmap(os.path.join(directory, 'texts.bin'), dtype=np.uint8, mode='r') \
+            if self.arrays['text_offsets'][-1] else np.zeros(0, dtype=np.uint8)
+
+    def passage_text(self, pid):
+        offsets = self.arrays['text_offsets']
+        return bytes(self.texts[offsets[pid]:offsets[pid + 1]]).decode('utf-8')
+
+    def search(self, question, k=5, subject_id=None, topic_id=None, chapter_id=None):
+        a = self.arrays
+        n_passages = len(a['text_offsets']) - 1
+        term_ids = {self.vocab[t] for t in tokenize(question) if t not in STOPWORDS and t in self.vocab}
+        if not n_passages or not term_ids:
+            return []
+        scores = np.zeros(n_passages, dtype=np.float32)
+        indptr, passage_ids, weights = a['indptr'], a['passage_ids'], a['weights']
+        for term_id in term_ids:
+            start, end = indptr[term_id], indptr[term_id + 1]
+            # Passage ids are unique within one term's postings, so a plain
+            # fancy-indexed add is safe (no need for np.add.at).
+            scores[passage_ids[start:end]] += weights[start:end]
+        for key, value in (('subject_ids', subject_id), ('topic_ids', topic_id), ('chapter_ids', chapter_id)):
+            if value:
+                scores[a[key] != int(value)] = 0
+        k = min(k, n_passages)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [
+            Hit(float(scores[pid]), int(a['version_ids'][pid]), int(a['resource_ids'][pid]), self.passage_text(pid))
+            for pid in top
+            if scores[pid] > 0
+        ]
+
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def get_index():
+    """Return the on-disk index, reloading it when a rebuild has replaced it; None if unavailable."""
+    if np is None:
+        return None
+    directory = str(settings.RETRIEVAL_INDEX_DIR)
+    manifest = os.path.join(directory, 'manifest.json')
+    try:
+        mtime = os.stat(manifest).st_mtime
+    except OSError:
+        return None
+    cached = _loaded.get(directory)
+    if cached is None or cached[0] != mtime:
+        with _lock:
+            cached = _loaded.get(directory)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, PassageIndex(directory))
+                _loaded[directory] = cached
+    return cached[1]
+
+
+def search(question, k=5, **kwargs):
+    """Top passages for ``question``, or None when no index has been built."""
+    index = get_index()
+    if index is None:
+        return None
+    want = k
+    while True:
+        hits = index.search(question, k=want, **kwargs)
+        live = _live_hits(hits)
+        if len(live) >= k or len(hits) < want:
+            return live[:k]
+        want *= 4
+
+
+def _live_hits(hits):
+    """Drop hits whose resource or version was deleted (or re-queued for extraction) since the build."""
+    if not hits:
+        return hits
+    resources = set(Resource.objects.filter(id__in={hit.resource_id for hit in hits}).values_list('id', flat=True))
+    versions = set(
+        ResourceVersion.objects.filter(
+            id__in={hit.version_id for hit in hits if hit.version_id},
+            extraction_status=ResourceVersion.EXTRACTION_DONE,
+        ).values_list('id', flat=True)
+    )
+    return [hit for hit in hits if hit.resource_id in resources and (not hit.version_id or hit.version_id in versions)]
+
+
+_pending = threading.local()
+
+
+def schedule_rebuild():
+    """Rebuild the index ``REBUILD_DELAY`` after the current transaction commits."""
+    if np is None:
+        return
+    _pending.due = True
+    transaction.on_commit(_enqueue_rebuild)
+
+
+def _enqueue_rebuild():
+    # Every save in a transaction registers this; only the first one enqueues.
+    if getattr(_pending, 'due', False):
+        _pending.due = False
+        enqueue_once('build_retrieval_index', delay=REBUILD_DELAY)
+
+
+@job_handler('build_retrieval_index')
+def run_build(payload, executor=None):
+    build_index()
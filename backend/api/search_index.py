@@ -0,0 +1,279 @@
+"""Full-text index over resources, resource versions, quizzes and questions.
+
+SQLite databases use the FTS5 table created by migration 0003 and rank hits
+with its built-in ``bm25()``. Other backends (or SQLite builds without FTS5)
+fall back to an in-process posting-list index with the same BM25 scoring.
+
+``MemoryBackend`` is a single-process fallback: each worker builds its own
+copy on first search and only sees the writes made through that process, so
+a deployment with several workers on Postgres serves stale results from the
+others. Run those on a database with FTS5, or with a single worker.
+"""
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.db import connection, transaction
+from django.db.utils import DatabaseError
+
+from .models import Resource, ResourceVersion, Quiz, Question
+
+
+FTS_TABLE = 'api_search_index'
+
+# Every indexed row is addressed by ``pk * 4 + kind`` so updates and deletes
+# hit the FTS rowid directly instead of scanning an UNINDEXED column.
+KIND_RESOURCE = 0
+KIND_VERSION = 1
+KIND_QUIZ = 2
+KIND_QUESTION = 3
+RESOURCE_KINDS = (KIND_RESOURCE, KIND_VERSION)
+QUIZ_KINDS = (KIND_QUIZ, KIND_QUESTION)
+
+# Column weights for (title, body, tags); ``parent_id`` is never matched.
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+TAGS_WEIGHT = 5.0
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def doc_id(kind, pk):
+    return pk * 4 + kind
+
+
+def document_for(obj):
+    """Return ``(doc_id, parent_id, title, body, tags)`` for an indexable model."""
+    if isinstance(obj, Resource):
+        return doc_id(KIND_RESOURCE, obj.pk), obj.pk, obj.title, obj.description, ' '.join(obj.tag_names())
+    if isinstance(obj, ResourceVersion):
+        return doc_id(KIND_VERSION, obj.pk), obj.resource_id, '', obj.extracted_text, ''
+    if isinstance(obj, Quiz):
+        return doc_id(KIND_QUIZ, obj.pk), obj.pk, obj.title, '', ''
+    if isinstance(obj, Question):
+        return doc_id(KIND_QUESTION, obj.pk), obj.quiz_id, '', obj.text, ''
+    raise TypeError(f"{type(obj).__name__} is not indexed")
+
+
+def iter_all_documents():
+    querysets = (
+        Resource.objects.prefetch_related('tags'),
+        ResourceVersion.objects.prefetch_related('pages'),
+        Quiz.objects.all(),
+        Question.objects.all(),
+    )
+    for queryset in querysets:
+        for obj in queryset.iterator(chunk_size=500):
+            yield document_for(obj)
+
+
+class FTS5Backend:
+    def upsert(self, docs):
+        docs = list(docs)
+        if not docs:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(d[0],) for d in docs])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, parent_id, title, body, tags) VALUES (%s, %s, %s, %s, %s)",
+                docs,
+            )
+
+    def delete(self, doc_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(i,) for i in doc_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    def query(self, tokens, kinds, limit):
+        match = ' '.join(f'"{t}"' for t in tokens[:-1])
+        match = f'{match} "{tokens[-1]}"*'.strip()
+        placeholders = ', '.join(['%s'] * len(kinds))
+        sql = (
+            f"SELECT parent_id, bm25({FTS_TABLE}, 0.0, %s, %s, %s) AS score FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND (rowid %% 4) IN ({placeholders}) "
+            f"ORDER BY score LIMIT %s"
+        )
+        # Several rows can share a parent, so over-fetch before collapsing.
+        params = [TITLE_WEIGHT, BODY_WEIGHT, TAGS_WEIGHT, match, *kinds, limit * 4]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        # bm25() is negative, lower is better; flip it so callers see higher-is-better.
+        return [(parent_id, -score) for parent_id, score in rows]
+
+
+class MemoryBackend:
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._built = False
+        self._postings = defaultdict(dict)
+        self._doc_terms = {}
+        self._doc_len = {}
+        self._doc_parent = {}
+        self._total_len = 0
+
+    def _weighted_terms(self, title, body, tags):
+        terms = Counter()
+        for weight, text in ((TITLE_WEIGHT, title), (BODY_WEIGHT, body), (TAGS_WEIGHT, tags)):
+            for token in tokenize(text):
+                terms[token] += weight
+        return terms
+
+    def _remove(self, key):
+        terms = self._doc_terms.pop(key, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[term]
+        self._total_len -= self._doc_len.pop(key)
+        del self._doc_parent[key]
+
+    def _add(self, key, parent_id, title, body, tags):
+        terms = self._weighted_terms(title, body, tags)
+        for term, tf in terms.items():
+            self._postings[term][key] = tf
+        self._doc_terms[key] = tuple(terms)
+        length = sum(terms.values())
+        self._doc_len[key] = length
+        self._doc_parent[key] = parent_id
+        self._total_len += length
+
+    def _ensure_built(self):
+        if self._built:
+            return
+        with self._lock:
+            if not self._built:
+                for doc in iter_all_documents():
+                    self._add(*doc)
+                self._built = True
+
+    def upsert(self, docs):
+        with self._lock:
+            if not self._built:
+                return
+            for doc in docs:
+                self._remove(doc[0])
+                self._add(*doc)
+
+    def delete(self, doc_ids):
+        with self._lock:
+            for key in doc_ids:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def query(self, tokens, kinds, limit):
+        self._ensure_built()
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not n_docs:
+                return []
+            avg_len = self._total_len / n_docs or 1.0
+            last = tokens[-1]
+            term_groups = [[t] for t in tokens[:-1]]
+            term_groups.append([t for t in self._postings if t.startswith(last)])
+            scores = defaultdict(float)
+            matched = None
+            for group in term_groups:
+                group_docs = set()
+                for term in group:
+                    postings = self._postings.get(term, {})
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for key, tf in postings.items():
+                        if key % 4 not in kinds:
+                            continue
+                        norm = tf + self.k1 * (1 - self.b + self.b * self._doc_len[key] / avg_len)
+                        scores[key] += idf * tf * (self.k1 + 1) / norm
+                        group_docs.add(key)
+                matched = group_docs if matched is None else matched & group_docs
+            ranked = sorted(matched or (), key=lambda k: scores[k], reverse=True)[:limit * 4]
+            return [(self._doc_parent[k], scores[k]) for k in ranked]
+
+
+_fts5_backend = FTS5Backend()
+_memory_backend = MemoryBackend()
+_fts5_available = {}
+
+
+def get_backend():
+    alias = connection.alias
+    if alias not in _fts5_available:
+        available = False
+        if connection.vendor == 'sqlite':
+            available = FTS_TABLE in connection.introspection.table_names()
+        _fts5_available[alias] = available
+    return _fts5_backend if _fts5_available[alias] else _memory_backend
+
+
+def index_objects(objects):
+    backend = get_backend()
+    docs = [document_for(obj) for obj in objects]
+    if backend is _fts5_backend:
+        backend.upsert(docs)
+    else:
+        transaction.on_commit(lambda: backend.upsert(docs))
+
+
+def remove_objects(objects):
+    backend = get_backend()
+    keys = [document_for(obj)[0] for obj in objects]
+    if backend is _fts5_backend:
+        backend.delete(keys)
+    else:
+        transaction.on_commit(lambda: backend.delete(keys))
+
+
+def rebuild():
+    backend = get_backend()
+    backend.clear()
+    if backend is _memory_backend:
+        backend._ensure_built()
+        return
+    batch = []
+    for doc in iter_all_documents():
+        batch.append(doc)
+        if len(batch) >= 500:
+            backend.upsert(batch)
+            batch = []
+    backend.upsert(batch)
+
+
+def _rank_parents(hits, limit):
+    best = {}
+    for parent_id, score in hits:
+        if parent_id is not None and score > best.get(parent_id, float('-inf')):
+            best[parent_id] = score
+    return sorted(best, key=best.get, reverse=True)[:limit]
+
+
+def search(q, limit=50):
+    """Return ``(resource_ids, quiz_ids)`` ranked best-first for query ``q``."""
+    tokens = tokenize(q)
+    if not tokens:
+        return [], []
+    backend = get_backend()
+    try:
+        resource_hits = backend.query(tokens, RESOURCE_KINDS, limit)
+        quiz_hits = backend.query(tokens, QUIZ_KINDS, limit)
+    except DatabaseError:
+        return [], []
+    return _rank_parents(resource_hits, limit), _rank_parents(quiz_hits, limit)
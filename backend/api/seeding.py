@@ -0,0 +1,256 @@
+"""Synthetic, reproducible datasets for benchmarks and local load testing.
+
+``seed(counts, seed=1)`` fills the database with users, a subject -> topic
+-> chapter taxonomy, tagged resources whose versions carry multi-page
+extracted text, quizzes with questions and choices, graded attempts and
+notifications. The same ``counts`` and ``seed`` always produce the same
+rows. Everything is written with ``bulk_create``, so the derived data that
+signals would normally maintain (score statistics, the search index, cache
+generations) is rebuilt at the end.
+
+``SCALES`` holds the presets used by ``manage.py seed_data`` and
+``manage.py benchmark``.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import analytics, response_cache, search_index, taxonomy
+from .models import (
+    AttemptAnswer, Chapter, Choice, Notification, Question, Quiz, QuizAttempt, Resource, ResourceTag,
+    ResourceVersion, ResourceVersionPage, Subject, Tag, Topic, normalize_file_type,
+)
+
+
+SCALES = {
+    'tiny': dict(users=50, subjects=4, topics_per_subject=3, chapters_per_topic=3, resources=200, pages_per_version=2,
+                 quizzes=20, questions_per_quiz=5, attempts=1_000, answered_attempts=200, notifications=500),
+    'small': dict(users=500, subjects=8, topics_per_subject=5, chapters_per_topic=4, resources=5_000, pages_per_version=3,
+                  quizzes=200, questions_per_quiz=10, attempts=50_000, answered_attempts=5_000, notifications=20_000),
+    'medium': dict(users=5_000, subjects=20, topics_per_subject=8, chapters_per_topic=5, resources=50_000, pages_per_version=4,
+                   quizzes=2_000, questions_per_quiz=15, attempts=1_000_000, answered_attempts=50_000, notifications=200_000),
+    'large': dict(users=50_000, subjects=40, topics_per_subject=12, chapters_per_topic=6, resources=250_000, pages_per_version=5,
+                  quizzes=10_000, questions_per_quiz=20, attempts=5_000_000, answered_attempts=100_000, notifications=1_000_000),
+}
+
+# Real words mixed into the synthetic vocabulary, so searches have something to find.
+TERMS = [
+    'photosynthesis', 'mitochondria', 'algebra', 'equation', 'velocity', 'acceleration', 'molecule', 'electron',
+    'democracy', 'revolution', 'ecosystem', 'probability', 'derivative', 'integral', 'grammar', 'metaphor',
+    'climate', 'volcano', 'genetics', 'evolution', 'geometry', 'triangle', 'fraction', 'energy', 'gravity',
+    'chemistry', 'literature', 'economics', 'inflation', 'programming', 'algorithm', 'database', 'network',
+]
+MIMES = ['application/pdf', 'application/pdf', 'video/mp4', 'image/png', 'application/msword', 'text/plain']
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'qua', 'bri', 'dor', 'fen', 'gul', 'hex', 'jor']
+BATCH_SIZE = 5_000
+WORDS_PER_PAGE = 250
+
+
+class Generator:
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        words = {''.join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 4))) for _ in range(3_000)}
+        self.vocab = TERMS + sorted(words - set(TERMS))
+        # Zipf-like word frequencies, like natural text.
+        self.weights = [1 / (rank + 1) for rank in range(len(self.vocab))]
+
+    def words(self, n):
+        return self.rng.choices(self.vocab, weights=self.weights, k=n)
+
+    def sentence(self, n=12):
+        return ' '.join(self.words(n)).capitalize() + '.'
+
+    def page(self):
+        words = self.words(WORDS_PER_PAGE)
+        return ' '.join(
+            ' '.join(words[i:i + 15]).capitalize() + '.' for i in range(0, len(words), 15)
+        )
+
+
+def scale_counts(scale, **overrides):
+    """The row counts of preset ``scale`` with any non-None ``overrides`` applied."""
+    counts = dict(SCALES[scale])
+    counts.update({name: value for name, value in overrides.items() if name in counts and value is not None})
+    counts['answered_attempts'] = min(counts['answered_attempts'], counts['attempts'])
+    return counts
+
+
+def _batches(total, size=BATCH_SIZE):
+    for offset in range(0, total, size):
+        yield offset, min(size, total - offset)
+
+
+def spread_created_at(models, start, end=None, batch=10_000):
+    """``bulk_create`` stamps every row with "now"; spread ``models``' rows evenly from ``start`` to ``end``."""
+    end = end or timezone.now()
+    for model in models:
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT MIN(id), MAX(id) FROM {table}")
+            low, high = cursor.fetchone()
+        if low is None:
+            continue
+        span = max(1, high - low)
+        for obj_id in range(low, high + 1, batch):
+            model.objects.filter(id__gte=obj_id, id__lt=obj_id + batch).update(
+                created_at=start + (end - start) * ((obj_id - low) / span)
+            )
+
+
+def seed(counts, seed=1, log=lambda message: None):
+    """Create the dataset described by ``counts`` (see ``SCALES``), reporting progress through ``log``."""
+    gen = Generator(seed)
+    rng = gen.rng
+    now = timezone.now()
+    start = now - timedelta(days=365)
+    password = make_password(None)
+
+    log(f"users: {counts['users']}")
+    teacher = User.objects.create(username=f'seed{seed}-teacher', password=password, is_staff=True)
+    students = User.objects.bulk_create(
+        [User(username=f'seed{seed}-student-{i}', password=password) for i in range(counts['users'])],
+        batch_size=BATCH_SIZE,
+    )
+
+    log("taxonomy")
+    subjects = Subject.objects.bulk_create([Subject(name=f'{TERMS[i % len(TERMS)].title()} {seed}.{i}') for i in range(counts['subjects'])])
+    topics = Topic.objects.bulk_create([
+        Topic(subject=subject, name=f'{gen.words(1)[0].title()} {n}')
+        for subject in subjects for n in range(counts['topics_per_subject'])
+    ])
+    chapters = Chapter.objects.bulk_create([
+        Chapter(topic=topic, title=f'Chapter {n + 1}: {" ".join(gen.words(3))}')
+        for topic in topics for n in range(counts['chapters_per_topic'])
+    ])
+    tag_names = TERMS + gen.vocab[len(TERMS):len(TERMS) + 60]
+    Tag.objects.bulk_create([Tag(name=name) for name in tag_names], ignore_conflicts=True)
+    by_name = Tag.objects.in_bulk(tag_names, field_name='name')
+    tags = [by_name[name] for name in tag_names]
+
+    log(f"resources: {counts['resources']} ({counts['pages_per_version']} pages each)")
+    difficulties = [key for key, _ in Resource.DIFFICULTY_CHOICES]
+    for offset, n in _batches(counts['resources'], 2_000):
+        with transaction.atomic():
+            resources = Resource.objects.bulk_create([
+                Resource(
+                    uploader=teacher if rng.random() < 0.5 else rng.choice(students),
+                    chapter=chapter,
+                    topic_id=chapter.topic_id,
+                    subject_id=chapter.topic.subject_id,
+                    title=' '.join(gen.words(4)).title(),
+                    description=gen.sentence(20),
+                    difficulty=rng.choice(difficulties),
+                )
+                for chapter in (rng.choice(chapters) for _ in range(n))
+            ])
+            ResourceTag.objects.bulk_create([
+                ResourceTag(resource=resource, tag=tag)
+                for resource in resources
+                for tag in rng.sample(tags, rng.randint(0, 4))
+            ])
+            versions = []
+            for resource in resources:
+                mime = rng.choice(MIMES)
+                versions.append(ResourceVersion(
+                    resource=resource,
+                    file=f'resources/seed-{resource.pk}.bin',
+                    file_mime=mime,
+                    file_type=normalize_file_type(mime),
+                    extraction_status=ResourceVersion.EXTRACTION_DONE,
+                    page_count=counts['pages_per_version'],
+                ))
+            versions = ResourceVersion.objects.bulk_create(versions)
+            ResourceVersionPage.objects.bulk_create([
+                ResourceVersionPage(version=version, page_number=page, text=gen.page())
+                for version in versions
+                for page in range(1, counts['pages_per_version'] + 1)
+            ], batch_size=BATCH_SIZE)
+
+    log(f"quizzes: {counts['quizzes']} x {counts['questions_per_quiz']} questions")
+    quiz_keys = []
+    for offset, n in _batches(counts['quizzes'], 500):
+        with transaction.atomic():
+            quizzes = Quiz.objects.bulk_create([
+                Quiz(
+                    creator=teacher,
+                    title=' '.join(gen.words(3)).title() + ' quiz',
+                    subject_id=chapter.topic.subject_id,
+                    topic_id=chapter.topic_id,
+                    chapter=chapter,
+                    is_timed=rng.random() < 0.3,
+                    time_limit_seconds=rng.choice([0, 600, 1200]),
+                    randomize_order=rng.random() < 0.5,
+                )
+                for chapter in (rng.choice(chapters) for _ in range(n))
+            ])
+            questions = Question.objects.bulk_create([
+                Question(
+                    quiz=quiz,
+                    text=gen.sentence(10)[:-1] + '?',
+                    question_type='tf' if rng.random() < 0.2 else 'mcq',
+                    difficulty=rng.choice(difficulties),
+                    explanation=gen.sentence(15),
+                )
+                for quiz in quizzes for _ in range(counts['questions_per_quiz'])
+            ], batch_size=BATCH_SIZE)
+            choices = []
+            for question in questions:
+                options = 2 if question.question_type == 'tf' else 4
+                correct = rng.randrange(options)
+                choices.extend(
+                    Choice(question=question, text=' '.join(gen.words(3)), is_correct=i == correct)
+                    for i in range(options)
+                )
+            choices = Choice.objects.bulk_create(choices, batch_size=BATCH_SIZE)
+            by_question = {}
+            for choice in choices:
+                by_question.setdefault(choice.question_id, []).append(choice.pk)
+            by_quiz = {}
+            for question in questions:
+                by_quiz.setdefault(question.quiz_id, []).append((question.pk, by_question[question.pk]))
+            quiz_keys.extend((quiz, by_quiz[quiz.pk]) for quiz in quizzes)
+
+    log(f"attempts: {counts['attempts']} ({counts['answered_attempts']} with answers)")
+    answered = counts['answered_attempts']
+    for offset, n in _batches(counts['attempts'], 10_000):
+        with transaction.atomic():
+            picks = [rng.choice(quiz_keys) for _ in range(n)]
+            attempts = QuizAttempt.objects.bulk_create([
+                QuizAttempt(
+                    quiz=quiz,
+                    student=rng.choice(students),
+                    score=round(rng.betavariate(5, 2) * 100, 1),
+                    time_taken_seconds=rng.randint(60, 1800),
+                )
+                for quiz, _ in picks
+            ], batch_size=BATCH_SIZE)
+            if offset < answered:
+                AttemptAnswer.objects.bulk_create([
+                    AttemptAnswer(attempt=attempt, question_id=question_id, selected_choice_id=choice_id, is_correct=False)
+                    for attempt, (_, key) in zip(attempts[:answered - offset], picks)
+                    for question_id, choice_ids in key
+                    for choice_id in [rng.choice(choice_ids)]
+                ], batch_size=BATCH_SIZE)
+
+    log(f"notifications: {counts['notifications']}")
+    for offset, n in _batches(counts['notifications'], 10_000):
+        Notification.objects.bulk_create([
+            Notification(user=rng.choice(students), title=' '.join(gen.words(4)).capitalize(), body=gen.sentence(), is_read=rng.random() < 0.6)
+            for _ in range(n)
+        ], batch_size=BATCH_SIZE)
+
+    log("dates, statistics and search index")
+    spread_created_at((Resource, Quiz, QuizAttempt, Notification), start, now)
+    analytics.rebuild()
+    with transaction.atomic():
+        search_index.rebuild()
+    taxonomy.bump()
+    response_cache.bump('resources', 'quizzes', 'subjects')
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
@@ -1,41 +1,108 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Subject, Topic, Chapter, Resource, ResourceVersion, Quiz, Question, Choice, QuizAttempt, AttemptAnswer, Homework, HomeworkSubmission, Bookmark, Notification, TopicProgress
+from django.db import transaction
+from .models import Subject, Topic, Chapter, Resource, ResourceVersion, ResourceVersionPage, Quiz, Question, Choice, QuizAttempt, AttemptAnswer, Homework, HomeworkSubmission, Bookmark, Notification, TopicProgress, UploadSession, split_tags
+from .metrics import TimedSerializerMixin
+from .quiz_bulk import ChoiceSyncError, bulk_insert_questions, sync_choices
 
 
-class UserSerializer(serializers.ModelSerializer):
+def _split_param(value):
+    return {part.strip() for part in (value or '').split(',') if part.strip()}
+
+
+class SparseFieldsMixin:
+    """Apply ``?fields=`` and ``?expand=`` to the top-level serializer of a read request.
+
+    Nested fields listed in ``Meta.expandable_fields`` are only built when
+    named in ``expand``; ``fields`` limits the response to the given names.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        expand = _split_param(request.query_params.get('expand'))
+        only = _split_param(request.query_params.get('fields'))
+        for name in getattr(self.Meta, 'expandable_fields', ()):
+            if name not in expand:
+                self.fields.pop(name, None)
+        if only:
+            for name in set(self.fields) - only - expand:
+                self.fields.pop(name)
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["id", "username", "first_name", "last_name", "email"]
 
 
-class SubjectSerializer(serializers.ModelSerializer):
+class SubjectSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Subject
         fields = "__all__"
 
 
-class TopicSerializer(serializers.ModelSerializer):
+class TopicSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Topic
         fields = "__all__"
 
 
-class ChapterSerializer(serializers.ModelSerializer):
+class ChapterSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Chapter
         fields = "__all__"
 
 
-class ResourceVersionSerializer(serializers.ModelSerializer):
+class ResourceVersionSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ResourceVersion
-        fields = ["id", "file", "version_number", "notes", "extracted_text", "file_mime", "created_at"]
-        read_only_fields = ["extracted_text", "file_mime"]
+        fields = ["id", "file", "version_number", "notes", "file_mime", "file_type", "extraction_status", "page_count", "created_at"]
+        read_only_fields = ["file_mime", "file_type", "extraction_status", "page_count"]
+
+
+class ResourceVersionPageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ResourceVersionPage
+        fields = ["page_number", "text"]
+
+
+class UploadSessionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ["id", "resource", "filename", "content_type", "notes", "size", "sha256", "received", "status", "version", "created_at"]
+        read_only_fields = ["received", "status", "version"]
 
+    def validate_size(self, value):
+        if value <= 0 or value > settings.UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(f"size must be 1-{settings.UPLOAD_MAX_BYTES} bytes")
+        return value
 
-class ResourceSerializer(serializers.ModelSerializer):
+    def validate_sha256(self, value):
+        if value and (len(value) != 64 or any(c not in "0123456789abcdefABCDEF" for c in value)):
+            raise serializers.ValidationError("sha256 must be a hex digest")
+        return value.lower()
+
+
+class TagListField(serializers.Field):
+    """Tags as the comma-separated string clients have always sent and received."""
+
+    def to_representation(self, manager):
+        return ", ".join(tag.name for tag in manager.all())
+
+    def to_internal_value(self, data):
+        if not isinstance(data, (str, list)):
+            raise serializers.ValidationError("Expected a comma-separated string or a list of tags.")
+        return split_tags(data)
+
+
+class ResourceSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     versions = ResourceVersionSerializer(many=True, read_only=True)
+    tags = TagListField(required=False)
 
     class Meta:
         model = Resource
@@ -54,16 +121,36 @@ class ResourceSerializer(serializers.ModelSerializer):
             "versions",
         ]
         read_only_fields = ["uploader"]
+        expandable_fields = ["versions"]
+
+    def create(self, validated_data):
+        tags = validated_data.pop("tags", None)
+        with transaction.atomic():
+            resource = super().create(validated_data)
+            if tags:
+                resource.set_tags(tags)
+        return resource
+
+    def update(self, instance, validated_data):
+        tags = validated_data.pop("tags", None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if tags is not None:
+                instance.set_tags(tags)
+        return instance
+
 
+class ChoiceSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # Writable so QuestionSerializer.update can match incoming choices to existing rows.
+    id = serializers.IntegerField(required=False)
 
-class ChoiceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Choice
         fields = ["id", "text", "is_correct"]
         extra_kwargs = {"is_correct": {"write_only": True}}
 
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     choices = ChoiceSerializer(many=True, required=False)
 
     class Meta:
@@ -73,23 +160,27 @@ class QuestionSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         choices_data = validated_data.pop("choices", [])
         question = Question.objects.create(**validated_data)
-        for choice in choices_data:
-            Choice.objects.create(question=question, **choice)
+        Choice.objects.bulk_create([
+            Choice(question=question, text=choice["text"], is_correct=choice.get("is_correct", False))
+            for choice in choices_data
+        ])
         return question
 
     def update(self, instance, validated_data):
         choices_data = validated_data.pop("choices", None)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
-        if choices_data is not None:
-            instance.choices.all().delete()
-            for choice in choices_data:
-                Choice.objects.create(question=instance, **choice)
+        with transaction.atomic():
+            instance.save()
+            if choices_data is not None:
+                try:
+                    sync_choices({instance: choices_data})
+                except ChoiceSyncError as exc:
+                    raise serializers.ValidationError({"choices": [str(exc)]})
         return instance
 
 
-class QuizSerializer(serializers.ModelSerializer):
+class QuizSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, required=False)
 
     class Meta:
@@ -109,59 +200,57 @@ class QuizSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["creator"]
+        expandable_fields = ["questions"]
 
     def create(self, validated_data):
         questions_data = validated_data.pop("questions", [])
         quiz = Quiz.objects.create(**validated_data)
-        for q in questions_data:
-            choices = q.pop("choices", [])
-            question = Question.objects.create(quiz=quiz, **q)
-            for c in choices:
-                Choice.objects.create(question=question, **c)
+        bulk_insert_questions(quiz, questions_data)
         return quiz
 
 
-class AttemptAnswerSerializer(serializers.ModelSerializer):
+class AttemptAnswerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = AttemptAnswer
         fields = ["id", "attempt", "question", "selected_choice", "text_answer", "is_correct"]
         read_only_fields = ["is_correct"]
 
 
-class QuizAttemptSerializer(serializers.ModelSerializer):
+class QuizAttemptSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     answers = AttemptAnswerSerializer(many=True, required=False)
 
     class Meta:
         model = QuizAttempt
         fields = ["id", "quiz", "student", "score", "time_taken_seconds", "answers", "created_at"]
         read_only_fields = ["score"]
+        expandable_fields = ["answers"]
 
 
-class HomeworkSerializer(serializers.ModelSerializer):
+class HomeworkSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Homework
         fields = "__all__"
 
 
-class HomeworkSubmissionSerializer(serializers.ModelSerializer):
+class HomeworkSubmissionSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = HomeworkSubmission
         fields = "__all__"
 
 
-class BookmarkSerializer(serializers.ModelSerializer):
+class BookmarkSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Bookmark
         fields = "__all__"
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = "__all__"
 
 
-class TopicProgressSerializer(serializers.ModelSerializer):
+class TopicProgressSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = TopicProgress
         fields = "__all__"
\ No newline at end of file
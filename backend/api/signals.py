@@ -0,0 +1,192 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import analytics, notifications, quiz_cache, response_cache, retrieval, search_index, storage, taxonomy, vector_store
+from .models import Subject, Topic, Chapter, Resource, ResourceTag, ResourceVersion, Tag, Quiz, Question, Choice, QuizAttempt, HomeworkSubmission, Notification, SubjectScoreStats
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_save, sender=ResourceVersion)
+@receiver(post_save, sender=Quiz)
+@receiver(post_save, sender=Question)
+def index_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search_index.index_objects([instance])
+
+
+@receiver(m2m_changed, sender=ResourceTag)
+def index_on_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        search_index.index_objects([instance])
+    elif pk_set:
+        search_index.index_objects(Resource.objects.filter(pk__in=pk_set).prefetch_related('tags'))
+
+
+@receiver(post_delete, sender=Resource)
+@receiver(post_delete, sender=ResourceVersion)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_delete, sender=Question)
+def unindex_on_delete(sender, instance, **kwargs):
+    search_index.remove_objects([instance])
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_save, sender=ResourceVersion)
+@receiver(post_delete, sender=Resource)
+@receiver(post_delete, sender=ResourceVersion)
+def rebuild_passage_index(sender, raw=False, **kwargs):
+    if raw:
+        return
+    retrieval.schedule_rebuild()
+
+
+@receiver(post_delete, sender=ResourceVersion)
+def remove_version_vectors(sender, instance, **kwargs):
+    # The store is outside the database; a rolled back delete must keep its vectors.
+    version_id = instance.pk
+    transaction.on_commit(lambda: vector_store.remove_versions([version_id]))
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=Topic)
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Subject)
+@receiver(post_delete, sender=Topic)
+@receiver(post_delete, sender=Chapter)
+def bump_taxonomy(sender, **kwargs):
+    taxonomy.bump()
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_save, sender=ResourceVersion)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Resource)
+@receiver(post_delete, sender=ResourceVersion)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=ResourceTag)
+def invalidate_resource_responses(sender, **kwargs):
+    response_cache.bump('resources')
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Choice)
+def invalidate_quiz_responses(sender, **kwargs):
+    response_cache.bump('quizzes')
+
+
+@receiver(post_save, sender=Subject)
+def invalidate_subject_responses(sender, **kwargs):
+    response_cache.bump('subjects')
+
+
+@receiver(post_delete, sender=Subject)
+def invalidate_responses_on_subject_delete(sender, **kwargs):
+    # Resources and quizzes lose their subject through SET_NULL updates, which send no signals.
+    response_cache.bump('subjects', 'resources', 'quizzes')
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def invalidate_quiz(sender, instance, **kwargs):
+    quiz_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_quiz(sender, instance, **kwargs):
+    quiz_cache.invalidate(instance.quiz_id)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def invalidate_choice_quiz(sender, instance, **kwargs):
+    quiz_id = Question.objects.filter(id=instance.question_id).values_list('quiz_id', flat=True).first()
+    quiz_cache.invalidate(quiz_id)
+
+
+@receiver(post_save, sender=QuizAttempt)
+def update_stats_on_attempt_save(sender, instance, created, raw=False, **kwargs):
+    # Attempts graded through QuizViewSet are bulk-created and recorded by
+    # api.grading; this covers attempts written one at a time elsewhere.
+    if raw:
+        return
+    if created:
+        analytics.record_attempts([instance], instance.quiz.subject_id)
+    else:
+        analytics.schedule_rebuild([instance.student_id])
+
+
+@receiver(post_delete, sender=QuizAttempt)
+def update_stats_on_attempt_delete(sender, instance, **kwargs):
+    analytics.schedule_rebuild([instance.student_id])
+
+
+@receiver(pre_delete, sender=Subject)
+def rebuild_stats_on_subject_delete(sender, instance, **kwargs):
+    # The quizzes keep their attempts (Quiz.subject is SET_NULL) while the
+    # stats rows cascade away; rebuild them into the no-subject bucket.
+    analytics.schedule_rebuild(list(SubjectScoreStats.objects.filter(subject=instance).values_list('user_id', flat=True)))
+
+
+@receiver(pre_save, sender=Quiz)
+def remember_quiz_subject(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._previous_subject_id = Quiz.objects.filter(pk=instance.pk).values_list('subject_id', flat=True).first()
+
+
+@receiver(post_save, sender=Quiz)
+def move_stats_on_subject_change(sender, instance, **kwargs):
+    if '_previous_subject_id' not in instance.__dict__:
+        return
+    if instance.__dict__.pop('_previous_subject_id') != instance.subject_id:
+        analytics.schedule_rebuild(list(
+            QuizAttempt.objects.filter(quiz=instance).order_by().values_list('student_id', flat=True).distinct()
+        ))
+
+
+@receiver(pre_save, sender=ResourceVersion)
+@receiver(pre_save, sender=HomeworkSubmission)
+def remember_replaced_file(sender, instance, raw=False, **kwargs):
+    # A new, not yet stored upload on an existing row replaces the old blob.
+    if raw or instance.pk is None or not instance.file or instance.file._committed:
+        return
+    instance._replaced_file = sender.objects.filter(pk=instance.pk).values_list('file', flat=True).first()
+
+
+@receiver(post_save, sender=ResourceVersion)
+@receiver(post_save, sender=HomeworkSubmission)
+def release_replaced_file(sender, instance, raw=False, **kwargs):
+    old_name = instance.__dict__.pop('_replaced_file', None)
+    if old_name and old_name != instance.file.name:
+        storage.release(old_name)
+
+
+@receiver(post_delete, sender=ResourceVersion)
+@receiver(post_delete, sender=HomeworkSubmission)
+def release_file(sender, instance, **kwargs):
+    if instance.file:
+        storage.release(instance.file.name)
+
+
+@receiver(post_save, sender=Notification)
+def announce_notification(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        notifications.announce(instance)
+    else:
+        notifications.forget_unread(instance.user_id)
+
+
+@receiver(post_delete, sender=Notification)
+def forget_unread_on_delete(sender, instance, **kwargs):
+    notifications.forget_unread(instance.user_id)
@@ -0,0 +1,150 @@
+"""Content-addressed, reference-counted file storage.
+
+Uploads are hashed (SHA-256) while they are streamed to a temporary file
+and then moved to ``blobs/<aa>/<bb>/<sha256><ext>`` under ``MEDIA_ROOT``.
+Identical uploads therefore end up with the same name and share one file on
+disk; ``StoredBlob`` counts how many rows reference each blob, and the file
+is deleted when the last reference is released.
+
+Taking a reference and deleting an unused file both hold the blob's row lock
+while they look at the disk, so a new upload of the same content can't reuse
+a file that is being deleted. References are taken inside the saving model's
+transaction (see ``models.BlobFileModel``) and roll back with it.
+
+Because equal names mean equal content, other code can find duplicates by
+comparing ``FileField`` names (see ``extraction.queue_extraction``).
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+
+BLOB_PREFIX = 'blobs/'
+
+
+def blob_name(digest, ext):
+    return f"{BLOB_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}"
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def _save(self, name, content):
+        _, ext = os.path.splitext(name)
+        tmp_dir = os.path.dirname(self.temp_path('x'))
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            return self.place(tmp_path, digest.hexdigest(), ext, size)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def place(self, tmp_path, digest, ext, size):
+        """Move the fully written ``tmp_path`` to its blob name and take a reference to it."""
+        name = blob_name(digest, ext[:16])
+        with transaction.atomic():
+            # Count the reference first: the UPDATE/INSERT locks the row, so a
+            # pending delete_if_unused() either finished (file gone) or will see it.
+            retain(name, size)
+            self.move_into_place(tmp_path, name)
+        return name
+
+    def move_into_place(self, tmp_path, name):
+        """Rename ``tmp_path`` to the blob ``name``, or drop it if that blob already exists.
+
+        The caller must hold a reference to ``name`` (see ``retain``).
+        """
+        path = self.path(name)
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            os.replace(tmp_path, path)
+
+    def temp_path(self, filename):
+        """A path in the blob scratch directory (same filesystem, so ``place`` is a rename)."""
+        tmp_dir = self.path(BLOB_PREFIX + 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        return os.path.join(tmp_dir, filename)
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save().
+        return name
+
+
+def blob_storage():
+    return _storage
+
+
+_storage = ContentAddressedStorage()
+
+
+def retain(name, size=0):
+    """Record one more reference to the blob ``name``."""
+    from .models import StoredBlob
+
+    if StoredBlob.objects.filter(name=name).update(refcount=F('refcount') + 1):
+        return
+    try:
+        with transaction.atomic():
+            StoredBlob.objects.create(name=name, size=size, refcount=1)
+    except IntegrityError:
+        StoredBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+def release(name):
+    """Drop one reference to ``name``; delete the file once nothing refers to it."""
+    from .models import StoredBlob
+
+    if not is_blob(name):
+        return
+    StoredBlob.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+
+    def delete_if_unused():
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(name=name, refcount__lte=0).first()
+            if blob is None:
+                return
+            # Conditional again, for backends without row locks (SQLite): a
+            # reference taken since the SELECT keeps the row and the file.
+            deleted, _ = StoredBlob.objects.filter(pk=blob.pk, refcount__lte=0).delete()
+            if deleted:
+                _storage.delete(name)
+
+    transaction.on_commit(delete_if_unused)
+
+
+def referenced_names():
+    """Blob names currently referenced by model rows, with their reference counts."""
+    from .models import HomeworkSubmission, ResourceVersion
+
+    counts = {}
+    for model in (ResourceVersion, HomeworkSubmission):
+        for name in model.objects.filter(file__startswith=BLOB_PREFIX).values_list('file', flat=True).iterator():
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def blob_root():
+    return os.path.join(settings.MEDIA_ROOT, BLOB_PREFIX)
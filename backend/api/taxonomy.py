@@ -0,0 +1,84 @@
+"""The subject -> topic -> chapter tree, cached under a version number.
+
+``get_tree`` builds the whole tree from one LEFT JOIN query and caches it
+keyed by the current taxonomy version; any save or delete of a Subject,
+Topic or Chapter bumps the version (see ``signals``), so stale trees are
+never read and simply expire. The version doubles as the endpoint's ETag.
+
+On the process-local ``LocMemCache`` a bump only reaches the worker that
+made the edit, so there the version and the trees expire after
+``LOCAL_CACHE_TIMEOUT`` seconds and other workers catch up by then.
+"""
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .models import Subject
+
+
+VERSION_KEY = 'taxonomy:version'
+TREE_TIMEOUT = 24 * 60 * 60
+LOCAL_CACHE_TIMEOUT = 30
+
+
+def _timeout(timeout):
+    return LOCAL_CACHE_TIMEOUT if isinstance(caches['default'], LocMemCache) else timeout
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock so a cleared cache never reissues an old ETag.
+        cache.add(VERSION_KEY, time.time_ns(), _timeout(None))
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump():
+    def incr():
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            current_version()
+
+    incr()
+    # A reader may cache the old rows under the new version before the
+    # writing transaction commits; move past that entry once it has.
+    transaction.on_commit(incr)
+
+
+def etag(version):
+    return f'"taxonomy-{version}"'
+
+
+def build_tree():
+    rows = Subject.objects.values_list(
+        'id', 'name', 'topics__id', 'topics__name', 'topics__chapters__id', 'topics__chapters__title',
+    ).order_by('name', 'topics__name', 'topics__chapters__title')
+    subjects = []
+    topics = {}
+    for subject_id, subject_name, topic_id, topic_name, chapter_id, chapter_title in rows:
+        if not subjects or subjects[-1]['id'] != subject_id:
+            subjects.append({'id': subject_id, 'name': subject_name, 'topics': []})
+        if topic_id is None:
+            continue
+        topic = topics.get(topic_id)
+        if topic is None:
+            topic = topics[topic_id] = {'id': topic_id, 'name': topic_name, 'chapters': []}
+            subjects[-1]['topics'].append(topic)
+        if chapter_id is not None:
+            topic['chapters'].append({'id': chapter_id, 'title': chapter_title})
+    return subjects
+
+
+def get_tree(version=None):
+    """Return ``(version, tree)``, building the tree on a cache miss."""
+    version = version if version is not None else current_version()
+    key = f'taxonomy:tree:{version}'
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_tree()
+        cache.set(key, tree, _timeout(TREE_TIMEOUT))
+    return version, tree
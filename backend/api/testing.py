@@ -0,0 +1,46 @@
+import math
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountAssertionsMixin:
+    """TestCase mixin for checking that an endpoint's query count is independent of row count."""
+
+    def assertConstantQueries(self, url, make_row, sizes=(1, 10), expected=None, client=None):
+        """GET ``url`` after growing the data set to each of ``sizes`` rows.
+
+        ``make_row(i)`` must add the i-th row (with whatever children the
+        endpoint renders). Fails if the query count differs between sizes,
+        or from ``expected`` when given. Returns the observed count.
+        """
+        client = client or self.client
+        counts = []
+        created = 0
+        for size in sizes:
+            while created < size:
+                make_row(created)
+                created += 1
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url)
+            self.assertEqual(response.status_code, 200, f"GET {url} returned {response.status_code}")
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(
+            len(set(counts)), 1,
+            f"GET {url} ran {dict(zip(sizes, counts))} queries for {sizes} rows",
+        )
+        if expected is not None:
+            self.assertEqual(counts[0], expected, f"GET {url} ran {counts[0]} queries, expected {expected}")
+        return counts[0]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank ``pct``-th percentile of ``sorted_values`` (0.0 when empty).
+
+    Shared by ``manage.py benchmark`` and ``manage.py loadtest`` so their
+    p50/p95/p99 figures can be compared.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
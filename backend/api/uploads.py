@@ -0,0 +1,141 @@
+"""Resumable chunked uploads.
+
+A client creates an ``UploadSession`` (file name, size and optionally the
+SHA-256 of the whole file), then PUTs the file in chunks at increasing
+offsets, each with the hex SHA-256 of the chunk in ``X-Chunk-SHA256``. A
+chunk is written with ``pwrite`` straight into a part file in the blob
+scratch directory under ``MEDIA_ROOT``; the session's ``received`` offset
+only advances once the chunk's checksum matched, so a dropped or corrupted
+chunk is simply sent again from the last acknowledged offset.
+
+Finalizing first moves the session to ``finalizing`` under its row lock,
+which ``write_chunk`` holds while it writes, so no chunk can land while the
+part file is hashed. The ``ResourceVersion`` and its blob reference are then
+created, and once they are committed the part file is renamed into
+content-addressed storage (no copy).
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import extraction
+from .models import ResourceVersion, UploadSession
+from .storage import blob_name, blob_storage, retain
+
+
+READ_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, detail, status=400, **extra):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+        self.extra = extra
+
+
+def part_path(session):
+    return blob_storage().temp_path(session.part_name)
+
+
+def write_chunk(session, offset, stream, length, checksum):
+    """Write ``length`` bytes from ``stream`` at ``offset``; returns the new acknowledged offset."""
+    if length <= 0 or length > settings.UPLOAD_CHUNK_MAX_BYTES:
+        raise UploadError(f"chunk length must be 1-{settings.UPLOAD_CHUNK_MAX_BYTES} bytes")
+    if not checksum:
+        raise UploadError("X-Chunk-SHA256 header is required")
+
+    with transaction.atomic():
+        # Held until the chunk is written: finalize() waits for it, and a chunk
+        # arriving after finalize() started sees the new status.
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status != UploadSession.STATUS_UPLOADING:
+            raise UploadError("upload is already finalized", status=409)
+        if offset < 0 or offset > session.received:
+            raise UploadError("chunk does not continue the upload", status=409, offset=session.received)
+        if offset + length > session.size:
+            raise UploadError("chunk extends past the declared file size")
+
+        digest = hashlib.sha256()
+        written = 0
+        fd = os.open(part_path(session), os.O_WRONLY | os.O_CREAT, 0o600)
+        try:
+            while written < length:
+                data = stream.read(min(READ_SIZE, length - written))
+                if not data:
+                    break
+                digest.update(data)
+                os.pwrite(fd, data, offset + written)
+                written += len(data)
+        finally:
+            os.close(fd)
+        if written != length:
+            raise UploadError("chunk body is shorter than Content-Length", offset=session.received)
+        if digest.hexdigest() != checksum.lower():
+            raise UploadError("chunk checksum mismatch", offset=session.received)
+
+        # Chunks may be retried or overlap; the offset only ever moves forward.
+        received = max(session.received, offset + length)
+        UploadSession.objects.filter(pk=session.pk).update(received=received, updated_at=timezone.now())
+    return received
+
+
+def finalize(session):
+    """Move the completed part file into blob storage and create the resource version."""
+    with transaction.atomic():
+        locked = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if locked.status != UploadSession.STATUS_UPLOADING:
+            raise UploadError("upload is already finalized", status=409)
+        if locked.received != locked.size:
+            raise UploadError("upload is incomplete", status=409, offset=locked.received)
+        locked.status = UploadSession.STATUS_FINALIZING
+        locked.save(update_fields=['status', 'updated_at'])
+
+    try:
+        path = part_path(locked)
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(READ_SIZE), b''):
+                digest.update(block)
+        if locked.sha256 and digest.hexdigest() != locked.sha256.lower():
+            raise UploadError("file checksum mismatch")
+
+        _, ext = os.path.splitext(locked.filename)
+        name = blob_name(digest.hexdigest(), ext[:16])
+        with transaction.atomic():
+            retain(name, locked.size)
+            latest = ResourceVersion.objects.filter(resource_id=locked.resource_id).aggregate(v=Max('version_number'))['v'] or 0
+            version = ResourceVersion.objects.create(
+                resource_id=locked.resource_id,
+                file=name,
+                file_mime=locked.content_type,
+                notes=locked.notes,
+                version_number=latest + 1,
+            )
+            locked.status = UploadSession.STATUS_COMPLETE
+            locked.version = version
+            locked.save(update_fields=['status', 'version', 'updated_at'])
+            # Only once the version is committed: if it rolls back, the part
+            # file is still there for the next finalize.
+            transaction.on_commit(lambda: blob_storage().move_into_place(path, name))
+    except BaseException:
+        # Let the client fix the upload (re-send chunks) and finalize again.
+        UploadSession.objects.filter(pk=locked.pk, status=UploadSession.STATUS_FINALIZING).update(
+            status=UploadSession.STATUS_UPLOADING,
+        )
+        raise
+    session.status, session.version = locked.status, version
+    extraction.queue_extraction(version)
+    return version
+
+
+def discard(session):
+    """Remove the part file of an unfinished session."""
+    try:
+        os.unlink(part_path(session))
+    except FileNotFoundError:
+        pass
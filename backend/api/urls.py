@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken.views import obtain_auth_token
+from . import async_views
 from .views import (
 	SubjectViewSet, TopicViewSet, ChapterViewSet, ResourceViewSet, ResourceVersionViewSet,
 	QuizViewSet, QuestionViewSet, QuizAttemptViewSet, HomeworkViewSet, HomeworkSubmissionViewSet,
-	BookmarkViewSet, NotificationViewSet, TopicProgressViewSet, me, search, dashboard, generate_questions, ai_chat
+	BookmarkViewSet, NotificationViewSet, TopicProgressViewSet, UploadSessionViewSet, me, search, taxonomy_tree, cache_stats, dashboard, generate_questions, ai_chat
 )
 
 router = DefaultRouter()
@@ -21,13 +22,20 @@ router.register(r'submissions', HomeworkSubmissionViewSet)
 router.register(r'bookmarks', BookmarkViewSet)
 router.register(r'notifications', NotificationViewSet)
 router.register(r'progress', TopicProgressViewSet)
+router.register(r'uploads', UploadSessionViewSet)
 
 urlpatterns = [
 	path('auth/me/', me, name='me'),
 	path('auth/token/', obtain_auth_token),
-	path('search/', search),
+	path('search/', search, name='search'),
+	path('taxonomy/', taxonomy_tree),
 	path('dashboard/', dashboard),
+	path('cache/stats/', cache_stats),
 	path('ai/generate-questions/', generate_questions),
 	path('ai/chat/', ai_chat),
+	path('async/quizzes/<int:pk>/take/', async_views.take),
+	path('async/search/', async_views.search),
+	path('async/notifications/', async_views.notifications),
+	path('async/notifications/stream/', async_views.notification_stream),
 	path('', include(router.urls)),
 ]
\ No newline at end of file
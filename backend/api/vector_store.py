@@ -0,0 +1,370 @@
+"""Memory-mapped passage vectors for semantic lookup.
+
+Passages (see ``retrieval.split_passages``) are embedded with a signed
+hashing vectorizer over word unigrams and bigrams, so no model download or
+network access is needed. The store lives in ``settings.VECTOR_STORE_DIR``:
+
+    vectors.f32   row-major float32 matrix, ``DIM`` columns, L2-normalised
+    rows.i64      int64 id map, one row of ``ROW_FIELDS`` per vector
+    texts.bin     UTF-8 passage texts, sliced with each row's text offsets
+    format        ``FORMAT``; a store written in another layout is discarded
+
+The files are opened with ``np.memmap``, so every worker process shares the
+same page-cache pages, and a hit's text is read from ``texts.bin`` rather
+than re-splitting its version's pages. Writers (append, tombstone, compact)
+hold an exclusive ``flock`` on ``lock``. Appends only ever grow the files
+(texts first, rows last), deletes clear the row's ``alive`` flag in place,
+and compaction rewrites the files and swaps them in with ``os.replace``;
+readers notice a changed size or inode and remap.
+"""
+import logging
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .jobs import enqueue_once, job_handler
+from .models import ResourceVersion
+from .retrieval import split_passages
+from .search_index import tokenize
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+try:
+    import fcntl
+except Exception:
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+FORMAT = '2'
+DIM = 1024
+ROW_FIELDS = ('version_id', 'resource_id', 'subject_id', 'topic_id', 'chapter_id', 'passage', 'alive', 'text_start', 'text_end')
+VERSION, RESOURCE, SUBJECT, TOPIC, CHAPTER, PASSAGE, ALIVE, TEXT_START, TEXT_END = range(len(ROW_FIELDS))
+COMPACT_DEAD_RATIO = 0.25
+QUERY_BLOCK_ROWS = 65536
+
+
+def embed(texts):
+    """Hash ``texts`` into an ``(len(texts), DIM)`` float32 matrix of unit rows."""
+    matrix = np.zeros((len(texts), DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        tokens = tokenize(text)
+        features = tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+        if not features:
+            continue
+        hashes = np.fromiter((zlib.crc32(f.encode('utf-8')) for f in features), dtype=np.uint32, count=len(features))
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        np.add.at(matrix[row], hashes % DIM, signs)
+    # Sublinear term frequency, then L2 normalisation so a dot product is a cosine.
+    np.copysign(np.log1p(np.abs(matrix)), matrix, out=matrix)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def _paths(directory):
+    return (
+        os.path.join(directory, 'vectors.f32'),
+        os.path.join(directory, 'rows.i64'),
+        os.path.join(directory, 'lock'),
+    )
+
+
+def _texts_path(directory):
+    return os.path.join(directory, 'texts.bin')
+
+
+def _format_path(directory):
+    return os.path.join(directory, 'format')
+
+
+def _read_format(directory):
+    try:
+        with open(_format_path(directory)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+@contextmanager
+def _write_lock(directory):
+    os.makedirs(directory, exist_ok=True)
+    with open(_paths(directory)[2], 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if _read_format(directory) != FORMAT:
+                if os.path.exists(_paths(directory)[1]):
+                    logger.warning("Discarding the vector store in %s (older format); run compact_vector_store --rebuild", directory)
+                _reset(directory)
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _reset(directory):
+    """Drop the store's files and start an empty one in the current ``FORMAT``."""
+    vectors_path, rows_path, _ = _paths(directory)
+    for path in (vectors_path, rows_path, _texts_path(directory)):
+        if os.path.exists(path):
+            os.unlink(path)
+    with open(_format_path(directory), 'w') as f:
+        f.write(FORMAT)
+
+
+class Hit:
+    __slots__ = ('score', 'version_id', 'resource_id', 'passage', 'text')
+
+    def __init__(self, score, version_id, resource_id, passage, text=''):
+        self.score = score
+        self.version_id = version_id
+        self.resource_id = resource_id
+        self.passage = passage
+        self.text = text
+
+
+class VectorStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self._signature = None
+        self._vectors = self._rows = self._texts = None
+        self._lock = threading.Lock()
+
+    # -- reading --------------------------------------------------------
+
+    def _stat(self):
+        vectors_path, rows_path, _ = _paths(self.directory)
+        try:
+            v, r, t = os.stat(vectors_path), os.stat(rows_path), os.stat(_texts_path(self.directory))
+        except OSError:
+            return None
+        if _read_format(self.directory) != FORMAT:
+            return None
+        return (v.st_ino, v.st_size, r.st_ino, r.st_size, t.st_ino, t.st_size)
+
+    def _mapped(self):
+        """Return ``(vectors, rows, texts)`` memmaps, remapping if a writer changed the files."""
+        signature = self._stat()
+        if signature != self._signature:
+            with self._lock:
+                if signature is None:
+                    self._vectors = self._rows = self._texts = None
+                else:
+                    vectors_path, rows_path, _ = _paths(self.directory)
+                    # A concurrent append may have written vectors before rows;
+                    # only expose rows present in both files.
+                    n = min(signature[1] // (DIM * 4), signature[3] // (len(ROW_FIELDS) * 8))
+                    if n:
+                        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode='r', shape=(n, DIM))
+                        self._rows = np.memmap(rows_path, dtype=np.int64, mode='r', shape=(n, len(ROW_FIELDS)))
+                        self._texts = np.memmap(_texts_path(self.directory), dtype=np.uint8, mode='r') \
+                            if signature[5] else np.zeros(0, dtype=np.uint8)
+                    else:
+                        self._vectors = self._rows = self._texts = None
+                self._signature = signature
+        return self._vectors, self._rows, self._texts
+
+    def __len__(self):
+        _, rows, _ = self._mapped()
+        return 0 if rows is None else int(rows[:, ALIVE].sum())
+
+    def search_many(self, queries, k=10, subject_id=None, topic_id=None, chapter_id=None):
+        """Top-``k`` cosine matches for each query text, as a list of ``[Hit, ...]``."""
+        vectors, rows, texts = self._mapped()
+        if vectors is None or not queries:
+            return [[] for _ in queries]
+        q = embed(queries)
+        mask = rows[:, ALIVE] == 1
+        for column, value in ((SUBJECT, subject_id), (TOPIC, topic_id), (CHAPTER, chapter_id)):
+            if value:
+                mask &= rows[:, column] == int(value)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        # Score in blocks so one query never materialises the full similarity
+        # matrix, keeping the running top-k per query.
+        for start in range(0, len(vectors), QUERY_BLOCK_ROWS):
+            block = slice(start, start + QUERY_BLOCK_ROWS)
+            scores = q @ vectors[block].T
+            scores[:, ~mask[block]] = -np.inf
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        results = []
+        for scores, row_ids in zip(best_scores, best_rows):
+            order = np.argsort(-scores, kind='stable')
+            results.append([
+                Hit(
+                    float(scores[i]), int(row[VERSION]), int(row[RESOURCE]), int(row[PASSAGE]),
+                    bytes(texts[row[TEXT_START]:row[TEXT_END]]).decode('utf-8'),
+                )
+                for i in order
+                if scores[i] > 0
+                for row in [rows[row_ids[i]]]
+            ])
+        return results
+
+    def search(self, query, **kwargs):
+        return self.search_many([query], **kwargs)[0]
+
+    # -- writing --------------------------------------------------------
+
+    def _tombstone(self, version_ids):
+        _, rows_path, _ = _paths(self.directory)
+        if not os.path.exists(rows_path) or not os.path.getsize(rows_path):
+            return 0, 0
+        rows = np.memmap(rows_path, dtype=np.int64, mode='r+').reshape(-1, len(ROW_FIELDS))
+        hit = np.isin(rows[:, VERSION], list(version_ids)) & (rows[:, ALIVE] == 1)
+        rows[hit, ALIVE] = 0
+        rows.flush()
+        total = len(rows)
+        dead = total - int(rows[:, ALIVE].sum())
+        del rows
+        return dead, total
+
+    def add_version(self, version):
+        """Embed the passages of ``version``, replacing any vectors stored for it before."""
+        resource = version.resource
+        passages = split_passages(version.extracted_text)
+        vectors = embed(passages) if passages else None
+        encoded = [passage.encode('utf-8') for passage in passages]
+        vectors_path, rows_path, _ = _paths(self.directory)
+        with _write_lock(self.directory):
+            self._tombstone([version.id])
+            if vectors is None:
+                return 0
+            with open(_texts_path(self.directory), 'ab') as f:
+                start = f.tell()
+                f.write(b''.join(encoded))
+            ends = start + np.cumsum([len(text) for text in encoded])
+            rows = np.array(
+                [
+                    (version.id, resource.id, resource.subject_id or 0, resource.topic_id or 0, resource.chapter_id or 0,
+                     i, 1, end - len(encoded[i]), end)
+                    for i, end in enumerate(ends.tolist())
+                ],
+                dtype=np.int64,
+            )
+            with open(vectors_path, 'ab') as f:
+                f.write(vectors.tobytes())
+            with open(rows_path, 'ab') as f:
+                f.write(rows.tobytes())
+        return len(passages)
+
+    def remove_versions(self, version_ids):
+        """Tombstone the vectors of ``version_ids``; returns the dead fraction of the store."""
+        if not os.path.exists(_paths(self.directory)[1]):
+            return 0.0
+        with _write_lock(self.directory):
+            dead, total = self._tombstone(version_ids)
+        return dead / total if total else 0.0
+
+    def compact(self):
+        """Rewrite the store without tombstoned rows. Returns the number of rows kept."""
+        vectors_path, rows_path, _ = _paths(self.directory)
+        with _write_lock(self.directory):
+            if not os.path.exists(rows_path):
+                return 0
+            rows = np.fromfile(rows_path, dtype=np.int64).reshape(-1, len(ROW_FIELDS))
+            n = min(len(rows), os.path.getsize(vectors_path) // (DIM * 4))
+            rows = rows[:n]
+            vectors = np.memmap(vectors_path, dtype=np.float32, mode='r', shape=(n, DIM)) if n else np.zeros((0, DIM), np.float32)
+            alive = np.flatnonzero(rows[:, ALIVE] == 1)
+            texts_path = _texts_path(self.directory)
+            tmp_vectors, tmp_rows, tmp_texts = vectors_path + '.tmp', rows_path + '.tmp', texts_path + '.tmp'
+            with open(tmp_vectors, 'wb') as f:
+                for start in range(0, len(alive), QUERY_BLOCK_ROWS):
+                    f.write(np.ascontiguousarray(vectors[alive[start:start + QUERY_BLOCK_ROWS]]).tobytes())
+            kept = rows[alive]
+            with open(texts_path, 'rb') as old, open(tmp_texts, 'wb') as new:
+                offset = 0
+                for row in kept:
+                    old.seek(row[TEXT_START])
+                    new.write(old.read(row[TEXT_END] - row[TEXT_START]))
+                    row[TEXT_START], row[TEXT_END] = offset, offset + row[TEXT_END] - row[TEXT_START]
+                    offset = row[TEXT_END]
+            kept.tofile(tmp_rows)
+            del vectors
+            os.replace(tmp_texts, texts_path)
+            os.replace(tmp_vectors, vectors_path)
+            os.replace(tmp_rows, rows_path)
+        return len(alive)
+
+    def rebuild(self):
+        """Discard the store and embed every extracted version again."""
+        with _write_lock(self.directory):
+            _reset(self.directory)
+        versions = (
+            ResourceVersion.objects.filter(extraction_status=ResourceVersion.EXTRACTION_DONE)
+            .select_related('resource')
+            .prefetch_related('pages')
+        )
+        return sum(self.add_version(version) for version in versions.iterator(chunk_size=100))
+
+
+_stores = {}
+
+
+def get_store():
+    """The store for ``settings.VECTOR_STORE_DIR``, or None when numpy is unavailable."""
+    if np is None:
+        return None
+    directory = str(settings.VECTOR_STORE_DIR)
+    store = _stores.get(directory)
+    if store is None:
+        store = _stores.setdefault(directory, VectorStore(directory))
+    return store
+
+
+def search(query, **kwargs):
+    """Semantic hits for ``query``, or None when the store is unavailable or empty."""
+    store = get_store()
+    if store is None or not len(store):
+        return None
+    return store.search(query, **kwargs)
+
+
+def passage_texts(hits):
+    """The text of each hit's passage, as stored when it was embedded."""
+    return [hit.text for hit in hits]
+
+
+def add_version(version):
+    store = get_store()
+    if store is not None:
+        store.add_version(version)
+
+
+def remove_versions(version_ids):
+    store = get_store()
+    if store is not None and store.remove_versions(version_ids) > COMPACT_DEAD_RATIO:
+        enqueue_once('compact_vector_store')
+
+
+@job_handler('embed_version')
+def run_embedding(payload, executor=None):
+    # Queued by extraction.save_pages; the version may be gone or re-extracting by now.
+    version = (
+        ResourceVersion.objects.filter(pk=payload['version_id'], extraction_status=ResourceVersion.EXTRACTION_DONE)
+        .select_related('resource')
+        .first()
+    )
+    if version is not None:
+        add_version(version)
+
+
+@job_handler('compact_vector_store')
+def run_compaction(payload, executor=None):
+    store = get_store()
+    if store is not None:
+        store.compact()
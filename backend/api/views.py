@@ -1,10 +1,19 @@
-from django.db.models import Max, Q, Avg
+import os
+import time
+from datetime import timedelta
+
+from django.db.models import Count, Exists, Max, OuterRef, Q, Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.text import slugify
 from django.contrib.auth.models import User
-from rest_framework import viewsets, permissions, status
+from rest_framework import mixins, viewsets, permissions, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.parsers import MultiPartParser, FormParser
-from .models import Subject, Topic, Chapter, Resource, ResourceVersion, Quiz, Question, Choice, QuizAttempt, AttemptAnswer, Homework, HomeworkSubmission, Bookmark, Notification, TopicProgress
+from .models import Subject, Topic, Chapter, Resource, ResourceVersion, Quiz, Question, QuizAttempt, Homework, HomeworkSubmission, Bookmark, Notification, TopicProgress, SubjectScoreStats, WeeklyScoreStats, UploadSession, ResourceTag, normalize_file_type, normalize_tag, split_tags
 from .serializers import (
 	UserSerializer,
 	SubjectSerializer,
@@ -12,6 +21,7 @@ from .serializers import (
 	ChapterSerializer,
 	ResourceSerializer,
 	ResourceVersionSerializer,
+	ResourceVersionPageSerializer,
 	QuizSerializer,
 	QuestionSerializer,
 	QuizAttemptSerializer,
@@ -20,12 +30,11 @@ from .serializers import (
 	BookmarkSerializer,
 	NotificationSerializer,
 	TopicProgressSerializer,
+	UploadSessionSerializer,
 )
-
-try:
-	from PyPDF2 import PdfReader
-except Exception:
-	PdfReader = None
+from . import analytics, downloads, extraction, facets, grading, jobs, notifications, question_bank, question_generation, quiz_bulk, quiz_cache, response_cache, retrieval, search_index, taxonomy, uploads, vector_store
+from .pagination import NameCursorPagination
+from .prefetch import PrefetchPlanMixin, plan_for_serializer
 
 
 @api_view(["GET"])
@@ -38,38 +47,87 @@ def me(request):
 @permission_classes([permissions.AllowAny])
 def search(request):
 	q = request.GET.get('q', '').strip()
-	resources = Resource.objects.all()
-	if q:
-		resources = resources.filter(
-			Q(title__icontains=q) |
-			Q(description__icontains=q) |
-			Q(tags__icontains=q) |
-			Q(versions__extracted_text__icontains=q)
-		).distinct()
-	quizzes = Quiz.objects.filter(Q(title__icontains=q) | Q(questions__text__icontains=q)).distinct()
+	# The serializers render every version and every question's choices.
+	resource_qs = plan_for_serializer(ResourceSerializer()).apply(Resource.objects.all())
+	quiz_qs = plan_for_serializer(QuizSerializer()).apply(Quiz.objects.all())
+	if not q:
+		resources = list(resource_qs[:50])
+		quizzes = list(quiz_qs[:50])
+	else:
+		resource_ids, quiz_ids = search_index.search(q, limit=50)
+		if request.GET.get('semantic') in ('1', 'true'):
+			hits = vector_store.search(q, k=200) or []
+			resource_ids = list(dict.fromkeys(hit.resource_id for hit in hits))[:50] or resource_ids
+		resources = _in_rank_order(resource_qs, resource_ids)
+		quizzes = _in_rank_order(quiz_qs, quiz_ids)
 	return Response({
-		"resources": ResourceSerializer(resources[:50], many=True).data,
-		"quizzes": QuizSerializer(quizzes[:50], many=True).data,
+		"resources": ResourceSerializer(resources, many=True).data,
+		"quizzes": QuizSerializer(quizzes, many=True).data,
 	})
 
 
+def _in_rank_order(queryset, ids):
+	objs = queryset.in_bulk(ids)
+	return [objs[i] for i in ids if i in objs]
+
+
+@api_view(["GET"])
+@permission_classes([permissions.AllowAny])
+def taxonomy_tree(request):
+	version = taxonomy.current_version()
+	etag = taxonomy.etag(version)
+	response = get_conditional_response(request, etag=etag)
+	if response is None:
+		_, tree = taxonomy.get_tree(version)
+		response = Response(tree)
+	response['ETag'] = etag
+	response['Cache-Control'] = 'public, no-cache'
+	return response
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAdminUser])
+def cache_stats(request):
+	return Response(response_cache.stats())
+
+
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated])
 def dashboard(request):
 	user = request.user
-	attempts = QuizAttempt.objects.filter(student=user)
-	avg_score = attempts.aggregate(s=Avg('score')).get('s') or 0
-	by_subject = (
-		attempts
-		.values('quiz__subject__name')
-		.annotate(avg=Avg('score'))
-		.order_by('quiz__subject__name')
-	)
-	return Response({
-		"avg_score": avg_score,
-		"subjects": list(by_subject),
-		"num_attempts": attempts.count(),
-	})
+	stats = list(SubjectScoreStats.objects.filter(user=user).select_related('subject').order_by('subject__name'))
+	num_attempts = sum(s.attempts_count for s in stats)
+	total_score = sum(s.score_sum for s in stats)
+	data = {
+		"avg_score": total_score / num_attempts if num_attempts else 0,
+		"subjects": [
+			{
+				"quiz__subject__name": s.subject.name if s.subject else None,
+				"avg": s.avg_score,
+				"best": s.best_score,
+				"attempts": s.attempts_count,
+			}
+			for s in stats
+		],
+		"num_attempts": num_attempts,
+	}
+	try:
+		weeks = max(0, min(int(request.GET.get('weeks', 12)), 104))
+	except ValueError:
+		weeks = 12
+	if weeks:
+		since = analytics.week_start(timezone.now()) - timedelta(weeks=weeks - 1)
+		weekly = (
+			WeeklyScoreStats.objects.filter(user=user, week_start__gte=since)
+			.values('week_start')
+			.annotate(n=Sum('attempts_count'), total=Sum('score_sum'))
+			.order_by('week_start')
+		)
+		data["weekly"] = [
+			{"week_start": row['week_start'], "avg": row['total'] / row['n'] if row['n'] else 0, "attempts": row['n']}
+			for row in weekly
+		]
+	return Response(data)
 
 
 @api_view(["POST"])
@@ -81,6 +139,60 @@ def ai_chat(request):
 	chapter_id = request.data.get('chapter')
 	if not question:
 		return Response({"detail": "question is required"}, status=400)
+	try:
+		hits = retrieval.search(question, k=5, subject_id=subject_id, topic_id=topic_id, chapter_id=chapter_id)
+	except (TypeError, ValueError):
+		return Response({"detail": "subject, topic and chapter must be ids"}, status=400)
+	if hits is None:
+		return _ai_chat_semantic(question, subject_id, topic_id, chapter_id)
+	if not hits:
+		return Response({"answer": "I couldn't find anything relevant in your materials.", "resource_id": None, "resource_title": None, "passages": []})
+	titles = dict(Resource.objects.filter(id__in={hit.resource_id for hit in hits}).values_list('id', 'title'))
+	best = hits[0]
+	return Response({
+		"answer": best.text,
+		"resource_id": best.resource_id,
+		"resource_title": titles.get(best.resource_id),
+		"passages": [
+			{
+				"resource_id": hit.resource_id,
+				"resource_title": titles.get(hit.resource_id),
+				"version_id": hit.version_id or None,
+				"score": round(hit.score, 4),
+				"text": hit.text,
+			}
+			for hit in hits
+		],
+	})
+
+
+def _ai_chat_semantic(question, subject_id, topic_id, chapter_id):
+	# Without a BM25 index, fall back to the passage vector store, then to substring matching.
+	hits = vector_store.search(question, k=5, subject_id=subject_id, topic_id=topic_id, chapter_id=chapter_id)
+	if not hits:
+		return _ai_chat_substring(question, subject_id, topic_id, chapter_id)
+	texts = vector_store.passage_texts(hits)
+	titles = dict(Resource.objects.filter(id__in={hit.resource_id for hit in hits}).values_list('id', 'title'))
+	best = hits[0]
+	return Response({
+		"answer": texts[0],
+		"resource_id": best.resource_id,
+		"resource_title": titles.get(best.resource_id),
+		"passages": [
+			{
+				"resource_id": hit.resource_id,
+				"resource_title": titles.get(hit.resource_id),
+				"version_id": hit.version_id,
+				"score": round(hit.score, 4),
+				"text": text,
+			}
+			for hit, text in zip(hits, texts)
+		],
+	})
+
+
+def _ai_chat_substring(question, subject_id, topic_id, chapter_id):
+	# Used until a retrieval index has been built (or when numpy is missing).
 	qs = Resource.objects.all()
 	if subject_id:
 		qs = qs.filter(subject_id=subject_id)
@@ -91,10 +203,10 @@ def ai_chat(request):
 	qs = qs.filter(
 		Q(title__icontains=question) |
 		Q(description__icontains=question) |
-		Q(tags__icontains=question) |
-		Q(versions__extracted_text__icontains=question)
+		Q(tags__name=normalize_tag(question)) |
+		Q(versions__pages__text__icontains=question)
 	).distinct()
-	best_resource = qs.prefetch_related('versions').first()
+	best_resource = qs.prefetch_related('versions__pages').first()
 	if not best_resource:
 		return Response({"answer": "I couldn't find anything relevant in your materials.", "resource_id": None, "resource_title": None})
 	snippet = ""
@@ -123,25 +235,45 @@ def ai_chat(request):
 	})
 
 
-class SubjectViewSet(viewsets.ModelViewSet):
+def _export_response(request, quizzes, filename):
+	"""Stream the questions (answers included) of ``quizzes`` the user may see."""
+	if not request.user.is_staff:
+		quizzes = quizzes.filter(creator=request.user)
+	try:
+		file_format = question_bank.format_for(None, request.query_params.get('file_format') or 'csv')
+	except question_bank.QuestionBankError as exc:
+		return Response({"detail": str(exc)}, status=400)
+	content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+	response = StreamingHttpResponse(question_bank.export_questions(quizzes, file_format), content_type=f'{content_type}; charset=utf-8')
+	response['Content-Disposition'] = f'attachment; filename="{filename}.{file_format}"'
+	return response
+
+
+class SubjectViewSet(PrefetchPlanMixin, viewsets.ModelViewSet):
 	queryset = Subject.objects.all().order_by('name')
+	pagination_class = NameCursorPagination
 	serializer_class = SubjectSerializer
 	permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+	@action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+	def export(self, request, pk=None):
+		subject = self.get_object()
+		return _export_response(request, Quiz.objects.filter(subject=subject), f"subject-{subject.pk}-questions")
 
-class TopicViewSet(viewsets.ModelViewSet):
+
+class TopicViewSet(PrefetchPlanMixin, viewsets.ModelViewSet):
 	queryset = Topic.objects.select_related('subject').all()
 	serializer_class = TopicSerializer
 	permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 
-class ChapterViewSet(viewsets.ModelViewSet):
+class ChapterViewSet(PrefetchPlanMixin, viewsets.ModelViewSet):
 	queryset = Chapter.objects.select_related('topic', 'topic__subject').all()
 	serializer_class = ChapterSerializer
 	permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 
-class ResourceViewSet(viewsets.ModelViewSet):
+class ResourceViewSet(PrefetchPlanMixin, viewsets.ModelViewSet):
 	queryset = Resource.objects.select_related('uploader').all().order_by('-created_at')
 	serializer_class = ResourceSerializer
 	permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -164,29 +296,33 @@ class ResourceViewSet(viewsets.ModelViewSet):
 		if difficulty:
 			qs = qs.filter(difficulty=difficulty)
 		if q:
-			qs = qs.filter(Q(title__icontains=q) | Q(description__icontains=q) | Q(tags__icontains=q) | Q(versions__extracted_text__icontains=q)).distinct()
+			qs = qs.filter(Q(title__icontains=q) | Q(description__icontains=q) | Q(tags__name=normalize_tag(q)) | Q(versions__pages__text__icontains=q)).distinct()
 		if filetype:
-			qs = qs.filter(versions__file_mime__icontains=filetype).distinct()
+			qs = qs.filter(Exists(ResourceVersion.objects.filter(resource=OuterRef('pk'), file_type=normalize_file_type(filetype))))
+		tags = split_tags(self.request.query_params.get('tags', ''))
+		if tags:
+			tagged = ResourceTag.objects.filter(tag__name__in=tags)
+			if self.request.query_params.get('tag_match') == 'any':
+				qs = qs.filter(Exists(tagged.filter(resource=OuterRef('pk'))))
+			else:
+				# Resources carrying every requested tag.
+				qs = qs.filter(pk__in=tagged.values('resource').annotate(n=Count('tag')).filter(n=len(tags)).values('resource'))
 		return qs
 
+	@action(detail=False, methods=['get'])
+	def facets(self, request):
+		"""Counts per tag, subject and difficulty over the resources matching the list filters."""
+		return Response(facets.resource_facets(self.get_queryset()))
+
 	def perform_create(self, serializer):
 		resource = serializer.save(uploader=self.request.user)
 		file = self.request.data.get('file')
 		if file:
 			latest = resource.versions.aggregate(v=Max('version_number')).get('v') or 0
 			version = ResourceVersion(resource=resource, version_number=latest + 1, file=file)
-			mime = getattr(file, 'content_type', '') or ''
-			version.file_mime = mime
-			if mime and 'pdf' in mime.lower() and PdfReader is not None:
-				try:
-					reader = PdfReader(file)
-					texts = []
-					for page in reader.pages:
-						texts.append(page.extract_text() or '')
-					version.extracted_text = "\n".join(texts)
-				except Exception:
-					version.extracted_text = ''
+			version.file_mime = getattr(file, 'content_type', '') or ''
 			version.save()
+			extraction.queue_extraction(version)
 
 	@action(detail=True, methods=['post'], parser_classes=[MultiPartParser, FormParser])
 	def upload_version(self, request, pk=None):
@@ -199,26 +335,89 @@ class ResourceViewSet(viewsets.ModelViewSet):
 			return Response({"detail": "file is required"}, status=status.HTTP_400_BAD_REQUEST)
 		mime = getattr(file, 'content_type', '') or ''
 		version = ResourceVersion.objects.create(resource=resource, file=file, notes=notes, version_number=next_version, file_mime=mime)
-		if mime and 'pdf' in mime.lower() and PdfReader is not None:
-			try:
-				reader = PdfReader(version.file)
-				texts = []
-				for page in reader.pages:
-					texts.append(page.extract_text() or '')
-				version.extracted_text = "\n".join(texts)
-				version.save()
-			except Exception:
-				pass
+		extraction.queue_extraction(version)
 		return Response(ResourceVersionSerializer(version).data, status=status.HTTP_201_CREATED)
 
 
-class ResourceVersionViewSet(viewsets.ReadOnlyModelViewSet):
+class ResourceVersionViewSet(PrefetchPlanMixin, viewsets.ReadOnlyModelViewSet):
 	queryset = ResourceVersion.objects.select_related('resource').all()
 	serializer_class = ResourceVersionSerializer
 	permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+	max_text_pages = 20
+
+	@action(detail=True, methods=['get'])
+	def download(self, request, pk=None):
+		version = self.get_object()
+		if not version.file:
+			raise NotFound("this version has no file")
+		_, ext = os.path.splitext(version.file.name)
+		filename = f"{slugify(version.resource.title) or 'resource'}-v{version.version_number}{ext}"
+		return downloads.serve_file(request, version.file, filename=filename, content_type=version.file_mime or None)
+
+	@action(detail=True, methods=['get'])
+	def text(self, request, pk=None):
+		version = self.get_object()
+		try:
+			start = int(request.query_params.get('start', 1))
+			end = int(request.query_params.get('end', start + self.max_text_pages - 1))
+		except ValueError:
+			return Response({"detail": "start and end must be page numbers"}, status=status.HTTP_400_BAD_REQUEST)
+		if start < 1 or end < start:
+			return Response({"detail": "invalid page range"}, status=status.HTTP_400_BAD_REQUEST)
+		end = min(end, start + self.max_text_pages - 1, version.page_count)
+		pages = version.pages.filter(page_number__gte=start, page_number__lte=end)
+		return Response({
+			"version": version.id,
+			"page_count": version.page_count,
+			"start": start,
+			"end": end,
+			"pages": ResourceVersionPageSerializer(pages, many=True).data,
+		})
+
+
+class UploadSessionViewSet(PrefetchPlanMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+	"""Resumable uploads: create a session, PUT chunks, then finalize into a resource version."""
+	queryset = UploadSession.objects.all()
+	serializer_class = UploadSessionSerializer
+	permission_classes = [permissions.IsAuthenticated]
+
+	def get_queryset(self):
+		return super().get_queryset().filter(user=self.request.user)
+
+	def perform_create(self, serializer):
+		serializer.save(user=self.request.user)
 
+	def perform_destroy(self, instance):
+		if instance.status != UploadSession.STATUS_COMPLETE:
+			uploads.discard(instance)
+		instance.delete()
 
-class QuizViewSet(viewsets.ModelViewSet):
+	@action(detail=True, methods=['put'])
+	def chunk(self, request, pk=None):
+		"""Raw chunk body at ``?offset=`` (or ``Upload-Offset``), checksummed by ``X-Chunk-SHA256``."""
+		session = self.get_object()
+		try:
+			offset = int(request.query_params.get('offset', request.headers.get('Upload-Offset', '')))
+			length = int(request.headers.get('Content-Length') or 0)
+		except ValueError:
+			return Response({"detail": "offset and Content-Length must be integers"}, status=400)
+		try:
+			received = uploads.write_chunk(session, offset, request.stream, length, request.headers.get('X-Chunk-SHA256', ''))
+		except uploads.UploadError as exc:
+			return Response({"detail": exc.detail, **exc.extra}, status=exc.status)
+		return Response({"offset": received, "size": session.size})
+
+	@action(detail=True, methods=['post'])
+	def finalize(self, request, pk=None):
+		session = self.get_object()
+		try:
+			version = uploads.finalize(session)
+		except uploads.UploadError as exc:
+			return Response({"detail": exc.detail, **exc.extra}, status=exc.status)
+		return Response(ResourceVersionSerializer(version, context=self.get_serializer_context()).data, status=status.HTTP_201_CREATED)
+
+
+class QuizViewSet(PrefetchPlanMixin, viewsets.ModelViewSet):
 	queryset = Quiz.objects.all().order_by('-created_at')
 	serializer_class = QuizSerializer
 	permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -226,14 +425,73 @@ class QuizViewSet(viewsets.ModelViewSet):
 	def perform_create(self, serializer):
 		serializer.save(creator=self.request.user)
 
+	@action(detail=True, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+	def import_questions(self, request, pk=None):
+		quiz = self.get_object()
+		if quiz.creator_id != request.user.id and not request.user.is_staff:
+			raise PermissionDenied("Only the quiz creator can import questions.")
+		upload = request.FILES.get('file')
+		if upload is None:
+			return Response({"detail": "file is required"}, status=400)
+		try:
+			file_format = question_bank.format_for(upload.name, request.data.get('file_format'))
+			imported, error_count, errors = question_bank.import_questions(quiz, question_bank.iter_rows(upload.file, file_format))
+		except question_bank.QuestionBankError as exc:
+			return Response({"detail": str(exc)}, status=400)
+		return Response({"imported": imported, "error_count": error_count, "errors": errors})
+
+	@action(detail=True, methods=['patch'], url_path='questions')
+	def edit_questions(self, request, pk=None):
+		"""Edit many questions (and their choices) of one quiz: ``[{id, ...fields}, ...]``."""
+		quiz = self.get_object()
+		if quiz.creator_id != request.user.id and not request.user.is_staff:
+			raise PermissionDenied("Only the quiz creator can edit its questions.")
+		items = request.data
+		if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+			return Response({"detail": "expected a list of question objects"}, status=400)
+		questions = quiz.questions.in_bulk([item.get('id') for item in items if isinstance(item.get('id'), int)])
+		updates, errors = [], {}
+		for index, item in enumerate(items):
+			question = questions.get(item.get('id'))
+			if question is None:
+				errors[index] = {"id": [f"question {item.get('id')!r} is not part of this quiz"]}
+				continue
+			serializer = QuestionSerializer(question, data=item, partial=True, context=self.get_serializer_context())
+			if serializer.is_valid():
+				updates.append((question, serializer.validated_data))
+			else:
+				errors[index] = serializer.errors
+		if errors:
+			return Response({"errors": errors}, status=400)
+		try:
+			quiz_bulk.bulk_update_questions(quiz, updates)
+		except quiz_bulk.ChoiceSyncError as exc:
+			return Response({"detail": str(exc)}, status=400)
+		updated = Question.objects.filter(pk__in=[q.pk for q, _ in updates]).prefetch_related('choices').order_by('id')
+		return Response(QuestionSerializer(updated, many=True, context=self.get_serializer_context()).data)
+
+	@action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+	def export(self, request, pk=None):
+		quiz = self.get_object()
+		return _export_response(request, Quiz.objects.filter(pk=quiz.pk), f"quiz-{quiz.pk}-questions")
+
 	@action(detail=True, methods=['get'], permission_classes=[permissions.AllowAny])
 	def take(self, request, pk=None):
-		quiz = self.get_object()
-		questions = list(quiz.questions.all())
-		if quiz.randomize_order:
+		compiled = self._get_compiled_quiz(pk)
+		questions = quiz_cache.render_questions(compiled)
+		if compiled['randomize_order']:
 			import random
 			random.shuffle(questions)
-		return Response(QuestionSerializer(questions, many=True).data)
+		return Response(questions)
+
+	def _get_compiled_quiz(self, pk):
+		try:
+			compiled = quiz_cache.get_compiled_quiz(int(pk))
+		except (TypeError, ValueError):
+			compiled = None
+		if compiled is None:
+			raise NotFound()
+		return compiled
 
 	@action(detail=True, methods=['post'])
 	def grade(self, request, pk=None):
@@ -242,82 +500,107 @@ class QuizViewSet(viewsets.ModelViewSet):
 		answers = request.data.get('answers', [])
 		if not student_id or not isinstance(answers, list):
 			return Response({"detail": "student and answers[] required"}, status=status.HTTP_400_BAD_REQUEST)
-		student = User.objects.get(id=student_id)
-		attempt = QuizAttempt.objects.create(quiz=quiz, student=student)
-		correct_count = 0
-		for answer in answers:
-			question_id = answer.get('question')
-			selected_choice_id = answer.get('selected_choice')
-			text_answer = answer.get('text_answer', '')
-			question = Question.objects.get(id=question_id, quiz=quiz)
-			selected_choice = None
-			is_correct = False
-			if question.question_type in ['mcq', 'tf']:
-				if selected_choice_id:
-					selected_choice = Choice.objects.get(id=selected_choice_id, question=question)
-					is_correct = selected_choice.is_correct
-			else:
-				is_correct = bool(text_answer and text_answer.strip())
-			AttemptAnswer.objects.create(
-				attempt=attempt,
-				question=question,
-				selected_choice=selected_choice,
-				text_answer=text_answer,
-				is_correct=is_correct,
-			)
-			if is_correct:
-				correct_count += 1
-		total_questions = quiz.questions.count()
-		attempt.score = (correct_count / total_questions) * 100 if total_questions else 0
-		attempt.save()
-		return Response(QuizAttemptSerializer(attempt).data)
-
-
-class QuestionViewSet(viewsets.ModelViewSet):
+		submission = {
+			"student": student_id,
+			"answers": answers,
+			"time_taken_seconds": request.data.get('time_taken_seconds'),
+		}
+		return self._grade(quiz, [submission], many=False)
+
+	@action(detail=True, methods=['post'])
+	def grade_batch(self, request, pk=None):
+		quiz = self.get_object()
+		submissions = request.data.get('attempts')
+		if not isinstance(submissions, list) or not submissions:
+			return Response({"detail": "attempts[] required"}, status=status.HTTP_400_BAD_REQUEST)
+		return self._grade(quiz, submissions, many=True)
+
+	def _grade(self, quiz, submissions, many):
+		started = time.perf_counter()
+		key = quiz_cache.answer_key(self._get_compiled_quiz(quiz.pk))
+		try:
+			attempts = grading.grade_submissions(quiz, submissions, key=key)
+		except grading.GradingError as exc:
+			return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+		elapsed_ms = (time.perf_counter() - started) * 1000
+		attempts = QuizAttempt.objects.filter(id__in=[a.id for a in attempts]).prefetch_related('answers').order_by('id')
+		if many:
+			response = Response({
+				"attempts": QuizAttemptSerializer(attempts, many=True).data,
+				"grading_ms": round(elapsed_ms, 3),
+			})
+		else:
+			response = Response(QuizAttemptSerializer(attempts[0]).data)
+		response['Server-Timing'] = f'grade;dur={elapsed_ms:.3f}'
+		return response
+
+
+class QuestionViewSet(PrefetchPlanMixin, viewsets.ModelViewSet):
 	queryset = Question.objects.select_related('quiz').prefetch_related('choices').all()
 	serializer_class = QuestionSerializer
 	permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 
-class QuizAttemptViewSet(viewsets.ModelViewSet):
+class QuizAttemptViewSet(PrefetchPlanMixin, viewsets.ModelViewSet):
 	queryset = QuizAttempt.objects.select_related('quiz', 'student').prefetch_related('answers').all()
 	serializer_class = QuizAttemptSerializer
 	permission_classes = [permissions.IsAuthenticated]
 
 
-class HomeworkViewSet(viewsets.ModelViewSet):
+class HomeworkViewSet(PrefetchPlanMixin, viewsets.ModelViewSet):
 	queryset = Homework.objects.select_related('teacher').all().order_by('-created_at')
 	serializer_class = HomeworkSerializer
 	permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 
-class HomeworkSubmissionViewSet(viewsets.ModelViewSet):
+class HomeworkSubmissionViewSet(PrefetchPlanMixin, viewsets.ModelViewSet):
 	queryset = HomeworkSubmission.objects.select_related('homework', 'student').all().order_by('-created_at')
 	serializer_class = HomeworkSubmissionSerializer
 	permission_classes = [permissions.IsAuthenticated]
 	parser_classes = [MultiPartParser, FormParser]
 
+	@action(detail=True, methods=['get'])
+	def download(self, request, pk=None):
+		submission = self.get_object()
+		user = request.user
+		if user.id not in (submission.student_id, submission.homework.teacher_id) and not user.is_staff:
+			raise PermissionDenied("Only the student and the homework's teacher can download this file.")
+		if not submission.file:
+			raise NotFound("this submission has no file")
+		_, ext = os.path.splitext(submission.file.name)
+		return downloads.serve_file(request, submission.file, filename=f"submission-{submission.pk}{ext}")
 
-class BookmarkViewSet(viewsets.ModelViewSet):
+
+class BookmarkViewSet(PrefetchPlanMixin, viewsets.ModelViewSet):
 	queryset = Bookmark.objects.select_related('user').all()
 	serializer_class = BookmarkSerializer
 	permission_classes = [permissions.IsAuthenticated]
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
-	queryset = Notification.objects.select_related('user').all().order_by('-created_at')
+class NotificationViewSet(PrefetchPlanMixin, viewsets.ModelViewSet):
+	queryset = Notification.objects.select_related('user').all().order_by('-created_at', '-id')
 	serializer_class = NotificationSerializer
 	permission_classes = [permissions.IsAuthenticated]
 
+	def get_queryset(self):
+		return super().get_queryset().filter(user=self.request.user)
+
 	@action(detail=True, methods=['post'])
 	def mark_read(self, request, pk=None):
-		n = self.get_object()
-		n.is_read = True
-		n.save(update_fields=['is_read'])
+		notifications.mark_read(self.get_object())
 		return Response({"status": "ok"})
 
+	@action(detail=False, methods=['post'])
+	def mark_all_read(self, request):
+		updated = notifications.mark_all_read(request.user.pk)
+		return Response({"status": "ok", "updated": updated})
 
-class TopicProgressViewSet(viewsets.ModelViewSet):
+	@action(detail=False, methods=['get'])
+	def unread_count(self, request):
+		return Response({"unread": notifications.unread_count(request.user.pk)})
+
+
+class TopicProgressViewSet(PrefetchPlanMixin, viewsets.ModelViewSet):
 	queryset = TopicProgress.objects.select_related('user', 'topic').all()
 	serializer_class = TopicProgressSerializer
 	permission_classes = [permissions.IsAuthenticated]
@@ -336,42 +619,47 @@ class TopicProgressViewSet(viewsets.ModelViewSet):
 @api_view(["POST"])
 @permission_classes([permissions.IsAuthenticated])
 def generate_questions(request):
-	"""Naive AI-like generator: split text into sentences and craft MCQs."""
+	"""Generate MCQs from ``text``, a PDF ``file`` or a stored ``resource_version``.
+
+	With ``chapter`` an empty quiz is created and filled by a background job
+	from every extracted version in the chapter.
+	"""
+	if question_generation.np is None:
+		return Response({"detail": "Question generation is unavailable (numpy is not installed)"}, status=503)
+	try:
+		count = int(request.data.get('count') or question_generation.DEFAULT_COUNT)
+	except (TypeError, ValueError):
+		return Response({"detail": "count must be an integer"}, status=400)
+	count = max(1, min(count, question_generation.MAX_COUNT))
+
+	chapter_id = request.data.get('chapter')
+	if chapter_id:
+		chapter = Chapter.objects.select_related('topic').filter(pk=chapter_id).first()
+		if chapter is None:
+			raise NotFound("chapter not found")
+		quiz = Quiz.objects.create(
+			creator=request.user,
+			title=request.data.get('title') or f"{chapter.title} practice",
+			subject_id=chapter.topic.subject_id,
+			topic=chapter.topic,
+			chapter=chapter,
+		)
+		job = jobs.enqueue('generate_questions', quiz_id=quiz.id, chapter_id=chapter.id, count=count)
+		return Response({"quiz_id": quiz.id, "job_id": job.id}, status=status.HTTP_202_ACCEPTED)
+
 	text = request.data.get('text', '')
+	version_id = request.data.get('resource_version')
 	file = request.data.get('file')
-	if not text and file and PdfReader is not None:
-		try:
-			reader = PdfReader(file)
-			texts = []
-			for page in reader.pages:
-				texts.append(page.extract_text() or '')
-			text = "\n".join(texts)
-		except Exception:
-			text = ''
+	if not text and version_id:
+		version = ResourceVersion.objects.prefetch_related('pages').filter(pk=version_id).first()
+		if version is None:
+			raise NotFound("resource version not found")
+		if version.extraction_status != ResourceVersion.EXTRACTION_DONE:
+			return Response({"detail": f"text extraction is {version.extraction_status}"}, status=409)
+		text = version.extracted_text
+	elif not text and file:
+		text = extraction.read_pdf_text(file)
 	if not text:
-		return Response({"detail": "Provide text or PDF file"}, status=400)
-	# naive sentence split
-	sentences = [s.strip() for s in text.replace('\n', ' ').split('.') if s.strip()]
-	questions = []
-	for i, s in enumerate(sentences[:5]):
-		stem = f"Which statement best matches: '{s[:80]}...' ?"
-		correct = s[:100]
-		distractors = []
-		for ds in sentences[5:15]:
-			if ds != s:
-				distractors.append(ds[:100])
-				if len(distractors) == 3:
-					break
-		while len(distractors) < 3:
-			distractors.append(f"Option {len(distractors)+1}")
-		questions.append({
-			"text": stem,
-			"question_type": "mcq",
-			"choices": [
-				{"text": correct, "is_correct": True},
-				{"text": distractors[0], "is_correct": False},
-				{"text": distractors[1], "is_correct": False},
-				{"text": distractors[2], "is_correct": False},
-			]
-		})
-	return Response({"questions": questions})
+		return Response({"detail": "Provide text, a PDF file or a resource_version"}, status=400)
+	sentences = question_generation.split_sentences(text)
+	return Response({"questions": question_generation.generate(sentences, count)})
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .database import database_from_env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,12 +47,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.response_cache.ResponseCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -77,15 +82,40 @@ WSGI_APPLICATION = 'server_config.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# Configured from DATABASE_URL / DB_* environment variables, see server_config/database.py.
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_from_env(BASE_DIR / 'db.sqlite3'),
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+def _cache(url, location):
+    # CACHE_URL / RESPONSE_CACHE_URL: '' (local memory), file:///some/dir or redis://host:6379/1
+    if url.startswith('redis://'):
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    if url.startswith('file://'):
+        return {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': url[len('file://'):]}
+    return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': location}
+
+
+# The default cache holds compiled quizzes, the taxonomy tree and unread
+# counters, which writes invalidate; with more than one worker process it
+# must be shared (CACHE_URL=redis://...), or workers serve stale copies.
+CACHES = {
+    'default': _cache(os.environ.get('CACHE_URL', ''), 'edusuite-default'),
+    'responses': _cache(os.environ.get('RESPONSE_CACHE_URL', ''), 'edusuite-responses'),
+}
+
+# Whole-response cache for public read endpoints (api/response_cache.py).
+# A TTL of 0 turns it off.
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 30))
+RESPONSE_CACHE_STALE_TTL = 300
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -125,6 +155,36 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# On-disk passage index used by ai_chat (built by `manage.py build_retrieval_index`).
+RETRIEVAL_INDEX_DIR = BASE_DIR / 'var' / 'retrieval'
+# Memory-mapped passage vectors for semantic lookup (`manage.py compact_vector_store`).
+VECTOR_STORE_DIR = BASE_DIR / 'var' / 'vectors'
+
+# Resumable uploads (api/uploads.py).
+UPLOAD_CHUNK_MAX_BYTES = 16 * 1024 * 1024
+UPLOAD_MAX_BYTES = 5 * 1024 * 1024 * 1024
+UPLOAD_SESSION_TTL_HOURS = 48
+
+# File downloads (api/downloads.py): '' streams from Django (sendfile under
+# gunicorn), 'nginx' answers with X-Accel-Redirect to DOWNLOAD_ACCEL_PREFIX
+# (an `internal` location aliased to MEDIA_ROOT), 'sendfile' with X-Sendfile.
+DOWNLOAD_ACCEL = os.environ.get('DOWNLOAD_ACCEL', '')
+DOWNLOAD_ACCEL_PREFIX = os.environ.get('DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+
+# Notification push (api/notifications.py): 'local' for in-process pub/sub
+# (single worker) or a redis:// URL to fan out across workers.
+NOTIFICATION_BROKER = os.environ.get('NOTIFICATION_BROKER', 'local')
+NOTIFICATION_STREAM_HEARTBEAT = 15
+NOTIFICATION_STREAM_MAX_SECONDS = 300
+
+# Request metrics at /metrics (api/metrics.py). With METRICS_TOKEN set,
+# scrapers must send `Authorization: Bearer <token>`; without it only staff
+# users can read them. Queries slower than SLOW_QUERY_MS are logged to
+# `api.slow_queries` with a stack trace.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 200))
+
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',
     'http://127.0.0.1:3000',
@@ -139,6 +199,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CreatedAtCursorPagination',
+    'PAGE_SIZE': 50,
 }
 
 # Default primary key field type
@@ -11,7 +11,7 @@ function setStoredToken(token) {
 }
 
 async function apiFetch(path, { method = 'GET', headers = {}, body, token } = {}) {
-	const url = `${API_BASE}${path}`;
+	const url = /^https?:\/\//.test(path) ? path : `${API_BASE}${path}`;
 	const finalHeaders = { ...headers };
 	if (token) finalHeaders['Authorization'] = `Token ${token}`;
 	const res = await fetch(url, { method, headers: finalHeaders, body });
@@ -21,6 +21,19 @@ async function apiFetch(path, { method = 'GET', headers = {}, body, token } = {}
 	return data;
 }
 
+// List endpoints are cursor-paginated; follow `next` until every page is loaded.
+async function apiList(path, options) {
+	const items = [];
+	let next = path;
+	while (next) {
+		const data = await apiFetch(next, options);
+		if (Array.isArray(data)) return items.concat(data);
+		items.push(...(data?.results || []));
+		next = data?.next || null;
+	}
+	return items;
+}
+
 function useAuth() {
 	const [token, setToken] = useState(getStoredToken());
 	const [user, setUser] = useState(null);
@@ -87,7 +100,7 @@ function Taxonomy({ auth }) {
 	const [chapters, setChapters] = useState([]);
 	const fetchAll = async () => {
 		const [subs, tops, chaps] = await Promise.all([
-			apiFetch('/subjects/'), apiFetch('/topics/'), apiFetch('/chapters/')
+			apiList('/subjects/'), apiList('/topics/'), apiList('/chapters/')
 		]);
 		setSubjects(subs); setTopics(tops); setChapters(chaps);
 	};
@@ -157,7 +170,7 @@ function Resources({ auth }) {
 	const [q, setQ] = useState('');
 	const load = async () => {
 		setLoading(true);
-		const data = await apiFetch(`/resources/?q=${encodeURIComponent(q)}`);
+		const data = await apiList(`/resources/?expand=versions&q=${encodeURIComponent(q)}`);
 		setItems(data); setLoading(false);
 	};
 	useEffect(() => { load(); }, []);
@@ -262,7 +275,7 @@ function Quizzes({ auth }) {
 	const [selected, setSelected] = useState(null);
 	const [questions, setQuestions] = useState([]);
 	const [answers, setAnswers] = useState({});
-	const load = async () => { setQuizzes(await apiFetch('/quizzes/')); };
+	const load = async () => { setQuizzes(await apiList('/quizzes/')); };
 	useEffect(() => { load(); }, []);
 	const takeQuiz = async (q) => {
 		setSelected(q); setAnswers({});
@@ -337,7 +350,7 @@ function Homework({ auth }) {
 	const [desc, setDesc] = useState('');
 	const [due, setDue] = useState('');
 	const [file, setFile] = useState(null);
-	const load = async () => setItems(await apiFetch('/homeworks/'));
+	const load = async () => setItems(await apiList('/homeworks/'));
 	useEffect(() => { load(); }, []);
 	const create = async () => {
 		if (!auth.token) return;
@@ -382,7 +395,7 @@ function Homework({ auth }) {
 
 function Bookmarks({ auth }) {
 	const [bookmarks, setBookmarks] = useState([]);
-	const load = async () => { if (auth.token) setBookmarks(await apiFetch('/bookmarks/', { token: auth.token })); };
+	const load = async () => { if (auth.token) setBookmarks(await apiList('/bookmarks/', { token: auth.token })); };
 	useEffect(() => { load(); }, [auth.token]);
 	const addForResource = async (resourceId) => {
 		await apiFetch('/bookmarks/', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ resource: resourceId, user: auth.user.id }), token: auth.token });
@@ -407,7 +420,7 @@ function Bookmarks({ auth }) {
 
 function Notifications({ auth }) {
 	const [notifications, setNotifications] = useState([]);
-	const load = async () => { if (auth.token) setNotifications(await apiFetch('/notifications/', { token: auth.token })); };
+	const load = async () => { if (auth.token) setNotifications(await apiList('/notifications/', { token: auth.token })); };
 	useEffect(() => { load(); }, [auth.token]);
 	const mark = async (id) => { await apiFetch(`/notifications/${id}/mark_read/`, { method: 'POST', token: auth.token }); load(); };
 	return (
@@ -425,7 +438,7 @@ function Notifications({ auth }) {
 
 function Progress({ auth }) {
 	const [topics, setTopics] = useState([]);
-	const load = async () => setTopics(await apiFetch('/topics/'));
+	const load = async () => setTopics(await apiList('/topics/'));
 	useEffect(() => { load(); }, []);
 	const complete = async (topicId) => { await apiFetch('/progress/mark_complete/', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ topic: topicId }), token: auth.token }); alert('Marked complete'); };
 	return (